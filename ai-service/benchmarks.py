@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the MAS Queens AI service
+
+Usage:
+    python benchmarks.py chat-throughput [--requests 50] [--latency 0.05]
+    python benchmarks.py chat-stream [--latency 0.3] [--token-latency 0.02]
+    python benchmarks.py fast-path [--requests 20] [--latency 0.3]
+    python benchmarks.py router [--requests 200]
+    python benchmarks.py sessions [--sessions 200] [--turns 10]
+    python benchmarks.py rows [--rows 2000] [--repeat 20]
+    python benchmarks.py event-search [--events 100000] [--repeat 20]
+    python benchmarks.py writes [--writes 2000] [--threads 32]
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+from config import Settings
+from memory import InMemorySessionStore, SessionStore, SqliteSessionStore
+from metrics import metrics
+from providers.groq import GroqChatProvider
+from router import IntentRouter
+from shared import database, serialization
+from shared.models import EVENT_COLUMNS, Event
+from tools import ToolRegistry
+
+
+ANSWER = "Maghrib is at 6:12 PM today."
+
+
+class FakeCompletions:
+    """Stands in for Groq: asks for a prayer times tool call, then answers"""
+
+    def __init__(self, latency: float, token_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+
+    @staticmethod
+    def _response(params):
+        if params.get("tools") and not any(message["role"] == "tool" for message in params["messages"]):
+            tool_call = SimpleNamespace(
+                id="call_prayer",
+                function=SimpleNamespace(name="get_prayer_times", arguments='{"date": "2026-10-17"}'),
+            )
+            message = SimpleNamespace(content=None, tool_calls=[tool_call])
+        else:
+            message = SimpleNamespace(content=ANSWER, tool_calls=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def create(self, **params):
+        time.sleep(self.latency)
+        return self._response(params)
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    async def create(self, stream: bool = False, **params):
+        if stream:
+            return self._stream(params)
+        await asyncio.sleep(self.latency + self.token_latency * len(ANSWER.split()))
+        return self._response(params)
+
+    async def _stream(self, params):
+        await asyncio.sleep(self.latency)
+        message = self._response(params).choices[0].message
+        if message.tool_calls:
+            delta = SimpleNamespace(
+                content=None,
+                tool_calls=[
+                    SimpleNamespace(index=index, id=call.id, function=call.function)
+                    for index, call in enumerate(message.tool_calls)
+                ],
+            )
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+            return
+        for word in message.content.split(" "):
+            await asyncio.sleep(self.token_latency)
+            delta = SimpleNamespace(content=word + " ", tool_calls=None)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def build_provider(latency: float, token_latency: float = 0.0, fast_path_tools=()) -> GroqChatProvider:
+    """Provider on fake clients; fast-path rendering is off unless tools are named"""
+    settings = Settings(groq_api_key="benchmark")
+    registry = ToolRegistry(fast_path_tools=fast_path_tools)
+    provider = GroqChatProvider(settings, InMemorySessionStore(settings.max_history_messages), registry)
+    provider._client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(latency, token_latency)))
+    provider._async_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=FakeAsyncCompletions(latency, token_latency))
+    )
+    return provider
+
+
+def bench_chat_throughput(requests: int, latency: float) -> None:
+    """Concurrent chats on one event loop (one uvicorn worker), sync vs async provider path"""
+    provider = build_provider(latency)
+
+    async def blocking_chat(index: int):
+        # What main.chat did before: a sync provider call inside an async endpoint
+        return provider.generate("When is Maghrib?", f"before-{index}")
+
+    async def async_chat(index: int):
+        return await provider.generate_async("When is Maghrib?", f"after-{index}")
+
+    async def run(handler) -> float:
+        started = time.perf_counter()
+        await asyncio.gather(*(handler(index) for index in range(requests)))
+        return time.perf_counter() - started
+
+    print(f"{requests} concurrent chats, {latency * 1000:.0f} ms simulated Groq latency per completion")
+    for label, handler in [("before (sync generate)", blocking_chat), ("after (generate_async)", async_chat)]:
+        elapsed = asyncio.run(run(handler))
+        print(f"  {label:<24} {elapsed:7.3f} s  {requests / elapsed:8.1f} chats/s per worker")
+
+
+def bench_chat_stream(latency: float, token_latency: float) -> None:
+    """Time until the user sees text: /chat (whole reply) vs /chat/stream (first token)"""
+    provider = build_provider(latency, token_latency)
+
+    async def run():
+        started = time.perf_counter()
+        await provider.generate_async("When is Maghrib?", "blocking")
+        blocking_ms = (time.perf_counter() - started) * 1000
+
+        done = {}
+        async for event in provider.stream("When is Maghrib?", "streaming"):
+            if event["event"] == "done":
+                done = event["data"]
+        return blocking_ms, done
+
+    blocking_ms, done = asyncio.run(run())
+    print(f"{latency * 1000:.0f} ms to first chunk, {token_latency * 1000:.0f} ms per token")
+    print(f"  /chat         first text after {blocking_ms:8.1f} ms")
+    print(f"  /chat/stream  first text after {done['time_to_first_token_ms']:8.1f} ms (complete at {done['total_ms']:.1f} ms)")
+
+
+def bench_fast_path(requests: int, latency: float) -> None:
+    """Prayer time questions with the follow-up completion vs the template renderer"""
+    print(f"{requests} sequential chats, {latency * 1000:.0f} ms simulated Groq latency per completion")
+    for label, tools in [("LLM follow-up", ()), ("fast path", ("get_prayer_times",))]:
+        provider = build_provider(latency, fast_path_tools=tools)
+        metrics.reset()
+
+        async def run():
+            started = time.perf_counter()
+            for index in range(requests):
+                result = await provider.generate_async("When is Maghrib today?", f"{label}-{index}")
+            return (time.perf_counter() - started) * 1000 / requests, result
+
+        per_chat_ms, result = asyncio.run(run())
+        skipped = metrics.counter("chat.completions_skipped")
+        print(f"  {label:<14} {per_chat_ms:8.1f} ms/chat  {skipped:4d} completions skipped")
+        print(f"  {'':<14} {result.message.splitlines()[-1]!r}")
+
+
+ROUTER_MESSAGES = [
+    "When is Maghrib?",
+    "What time is Fajr tomorrow?",
+    "prayer times in 3 days",
+    "What's the next prayer?",
+    "What events are coming up?",
+    "Who can I contact to volunteer for the event?",
+    "RSVP me to the next halaqa",
+    "What is the importance of Salah?",
+]
+
+
+def bench_router(requests: int) -> None:
+    """Per-intent latency of answers served by the intent router"""
+    router = IntentRouter(ToolRegistry(), InMemorySessionStore())
+    metrics.reset()
+    for index in range(requests):
+        router.answer(ROUTER_MESSAGES[index % len(ROUTER_MESSAGES)], f"router-{index}")
+
+    timings = metrics.snapshot()["timings_ms"]
+    stats = router.stats()
+    print(f"{requests} chats, {stats['hit_rate']:.0%} answered without the model")
+    for name, intent in stats["intents"].items():
+        timing = timings.get(f"router.{name}")
+        if timing:
+            print(f"  {name:<18} {intent['hits']:5d} hits  p50 {timing['p50']:6.3f} ms  p95 {timing['p95']:6.3f} ms")
+    print(f"  {'fallback':<18} {stats['fallback']:5d}       p50 {timings['router.classify']['p50']:6.3f} ms to decide")
+
+
+def bench_sessions(sessions: int, turns: int) -> None:
+    """append/get latency per session backend, one chat turn at a time"""
+
+    def run(store: SessionStore) -> None:
+        metrics.reset()
+        for turn in range(turns):
+            for index in range(sessions):
+                session_id = f"session-{index}"
+                started = time.perf_counter()
+                store.get(session_id)
+                metrics.observe("get", (time.perf_counter() - started) * 1000)
+
+                started = time.perf_counter()
+                store.append(session_id, "user", f"When is Maghrib? ({turn})")
+                store.append(session_id, "assistant", ANSWER)
+                metrics.observe("append", (time.perf_counter() - started) * 1000 / 2)
+
+        if isinstance(store, SqliteSessionStore):
+            store.flush()
+        stats = store.stats()
+        store.close()
+
+        timings = metrics.snapshot()["timings_ms"]
+        for name in ("append", "get"):
+            timing = timings[name]
+            print(f"  {stats['backend']:<7} {name:<7} p50 {timing['p50'] * 1000:7.1f} us  p95 {timing['p95'] * 1000:7.1f} us")
+        if "flushes" in stats:
+            print(f"  {stats['backend']:<7} {stats['flushes']} transactions, {stats['avg_batch']} messages each")
+
+    print(f"{sessions} sessions x {turns} turns")
+    run(InMemorySessionStore(8))
+    with tempfile.TemporaryDirectory() as directory:
+        run(SqliteSessionStore(Path(directory) / "sessions.db", 8))
+
+
+def _event_dicts(conn: sqlite3.Connection) -> list:
+    """The previous fetch path: sqlite3.Row copied into a fresh dict per row"""
+    conn.row_factory = sqlite3.Row
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "description": row["description"],
+            "date": row["date"],
+            "time": row["time"],
+            "location": row["location"],
+            "category": row["category"],
+            "volunteers_needed": row["volunteers_needed"],
+            "contact_email": row["contact_email"],
+            "price": row["price"],
+            "status": row["status"],
+        }
+        for row in conn.execute(f"SELECT {EVENT_COLUMNS} FROM events")
+    ]
+
+
+def _event_records(conn: sqlite3.Connection) -> list:
+    cursor = conn.cursor()
+    cursor.row_factory = Event.row_factory
+    return cursor.execute(f"SELECT {EVENT_COLUMNS} FROM events").fetchall()
+
+
+def bench_rows(rows: int, repeat: int) -> None:
+    """Fetch and serialize event rows: dict copies + json vs Event records + shared.serialization"""
+    with tempfile.TemporaryDirectory() as directory:
+        conn = sqlite3.connect(Path(directory) / "events.db")
+        conn.execute(
+            "CREATE TABLE events (id INTEGER PRIMARY KEY, title TEXT, description TEXT, date TEXT, time TEXT,"
+            " location TEXT, category TEXT, volunteers_needed INTEGER, contact_email TEXT, price REAL, status TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (index, f"Event {index}", "Halaqa with dinner after Maghrib", "2026-10-20", "19:00",
+                 "Main hall", "Education", index % 7, "youth.events@masq.org", 10.0, "active")
+                for index in range(rows)
+            ],
+        )
+        conn.commit()
+
+        print(f"{rows} rows x {repeat}")
+        for label, fetch, encode in [
+            ("dict + json", _event_dicts, json.dumps),
+            (f"Event + {serialization.backend()}", _event_records, serialization.dumps),
+        ]:
+            tracemalloc.start()
+            fetched = fetch(conn)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                fetched = fetch(conn)
+            fetch_us = (time.perf_counter() - started) * 1e6 / (repeat * rows)
+
+            started = time.perf_counter()
+            for _ in range(repeat):
+                encode({"events": fetched})
+            encode_us = (time.perf_counter() - started) * 1e6 / (repeat * rows)
+            print(
+                f"  {label:<16} fetch {fetch_us:5.2f} us/row  serialize {encode_us:5.2f} us/row"
+                f"  peak {peak / rows:6.0f} B/row"
+            )
+        conn.close()
+
+
+SEARCH_WORDS = ["halaqa", "dinner", "youth", "quran", "basketball", "sisters", "fundraiser", "tafsir", "iftar", "class"]
+SEARCH_QUERIES = ["halaqa", "youth basketball", "taf", "sisters quran class", "potluck"]
+
+
+def bench_event_search(events: int, repeat: int) -> None:
+    """Event search over a synthetic events table: LIKE scans vs the FTS5 index"""
+    # Each search word shows up in roughly 1% of titles, the rest is filler
+    vocabulary = SEARCH_WORDS + [f"topic{index}" for index in range(290)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "users.db"
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE events (id INTEGER PRIMARY KEY, title TEXT, description TEXT, date TEXT, time TEXT,"
+            " location TEXT, category TEXT, volunteers_needed INTEGER, contact_email TEXT, price REAL, status TEXT)"
+        )
+        size = len(vocabulary)
+        conn.executemany(
+            "INSERT INTO events VALUES (?, ?, ?, date('now', ?), '19:00', 'Main hall', ?, 2, 'events@masq.org', 0, ?)",
+            [
+                (
+                    index,
+                    " ".join(vocabulary[index * step % size] for step in (1, 7, 31)).title(),
+                    f"Join us for {vocabulary[index * 13 % size]} after Maghrib",
+                    f"+{index % 365} days",
+                    vocabulary[index // 100 % size].title(),
+                    "active" if index % 10 else "cancelled",
+                )
+                for index in range(events)
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+        original = database.get_pool().db_path
+        database.configure_pool(path)
+        try:
+            started = time.perf_counter()
+            database.ensure_event_search()
+            print(f"{events} events; index built in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+            for mode in ("like", "fts"):
+                database.get_pool().event_search = mode
+                for query in SEARCH_QUERIES:
+                    # Straight to the fetch so the read-through cache doesn't answer
+                    started = time.perf_counter()
+                    for _ in range(repeat):
+                        found = database._fetch_events(10, query, None)
+                    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+                    print(f"  {mode:<4} {query!r:<24} {elapsed_ms:8.2f} ms  {len(found)} results")
+        finally:
+            database.configure_pool(original)
+
+
+def _rsvp_database(path: Path, users: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT UNIQUE NOT NULL, first_name TEXT,
+                            last_name TEXT, phone TEXT);
+        CREATE TABLE events (id INTEGER PRIMARY KEY, title TEXT, description TEXT, date TEXT, time TEXT,
+                             location TEXT, category TEXT, volunteers_needed INTEGER, contact_email TEXT,
+                             price REAL, status TEXT);
+        CREATE TABLE event_rsvps (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL,
+                                  event_id INTEGER NOT NULL, created_at DATETIME, UNIQUE(user_id, event_id));
+        INSERT INTO events VALUES (1, 'Eid Dinner', 'Community dinner', date('now', '+7 days'), '19:00',
+                                   'Main hall', 'Community', 0, 'events@masq.org', 0, 'active');
+    """)
+    conn.executemany(
+        "INSERT INTO users (email, first_name, last_name) VALUES (?, 'Test', ?)",
+        [(f"user{index}@example.com", f"User {index}") for index in range(users)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _original_rsvp(path: Path, user_email: str, event_title: str) -> bool:
+    """The RSVP tool before the pool: each helper opened its own connection, the insert committed alone"""
+
+    def query(sql, params):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    user = query("SELECT id FROM users WHERE email = ?", (user_email,))
+    event = query("SELECT id, status, price FROM events WHERE LOWER(title) LIKE LOWER(?)", (f"%{event_title}%",))
+    if query("SELECT created_at FROM event_rsvps WHERE user_id = ? AND event_id = ?", (user[0], event[0])):
+        return False
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(
+            "INSERT INTO event_rsvps (user_id, event_id, created_at) VALUES (?, ?, datetime('now'))", (user[0], event[0])
+        )
+        conn.commit()
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+def bench_writes(writes: int, threads: int) -> None:
+    """RSVPs per second through rsvp_to_event: the original per-connection path, one pooled
+    transaction per RSVP, and the write-behind queue"""
+    emails = [f"user{index}@example.com" for index in range(writes)]
+    batch_size = database.DB_WRITE_BATCH if database.DB_WRITE_BATCH > 0 else 64
+    original_pool, original_queue = database.get_pool().db_path, database.get_write_queue()
+    print(f"{writes} RSVPs from {threads} threads")
+    try:
+        for label, size in [
+            ("original (connect/commit)", None),
+            ("pooled, commit each", 0),
+            (f"queued (batch {batch_size})", batch_size),
+        ]:
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / "users.db"
+                _rsvp_database(path, writes)
+                if size is None:
+                    rsvp = lambda email: _original_rsvp(path, email, "Eid Dinner")  # noqa: E731
+                else:
+                    database.configure_pool(path)
+                    queue = database._write_queue = database.WriteQueue(batch_size=size)
+                    rsvp = lambda email: database.rsvp_to_event(email, "Eid Dinner").status == "created"  # noqa: E731
+
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    created = sum(pool.map(rsvp, emails))
+                elapsed = time.perf_counter() - started
+                detail = ""
+                if size:
+                    queue.close()
+                    detail = f", average batch {queue.stats()['average_batch']}"
+                print(f"  {label:<26} {writes / elapsed:8.0f} RSVPs/s  ({created} created{detail})")
+                database.configure_pool(original_pool)
+    finally:
+        database._write_queue = original_queue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    throughput = commands.add_parser("chat-throughput", help="concurrent chat throughput per worker")
+    throughput.add_argument("--requests", type=int, default=50)
+    throughput.add_argument("--latency", type=float, default=0.05)
+
+    stream = commands.add_parser("chat-stream", help="time to first token, streaming vs not")
+    stream.add_argument("--latency", type=float, default=0.3)
+    stream.add_argument("--token-latency", type=float, default=0.02)
+
+    fast_path = commands.add_parser("fast-path", help="template replies vs a second completion")
+    fast_path.add_argument("--requests", type=int, default=20)
+    fast_path.add_argument("--latency", type=float, default=0.3)
+
+    router = commands.add_parser("router", help="intent router latency per intent")
+    router.add_argument("--requests", type=int, default=200)
+
+    sessions = commands.add_parser("sessions", help="session store append/get latency per backend")
+    sessions.add_argument("--sessions", type=int, default=200)
+    sessions.add_argument("--turns", type=int, default=10)
+
+    rows = commands.add_parser("rows", help="event row fetch and serialization cost")
+    rows.add_argument("--rows", type=int, default=2000)
+    rows.add_argument("--repeat", type=int, default=20)
+
+    search = commands.add_parser("event-search", help="LIKE vs FTS5 event search latency")
+    search.add_argument("--events", type=int, default=100_000)
+    search.add_argument("--repeat", type=int, default=20)
+
+    writes = commands.add_parser("writes", help="RSVPs/sec: original path, per-RSVP commits, write queue")
+    writes.add_argument("--writes", type=int, default=2000)
+    writes.add_argument("--threads", type=int, default=32)
+
+    args = parser.parse_args()
+    if args.command == "chat-throughput":
+        bench_chat_throughput(args.requests, args.latency)
+    elif args.command == "chat-stream":
+        bench_chat_stream(args.latency, args.token_latency)
+    elif args.command == "fast-path":
+        bench_fast_path(args.requests, args.latency)
+    elif args.command == "router":
+        bench_router(args.requests)
+    elif args.command == "sessions":
+        bench_sessions(args.sessions, args.turns)
+    elif args.command == "rows":
+        bench_rows(args.rows, args.repeat)
+    elif args.command == "event-search":
+        bench_event_search(args.events, args.repeat)
+    elif args.command == "writes":
+        bench_writes(args.writes, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,12 @@ load_dotenv()
 
 from datetime import datetime
 
-def get_enhanced_system_prompt() -> str:
-    current_date = datetime.now().strftime("%Y-%m-%d")
-    current_time = datetime.now().strftime("%H:%M")
+# Byte-identical across requests so the provider can cache the prompt prefix;
+# anything that changes per request goes in current_context() instead
+DEFAULT_SYSTEM_PROMPT = """You are the official MAS Queens mosque assistant with advanced capabilities.
 
-    return f"""You are the official MAS Queens mosque assistant with advanced capabilities.
-
-CURRENT CONTEXT:
-- Date: {current_date}
-- Time: {current_time}
-- Database: Events, prayer times, volunteer opportunities available
+The current date and time at the masjid are given in a CURRENT CONTEXT message just before each user message.
+Events, prayer times and volunteer opportunities are available through your tools.
 
 CORE CAPABILITIES:
 1. **Prayer Times**: Get times for any date, calculate "next prayer", "prayer in X days"
@@ -43,7 +39,7 @@ Examples:
 - "Who can I contact to volunteer?" → "You can reach out to youth.events@masq.org."
 
 CRITICAL RULES:
-- Calculate dates yourself (today is {current_date})
+- Calculate dates yourself from the date in CURRENT CONTEXT
 - Use SQL queries for complex data needs
 - Never guess prices, dates, or contact info
 - NEVER HALLUCINATE: Only provide information that comes directly from tool results
@@ -54,7 +50,7 @@ CRITICAL RULES:
 
 INTELLIGENCE GUIDELINES:
 - For "what's the next prayer time" → get current prayer times, calculate which is next
-- For "prayer time in 3 days" → calculate {current_date} + 3 days, get prayer times for that date
+- For "prayer time in 3 days" → calculate today + 3 days, get prayer times for that date
 - For complex event questions → use SQL queries to find specific information
 - For "is it free" after showing an event → reference the previously shown event's price
 - For RSVP requests without user context → use rsvp_current_user_to_event tool (will handle authentication)
@@ -69,7 +65,10 @@ CONTEXT AWARENESS RULES:
 
 Use warm Islamic etiquette (Assalamu alaikum when appropriate) while being direct and helpful."""
 
-DEFAULT_SYSTEM_PROMPT = get_enhanced_system_prompt()
+
+def current_context(now: datetime) -> str:
+    """The per-request part of the system prompt"""
+    return f"CURRENT CONTEXT:\n- Date: {now:%Y-%m-%d} ({now:%A})\n- Time: {now:%H:%M}"
 
 
 @dataclass
@@ -77,10 +76,47 @@ class Settings:
     ai_provider: str = field(default_factory=lambda: os.getenv("AI_PROVIDER", "groq").lower())
     groq_api_key: str = field(default_factory=lambda: os.getenv("GROQ_API_KEY", ""))
     groq_model: str = field(default_factory=lambda: os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile"))
-    max_history_messages: int = field(default_factory=lambda: int(os.getenv("AI_HISTORY_LIMIT", "8")))
+    # "memory" (one worker) or "sqlite" (shared by workers, survives restarts)
+    session_backend: str = field(default_factory=lambda: os.getenv("AI_SESSION_BACKEND", "memory").lower())
+    # Messages stored per session; how many of them reach the prompt is set by the token budget
+    max_history_messages: int = field(default_factory=lambda: int(os.getenv("AI_HISTORY_LIMIT", "20")))
+    history_token_budget: int = field(default_factory=lambda: int(os.getenv("AI_HISTORY_TOKEN_BUDGET", "1200")))
     max_output_tokens: int = field(default_factory=lambda: int(os.getenv("AI_MAX_OUTPUT_TOKENS", "600")))
     temperature: float = field(default_factory=lambda: float(os.getenv("AI_TEMPERATURE", "0.1")))
+    tool_workers: int = field(default_factory=lambda: int(os.getenv("AI_TOOL_WORKERS", "8")))
+    tool_timeout_seconds: float = field(default_factory=lambda: float(os.getenv("AI_TOOL_TIMEOUT", "15")))
+    max_tool_rounds: int = field(default_factory=lambda: int(os.getenv("AI_MAX_TOOL_ROUNDS", "3")))
+    token_budget: int = field(default_factory=lambda: int(os.getenv("AI_TOKEN_BUDGET", "12000")))
+    time_budget_seconds: float = field(default_factory=lambda: float(os.getenv("AI_TIME_BUDGET", "30")))
     system_prompt: str = field(default_factory=lambda: os.getenv("AI_SYSTEM_PROMPT", DEFAULT_SYSTEM_PROMPT))
+    # Answer common questions (prayer times, events, ...) without calling the model
+    intent_router: bool = field(default_factory=lambda: os.getenv("AI_INTENT_ROUTER", "1") not in ("0", "false", "no"))
+    # Replies to first-turn questions reused across sessions; size 0 disables
+    response_cache_size: int = field(default_factory=lambda: int(os.getenv("AI_RESPONSE_CACHE_SIZE", "512")))
+    response_cache_ttl: float = field(default_factory=lambda: float(os.getenv("AI_RESPONSE_CACHE_TTL", "600")))
+    response_cache_similarity: float = field(
+        default_factory=lambda: float(os.getenv("AI_RESPONSE_CACHE_SIMILARITY", "0.85"))
+    )
+    # Create the indexes shared/indexes.py recommends at startup; off only reports them
+    ensure_indexes: bool = field(
+        default_factory=lambda: os.getenv("AI_ENSURE_INDEXES", "1") not in ("0", "false", "no")
+    )
+    # Install ai_table_versions triggers in users.db at startup so cached
+    # execute_sql_query results are invalidated per table (shared/sql_templates.py)
+    sql_table_versions: bool = field(
+        default_factory=lambda: os.getenv("AI_SQL_TABLE_VERSIONS", "0") not in ("0", "false", "no")
+    )
+    # Offer only the tools a message's topic needs (prayer, events, volunteering).
+    # Off by default: fewer schema tokens, but each subset is its own cached prefix
+    tool_subsetting: bool = field(
+        default_factory=lambda: os.getenv("AI_TOOL_SUBSETTING", "0") not in ("0", "false", "no")
+    )
+    # Tools whose results are rendered from templates instead of a second completion
+    fast_path_tools: List[str] = field(default_factory=lambda: [
+        name.strip()
+        for name in os.getenv("AI_FAST_PATH_TOOLS", "get_prayer_times,get_next_prayer_time").split(",")
+        if name.strip()
+    ])
 
     allowed_sql_operations: List[str] = field(default_factory=lambda: [
         "SELECT",
@@ -0,0 +1,103 @@
+"""Shared fixtures: a throwaway copy of the users.db schema behind the connection pool"""
+
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from shared import database
+
+APP_SCHEMA = [
+    """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        phone TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        description TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        location TEXT NOT NULL,
+        volunteers_needed INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        requirements TEXT,
+        contact_email TEXT NOT NULL,
+        status TEXT DEFAULT 'active',
+        created_by INTEGER,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        price DECIMAL(10,2) DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE volunteer_signups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        event_id INTEGER NOT NULL,
+        status TEXT DEFAULT 'confirmed',
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(user_id, event_id)
+    )
+    """,
+    """
+    CREATE TABLE event_rsvps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        event_id INTEGER NOT NULL,
+        status TEXT DEFAULT 'confirmed',
+        payment_status TEXT DEFAULT 'pending',
+        amount_paid DECIMAL(10,2) DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        auto_created_from_volunteer BOOLEAN DEFAULT 0,
+        UNIQUE(user_id, event_id)
+    )
+    """,
+]
+
+
+@pytest.fixture
+def app_db(tmp_path):
+    """Empty users.db schema in a temp file, installed as the process-wide pool"""
+    path = tmp_path / "users.db"
+    conn = sqlite3.connect(path)
+    for statement in APP_SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+
+    original = database.get_pool().db_path
+    database.configure_pool(path)
+    yield path
+    database.configure_pool(original)
+
+
+@pytest.fixture
+def add_event(app_db):
+    """Insert an event (as the Next.js app would) and return its id"""
+
+    def add(title, description="", category="Community", days_ahead=7, price=0, status="active"):
+        conn = sqlite3.connect(app_db)
+        try:
+            cursor = conn.execute(
+                """
+                INSERT INTO events (title, description, date, time, location, volunteers_needed,
+                                    category, contact_email, status, price)
+                VALUES (?, ?, ?, '19:00', 'Main hall', 2, ?, 'events@masq.org', ?, ?)
+                """,
+                (title, description, (date.today() + timedelta(days=days_ahead)).isoformat(), category, status, price),
+            )
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    return add
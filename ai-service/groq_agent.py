@@ -6,32 +6,54 @@ Advanced Groq Agent for MAS Queens - Enhanced AI with function calling and multi
 import json
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 
-from groq import Groq
+from groq import AsyncGroq, Groq
 from dotenv import load_dotenv
 
-from shared.database import get_events, get_event_by_title, get_volunteer_opportunities, create_event_rsvp, create_volunteer_signup
-from shared.prayer_times import get_prayer_times
+from config import current_context
+from memory import SessionTable, compact_history, memory_note
+from shared.prayer_calculator import MASQ_TIMEZONE
+from shared.serialization import dumps
+from tools import ToolRegistry, entity_updates, execute_parallel, execute_parallel_async
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+AGENT_TOOLS = (
+    "get_prayer_times",
+    "get_next_prayer_time",
+    "search_events",
+    "get_event_details",
+    "search_volunteer_opportunities",
+    "find_volunteer_contact_for_recent_event",
+)
+
 class GroqMosqueAgent:
     def __init__(self):
         self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.async_groq_client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+        self.tool_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("AI_TOOL_WORKERS", "8")),
+            thread_name_prefix="agent-tools",
+        )
+        self.tool_timeout = float(os.getenv("AI_TOOL_TIMEOUT", "15"))
         self.model = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+        self.history_token_budget = int(os.getenv("AI_HISTORY_TOKEN_BUDGET", "1200"))
 
-        # Enhanced conversation memory with user preferences and context
-        self.conversation_memory = {}
+        # Enhanced conversation memory with user preferences and context,
+        # bounded and idle-expired like the main service's sessions
+        self.conversation_memory: SessionTable[Dict[str, Any]] = SessionTable(self._new_session_memory)
 
         # System prompt optimized for advanced capabilities
-        self.system_prompt = f"""You are an advanced AI assistant for MAS Queens mosque and community center.
+        # Kept byte-identical across requests; the date goes in a per-request context message
+        self.system_prompt = """You are an advanced AI assistant for MAS Queens mosque and community center.
 
-CURRENT DATE: {datetime.now().strftime('%Y-%m-%d')}
+The current date and time are given in a CURRENT CONTEXT message just before each user message.
 
 RESPONSE FORMATTING RULES:
 When showing events, use this EXACT format:
@@ -64,117 +86,29 @@ RESPONSE STYLE:
 
 Always be accurate with data from the database and suggest contacting mosque administration for complex requests."""
 
-        # Enhanced tool definitions with more sophisticated capabilities
-        self.tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_prayer_times",
-                    "description": "Get Islamic prayer times (Fajr, Dhuhr, Asr, Maghrib, Isha) for any date",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "date": {
-                                "type": "string",
-                                "description": "Date in YYYY-MM-DD format. YOU MUST calculate the actual date from natural language. For example: 'tomorrow' = calculate tomorrow's date, 'in 2 days' = calculate 2 days from today's date (2024-09-18)"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_events",
-                    "description": "Search for events with flexible filtering by date range, keywords, categories",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {
-                                "type": "string",
-                                "description": "Search keywords for event title, description, or category"
-                            },
-                            "date_from": {
-                                "type": "string",
-                                "description": "Start date for search in YYYY-MM-DD format"
-                            },
-                            "date_to": {
-                                "type": "string",
-                                "description": "End date for search in YYYY-MM-DD format"
-                            },
-                            "limit": {
-                                "type": "integer",
-                                "description": "Maximum number of events to return (default 10, max 20)"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_event_details",
-                    "description": "Get detailed information about a specific event by title or partial name",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "event_title": {
-                                "type": "string",
-                                "description": "Full or partial event title to search for"
-                            }
-                        },
-                        "required": ["event_title"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "search_volunteers",
-                    "description": "Find volunteer opportunities, optionally for specific events",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "event_name": {
-                                "type": "string",
-                                "description": "Specific event to find volunteer info for (optional)"
-                            }
-                        }
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_conversation_context",
-                    "description": "Retrieve previous conversation context and user preferences",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "session_id": {
-                                "type": "string",
-                                "description": "Session ID to retrieve context for"
-                            }
-                        },
-                        "required": ["session_id"]
-                    }
-                }
-            }
-        ]
+        # Tool schemas and dispatch come from the shared registry, limited to
+        # the read-only tools this agent has always offered
+        self.tool_registry = ToolRegistry()
+
+    @property
+    def tools(self) -> List[Dict[str, Any]]:
+        return self.tool_registry.as_openai_tools(AGENT_TOOLS)
+
+    @staticmethod
+    def _new_session_memory() -> Dict[str, Any]:
+        return {
+            "chat_history": [],
+            "user_preferences": {},
+            "discussed_events": [],
+            "interests": [],
+            "last_prayer_query": None,
+            "volunteer_interests": [],
+            "session_start": datetime.now().isoformat()
+        }
 
     def get_session_memory(self, session_id: str) -> Dict[str, Any]:
         """Get enhanced session memory with preferences and context"""
-        if session_id not in self.conversation_memory:
-            self.conversation_memory[session_id] = {
-                "chat_history": [],
-                "user_preferences": {},
-                "discussed_events": [],
-                "interests": [],
-                "last_prayer_query": None,
-                "volunteer_interests": [],
-                "session_start": datetime.now().isoformat()
-            }
-        return self.conversation_memory[session_id]
+        return self.conversation_memory.get(session_id)
 
     def update_session_memory(self, session_id: str, message: str, response: str, context: Dict[str, Any] = None):
         """Update session memory with enhanced context tracking"""
@@ -199,8 +133,11 @@ Always be accurate with data from the database and suggest contacting mosque adm
         # Update context and preferences based on conversation
         if context:
             if "events" in context:
-                memory["discussed_events"].extend(context["events"])
-                memory["discussed_events"] = list(set(memory["discussed_events"]))[-5:]  # Keep last 5 unique events
+                for title in context["events"]:
+                    if title in memory["discussed_events"]:
+                        memory["discussed_events"].remove(title)
+                    memory["discussed_events"].append(title)
+                memory["discussed_events"] = memory["discussed_events"][-5:]  # Keep last 5 unique events
 
             if "prayer_times" in context:
                 memory["last_prayer_query"] = context["prayer_times"]
@@ -208,63 +145,76 @@ Always be accurate with data from the database and suggest contacting mosque adm
             if "volunteer" in context:
                 memory["volunteer_interests"].append(context["volunteer"])
 
+        self.conversation_memory.resize(session_id)
+
     def execute_function(self, function_name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Execute function calls with enhanced error handling and context"""
-        try:
-            logger.info(f"Executing function: {function_name} with args: {arguments}")
-
-            if function_name == "get_prayer_times":
-                date = arguments.get("date")
-                return get_prayer_times(date)
-
-            elif function_name == "search_events":
-                query = arguments.get("query", "")
-                date_from = arguments.get("date_from")
-                date_to = arguments.get("date_to")  # Future feature
-                limit = min(arguments.get("limit", 10), 20)  # Cap at 20
-
-                events = get_events(limit=limit, user_query=query, date_filter=date_from)
-                return {"events": events, "count": len(events)}
-
-            elif function_name == "get_event_details":
-                event_title = arguments.get("event_title")
-                event = get_event_by_title(event_title)
-                return event if event else {"error": "Event not found"}
-
-            elif function_name == "search_volunteers":
-                event_name = arguments.get("event_name")
-                if event_name:
-                    event = get_event_by_title(event_name)
-                    return event if event else {"error": "Event not found"}
-                else:
-                    opportunities = get_volunteer_opportunities()
-                    return {"opportunities": opportunities}
-
-            elif function_name == "get_conversation_context":
-                session_id = arguments.get("session_id")
-                return self.get_session_memory(session_id)
+        logger.info(f"Executing function: {function_name} with args: {arguments}")
+        if function_name not in AGENT_TOOLS:
+            return {"error": f"Unknown function: {function_name}"}
+        return self.tool_registry.execute(function_name, arguments)
 
-            else:
-                return {"error": f"Unknown function: {function_name}"}
+    def _build_messages(self, message: str, session_id: str) -> List[Dict[str, Any]]:
+        # Get session memory
+        memory = self.get_session_memory(session_id)
 
-        except Exception as e:
-            logger.error(f"Error executing function {function_name}: {e}")
-            return {"error": f"Function execution failed: {str(e)}"}
+        # Build conversation with context
+        messages = [{"role": "system", "content": self.system_prompt}]
+
+        # Add as much recent history as fits the token budget; older turns
+        # survive as the events and prayer date they were about
+        history = compact_history(memory["chat_history"], self.history_token_budget)
+        messages.extend(history.messages)
+        note = memory_note(
+            {"discussed_events": memory["discussed_events"], "last_prayer_date": memory["last_prayer_query"]},
+            history.summary,
+        )
+        dynamic = [current_context(datetime.now(MASQ_TIMEZONE)), note]
+        messages.append({"role": "system", "content": "\n\n".join(part for part in dynamic if part)})
+
+        # Add current message
+        messages.append({"role": "user", "content": message})
+        return messages
+
+    @staticmethod
+    def _function_calls(tool_calls) -> List[tuple]:
+        return [
+            (tool_call.id, tool_call.function.name, json.loads(tool_call.function.arguments))
+            for tool_call in tool_calls
+        ]
+
+    @staticmethod
+    def _memory_context(executions, memory: Dict[str, Any]) -> Dict[str, Any]:
+        """Events and prayer date a round of function results was about"""
+        updates = entity_updates(
+            executions,
+            {"discussed_events": memory["discussed_events"], "last_prayer_date": memory["last_prayer_query"]},
+        )
+        context: Dict[str, Any] = {}
+        if "discussed_events" in updates:
+            context["events"] = updates["discussed_events"]
+        if "last_prayer_date" in updates:
+            context["prayer_times"] = updates["last_prayer_date"]
+        return context
+
+    @staticmethod
+    def _function_results(executions) -> List[Dict[str, Any]]:
+        for execution in executions:
+            logger.info(f"Function {execution.name} took {execution.elapsed_ms:.1f} ms")
+        return [
+            {
+                "role": "tool",
+                "tool_call_id": execution.call_id,
+                "content": dumps(execution.result)
+            }
+            for execution in executions
+        ]
 
     def generate_response(self, message: str, session_id: str = "default") -> str:
         """Generate intelligent response with function calling and context awareness"""
         try:
-            # Get session memory
-            memory = self.get_session_memory(session_id)
-
-            # Build conversation with context
-            messages = [{"role": "system", "content": self.system_prompt}]
-
-            # Add recent conversation history
-            messages.extend(memory["chat_history"][-8:])  # Last 8 messages for context
-
-            # Add current message
-            messages.append({"role": "user", "content": message})
+            messages = self._build_messages(message, session_id)
+            context: Dict[str, Any] = {}
 
             # First API call - let model decide on function calls
             response = self.groq_client.chat.completions.create(
@@ -287,20 +237,15 @@ Always be accurate with data from the database and suggest contacting mosque adm
                     "tool_calls": choice.message.tool_calls
                 })
 
-                # Execute each function call
-                for tool_call in choice.message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-
-                    # Execute function
-                    function_result = self.execute_function(function_name, function_args)
-
-                    # Add function result to conversation
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": json.dumps(function_result)
-                    })
+                # Execute the function calls concurrently, results in call order
+                executions = execute_parallel(
+                    self._function_calls(choice.message.tool_calls),
+                    self.execute_function,
+                    self.tool_executor,
+                    self.tool_timeout,
+                )
+                messages.extend(self._function_results(executions))
+                context = self._memory_context(executions, self.get_session_memory(session_id))
 
                 # Get final response with function results
                 final_response = self.groq_client.chat.completions.create(
@@ -316,7 +261,59 @@ Always be accurate with data from the database and suggest contacting mosque adm
                 bot_response = choice.message.content
 
             # Update session memory
-            self.update_session_memory(session_id, message, bot_response)
+            self.update_session_memory(session_id, message, bot_response, context)
+
+            return bot_response
+
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            return "I apologize, I'm experiencing some difficulties right now. Please try again or contact the mosque administration for assistance."
+
+    async def generate_response_async(self, message: str, session_id: str = "default") -> str:
+        """Non-blocking generate_response: async Groq client, tools on a bounded executor"""
+        try:
+            messages = self._build_messages(message, session_id)
+            context: Dict[str, Any] = {}
+
+            response = await self.async_groq_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                tools=self.tools,
+                tool_choice="auto",
+                temperature=0.1,
+                max_tokens=600
+            )
+
+            choice = response.choices[0]
+
+            if choice.message.tool_calls:
+                messages.append({
+                    "role": "assistant",
+                    "content": choice.message.content,
+                    "tool_calls": choice.message.tool_calls
+                })
+
+                executions = await execute_parallel_async(
+                    self._function_calls(choice.message.tool_calls),
+                    self.execute_function,
+                    self.tool_executor,
+                    self.tool_timeout,
+                )
+                messages.extend(self._function_results(executions))
+                context = self._memory_context(executions, self.get_session_memory(session_id))
+
+                final_response = await self.async_groq_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.1,
+                    max_tokens=600
+                )
+
+                bot_response = final_response.choices[0].message.content
+            else:
+                bot_response = choice.message.content
+
+            self.update_session_memory(session_id, message, bot_response, context)
 
             return bot_response
 
@@ -337,7 +334,7 @@ Always be accurate with data from the database and suggest contacting mosque adm
             return {
                 "status": "healthy",
                 "model": self.model,
-                "active_sessions": len(self.conversation_memory),
+                "sessions": self.conversation_memory.stats(),
                 "tools_available": len(self.tools)
             }
         except Exception as e:
@@ -50,6 +50,16 @@ except Exception as e:
     logger.error(f"❌ Failed to initialize Groq Agent: {e}")
     ai_agent = None
 
+@app.on_event("startup")
+def start_session_sweeper():
+    if ai_agent:
+        ai_agent.conversation_memory.start_sweeper()
+
+@app.on_event("shutdown")
+def stop_session_sweeper():
+    if ai_agent:
+        ai_agent.conversation_memory.stop_sweeper()
+
 @app.get("/")
 async def root():
     return {
@@ -79,7 +89,7 @@ async def chat(chat_message: ChatMessage):
 
     try:
         # Generate response using advanced agent
-        response = ai_agent.generate_response(
+        response = await ai_agent.generate_response_async(
             message=chat_message.message,
             session_id=chat_message.session_id
         )
@@ -126,7 +136,7 @@ async def get_agent_stats():
         raise HTTPException(status_code=500, detail="AI Agent not available")
 
     return {
-        "active_sessions": len(ai_agent.conversation_memory),
+        "sessions": ai_agent.conversation_memory.stats(),
         "available_tools": len(ai_agent.tools),
         "model": ai_agent.model,
         "uptime": "Active"
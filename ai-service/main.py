@@ -1,27 +1,50 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from config import Settings
-from memory import SessionStore
+from memory import create_session_store
+from metrics import metrics
 from providers.base import ChatResult
 from providers.groq import GroqChatProvider
-from tools import ToolRegistry
-from shared.database import get_events, get_volunteer_opportunities
+from response_cache import ResponseCache
+from router import IntentRouter
+from tools import ToolRegistry, tool_context
+from shared.database import (
+    database_health,
+    event_cache_stats,
+    get_events,
+    get_volunteer_opportunities,
+    get_write_queue,
+)
+from shared.indexes import index_report, run_index_advisor
 from shared.prayer_times import get_prayer_times
+from shared.sql_templates import query_catalog
+from shared.serialization import dumps, dumps_bytes
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 settings = Settings()
-tool_registry = ToolRegistry(allowed_sql_operations=settings.allowed_sql_operations)
-session_store = SessionStore(history_limit=settings.max_history_messages)
+tool_registry = ToolRegistry(
+    allowed_sql_operations=settings.allowed_sql_operations,
+    fast_path_tools=settings.fast_path_tools,
+)
+session_store = create_session_store(settings.session_backend, settings.max_history_messages)
+intent_router = IntentRouter(tool_registry, session_store) if settings.intent_router else None
+response_cache = ResponseCache(
+    maxsize=settings.response_cache_size,
+    ttl=settings.response_cache_ttl,
+    similarity=settings.response_cache_similarity,
+)
 
 if settings.ai_provider != "groq":
     logger.warning(
@@ -36,7 +59,14 @@ except Exception as exc:  # noqa: BLE001
     logger.error(f"Unable to initialize Groq provider: {exc}")
     chat_provider = None
 
-app = FastAPI(title="MAS Queens AI Assistant", version="2.0.0")
+class FastJSONResponse(JSONResponse):
+    """JSON responses encoded by shared.serialization (orjson when installed)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+
+app = FastAPI(title="MAS Queens AI Assistant", version="2.0.0", default_response_class=FastJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://localhost:3001"],
@@ -59,6 +89,29 @@ class ChatResponse(BaseModel):
     tools_used: List[str]
 
 
+@app.on_event("startup")
+def start_session_sweeper() -> None:
+    session_store.start_sweeper()
+
+
+@app.on_event("startup")
+def prepare_database() -> None:
+    # Every schema change the service makes to users.db happens here, never on a request
+    run_index_advisor(create=settings.ensure_indexes)
+    if settings.sql_table_versions:
+        query_catalog.install_table_versions()
+
+
+@app.on_event("shutdown")
+def close_session_store() -> None:
+    session_store.close()
+
+
+@app.on_event("shutdown")
+def flush_queued_writes() -> None:
+    get_write_queue().close()
+
+
 @app.get("/")
 async def root() -> Dict[str, Any]:
     return {
@@ -69,16 +122,34 @@ async def root() -> Dict[str, Any]:
 
 
 @app.get("/health")
-async def health_check() -> Dict[str, Any]:
+def health_check() -> Dict[str, Any]:
     if not chat_provider:
         raise HTTPException(status_code=500, detail="Groq provider unavailable")
     return {
         "status": "healthy",
         "model": settings.groq_model,
-        "active_sessions": session_store.active_sessions(),
+        "sessions": session_store.stats(),
+        "database": database_health(),
+        "event_cache": event_cache_stats(),
+        "response_cache": response_cache.stats(),
     }
 
 
+@app.get("/diagnostics/database")
+def database_diagnostics(refresh: bool = False) -> Dict[str, Any]:
+    return index_report(refresh=refresh)
+
+
+@app.get("/stats")
+def stats() -> Dict[str, Any]:
+    snapshot = metrics.snapshot()
+    if intent_router:
+        snapshot["router"] = intent_router.stats()
+    snapshot["response_cache"] = response_cache.stats()
+    snapshot["sql_templates"] = query_catalog.stats()
+    return snapshot
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(chat_message: ChatMessage) -> ChatResponse:
     if not chat_provider:
@@ -86,12 +157,16 @@ async def chat(chat_message: ChatMessage) -> ChatResponse:
 
     session_id = chat_message.session_id or "default"
 
-    # Set context for tool execution (user info, etc.)
-    if chat_message.context:
-        tool_registry.set_context(chat_message.context)
-
+    first_turn = await asyncio.to_thread(_is_first_turn, session_id, chat_message.context)
     try:
-        result: ChatResult = chat_provider.generate(chat_message.message, session_id)
+        # User info (user_email, ...) for tools acting on the caller's behalf, this request only
+        with tool_context(chat_message.context):
+            result: Optional[ChatResult] = await _answer_locally(chat_message.message, session_id, first_turn)
+            if result is None:
+                versions = await asyncio.to_thread(response_cache.versions) if first_turn else None
+                result = await chat_provider.generate_async(chat_message.message, session_id)
+                if first_turn:
+                    _remember(chat_message.message, result, versions)
     except Exception as exc:  # noqa: BLE001
         logger.error(f"Chat processing error: {exc}")
         raise HTTPException(status_code=500, detail="Failed to process chat message")
@@ -101,30 +176,117 @@ async def chat(chat_message: ChatMessage) -> ChatResponse:
         context={
             "timestamp": datetime.utcnow().isoformat(),
             "session_id": session_id,
+            "tool_timings": result.tool_timings,
+            "tools_wall_ms": result.tools_wall_ms,
+            "rounds": result.rounds,
+            "prompt_tokens": result.prompt_tokens,
+            "completion_tokens": result.completion_tokens,
+            "prompt_tokens_estimate": result.prompt_tokens_estimate,
+            "latency_ms": result.latency_ms,
+            "stop_reason": result.stop_reason,
         },
         sources=["MAS Queens AI Assistant"],
         tools_used=result.used_tools,
     )
 
 
+def _is_first_turn(session_id: str, context: Optional[Dict[str, Any]]) -> bool:
+    """Only stateless first turns can share answers with other sessions"""
+    session = session_store.peek(session_id)
+    return not context and not (session and session.history)
+
+
+def _cached_answer(message: str, session_id: str) -> Optional[ChatResult]:
+    result = response_cache.get(message)
+    if result:
+        session_store.append(session_id, "user", message)
+        session_store.append(session_id, "assistant", result.message)
+    return result
+
+
+async def _answer_locally(message: str, session_id: str, first_turn: bool) -> Optional[ChatResult]:
+    """Answer from the intent router or the response cache; None means ask the model"""
+    # Tools and cache validation touch sqlite, so keep them off the event loop
+    if intent_router:
+        result = await asyncio.to_thread(intent_router.answer, message, session_id)
+        if result:
+            return result
+    if first_turn:
+        return await asyncio.to_thread(_cached_answer, message, session_id)
+    return None
+
+
+def _remember(message: str, result: ChatResult, versions: Dict[str, Any]) -> None:
+    response_cache.put(message, result, tool_registry.dependencies(result.used_tools), versions)
+
+
+async def _result_events(result: ChatResult):
+    yield {"event": "token", "data": {"content": result.message}}
+    yield result.done_event(time_to_first_token_ms=result.latency_ms)
+
+
+@app.post("/chat/stream")
+async def chat_stream(chat_message: ChatMessage) -> StreamingResponse:
+    """Server-Sent Events: tool_start/tool_result progress, token deltas, then done"""
+    if not chat_provider:
+        raise HTTPException(status_code=500, detail="AI provider not available")
+
+    session_id = chat_message.session_id or "default"
+
+    first_turn = await asyncio.to_thread(_is_first_turn, session_id, chat_message.context)
+
+    async def event_stream():
+        # The generator runs after this handler returns, so it scopes the context itself
+        with tool_context(chat_message.context):
+            local = await _answer_locally(chat_message.message, session_id, first_turn)
+            versions = await asyncio.to_thread(response_cache.versions) if first_turn and not local else None
+            events = _result_events(local) if local else chat_provider.stream(chat_message.message, session_id)
+            async for event in events:
+                if event["event"] == "done":
+                    event["data"]["session_id"] = session_id
+                    if versions is not None:
+                        done = event["data"]
+                        _remember(
+                            chat_message.message,
+                            ChatResult(
+                                message=done["message"],
+                                used_tools=done["tools_used"],
+                                tool_timings=done["tool_timings"],
+                                rounds=done["rounds"],
+                                stop_reason=done["stop_reason"],
+                            ),
+                            versions,
+                        )
+                yield f"event: {event['event']}\ndata: {dumps(event['data'])}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Data endpoints are plain functions: FastAPI runs them in its threadpool so
+# sqlite and prayer time lookups never block the event loop.
 @app.get("/prayer-times")
-async def prayer_times(date: Optional[str] = None) -> Dict[str, Any]:
+def prayer_times(date: Optional[str] = None) -> Dict[str, Any]:
     return get_prayer_times(date)
 
 
 @app.get("/events")
-async def events(limit: int = 10, query: Optional[str] = None) -> Dict[str, Any]:
+def events(limit: int = 10, query: Optional[str] = None) -> FastJSONResponse:
+    # Returned directly, so the Event records skip FastAPI's jsonable_encoder pass
     events_list = get_events(limit=limit, user_query=query or "")
-    return {"events": events_list, "count": len(events_list)}
+    return FastJSONResponse({"events": events_list, "count": len(events_list)})
 
 
 @app.get("/volunteer-opportunities")
-async def volunteer_opportunities() -> Dict[str, Any]:
+def volunteer_opportunities() -> Dict[str, Any]:
     opportunities = get_volunteer_opportunities()
     return {"opportunities": opportunities, "count": len(opportunities)}
 
 
 @app.delete("/sessions/{session_id}")
-async def reset_session(session_id: str) -> Dict[str, str]:
+def reset_session(session_id: str) -> Dict[str, str]:
     session_store.reset(session_id)
     return {"status": "cleared"}
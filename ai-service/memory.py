@@ -1,33 +1,633 @@
 from __future__ import annotations
 
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from shared.database import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX_COUNT = int(os.getenv("AI_SESSION_MAX", "10000"))
+SESSION_MAX_BYTES = int(os.getenv("AI_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+SESSION_IDLE_TTL = float(os.getenv("AI_SESSION_TTL", "1800"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("AI_SESSION_SWEEP_INTERVAL", "60"))
+SESSION_DB_PATH = Path(os.getenv("AI_SESSION_DB", str(Path(__file__).parent / "sessions.db")))
+SESSION_WRITE_BATCH = int(os.getenv("AI_SESSION_WRITE_BATCH", "64"))
+SESSION_FLUSH_INTERVAL = int(os.getenv("AI_SESSION_FLUSH_MS", "50")) / 1000
+
+V = TypeVar("V")
+
+
+# Per-message framing the chat template adds around each message's content
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_QUESTIONS = 5
+SUMMARY_QUESTION_WORDS = 12
 
 
 @dataclass
 class Session:
     history: List[Dict[str, str]] = field(default_factory=list)
-    attributes: Dict[str, str] = field(default_factory=dict)
+    # Entity memory that outlives the history window ("discussed_events", "last_prayer_date")
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast token estimate: about four characters per token for Llama-style
+    BPE vocabularies on English, and never fewer tokens than words."""
+    return max(len(text.split()), (len(text) + 3) // 4)
+
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(message.get("content") or "")
+
+
+@dataclass
+class CompactedHistory:
+    messages: List[Dict[str, str]]
+    tokens: int
+    dropped: List[Dict[str, str]]
+    truncated: int = 0
+
+    @property
+    def summary(self) -> str:
+        """Rolling summary of the turns that no longer fit: the user's last few questions"""
+        questions = []
+        for message in self.dropped:
+            if message["role"] != "user":
+                continue
+            words = message["content"].split()
+            clipped = " ".join(words[:SUMMARY_QUESTION_WORDS])
+            questions.append(f'"{clipped}..."' if len(words) > SUMMARY_QUESTION_WORDS else f'"{clipped}"')
+        if not questions:
+            return ""
+        return "Earlier the user asked: " + "; ".join(questions[-SUMMARY_QUESTIONS:]) + "."
+
+
+def compact_history(history: List[Dict[str, str]], token_budget: int) -> CompactedHistory:
+    """Keep the newest messages that fit in ``token_budget`` estimated tokens.
+
+    A message longer than half the budget is cut down to that size, so one
+    pasted wall of text can't push out the rest of the conversation. The kept
+    window never starts with an assistant reply whose question was dropped.
+    """
+    per_message = max(1, token_budget // 2)
+    kept: List[Dict[str, str]] = []
+    used = 0
+    truncated = 0
+    for message in reversed(history):
+        content = message["content"] or ""
+        if estimate_tokens(content) > per_message:
+            content = content[: per_message * 4].rsplit(" ", 1)[0] + " ... [truncated]"
+            truncated += 1
+        cost = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content)
+        if used + cost > token_budget:
+            break
+        kept.append({"role": message["role"], "content": content})
+        used += cost
+
+    kept.reverse()
+    if kept and kept[0]["role"] == "assistant" and len(kept) < len(history):
+        used -= message_tokens(kept.pop(0))
+    return CompactedHistory(kept, used, history[: len(history) - len(kept)], truncated)
+
+
+def memory_note(attributes: Dict[str, Any], summary: str = "") -> str:
+    """Entity memory and rolling summary as one system note ("" when empty)"""
+    lines = []
+    if attributes.get("discussed_events"):
+        lines.append("Events discussed: " + "; ".join(attributes["discussed_events"]) + ".")
+    if attributes.get("last_prayer_date"):
+        lines.append(f"Last prayer times looked up: {attributes['last_prayer_date']}.")
+    if summary:
+        lines.append(summary)
+    if not lines:
+        return ""
+    return "Conversation memory from earlier turns:\n" + "\n".join(lines)
+
+
+def approx_size(value: Any) -> int:
+    """Rough bytes held by a JSON-like value: string lengths plus per-object overhead"""
+    if isinstance(value, str):
+        return 49 + len(value)
+    if isinstance(value, dict):
+        return 64 + sum(approx_size(key) + approx_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return 56 + sum(approx_size(item) for item in value)
+    if isinstance(value, Session):
+        return approx_size(value.history) + approx_size(value.attributes)
+    return 28
+
+
+def run_periodically(
+    sweep: Callable[[], int], interval: float, stop: threading.Event, name: str
+) -> Optional[threading.Thread]:
+    """Call ``sweep`` every ``interval`` seconds on a daemon thread until ``stop`` is set"""
+    if interval <= 0:
+        return None
+
+    def run() -> None:
+        while not stop.wait(interval):
+            try:
+                evicted = sweep()
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"Session sweep failed: {exc}")
+                continue
+            if evicted:
+                logger.info(f"Swept {evicted} sessions")
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+class SessionTable(Generic[V]):
+    """Per-session values with LRU order, idle expiry and size limits.
+
+    ``get`` creates missing sessions with ``factory`` and marks them as
+    recently used. Callers that mutate a value in place call ``resize`` so the
+    byte total stays accurate. Once there are more than ``max_sessions``
+    sessions, or their approximate size passes ``max_bytes``, the least
+    recently used ones are evicted. Sessions idle for ``idle_ttl`` seconds are
+    removed on access and by ``sweep``, which ``start_sweeper`` runs on a
+    daemon thread.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], V],
+        *,
+        max_sessions: int = SESSION_MAX_COUNT,
+        max_bytes: int = SESSION_MAX_BYTES,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        sizer: Callable[[V], int] = approx_size,
+    ):
+        self._factory = factory
+        self._sizer = sizer
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._values: "OrderedDict[str, V]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._evictions = {"lru": 0, "bytes": 0, "idle": 0}
+        self._sweeps = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _idle(self, key: str, now: float) -> bool:
+        return self.idle_ttl > 0 and now - self._last_used[key] > self.idle_ttl
+
+    def _drop(self, key: str, reason: Optional[str] = None) -> None:
+        del self._values[key]
+        del self._last_used[key]
+        self._bytes -= self._sizes.pop(key)
+        if reason:
+            self._evictions[reason] += 1
+
+    def _enforce_limits(self, keep: str) -> None:
+        while len(self._values) > self.max_sessions:
+            self._drop(next(iter(self._values)), "lru")
+        while self._bytes > self.max_bytes and len(self._values) > 1:
+            oldest = next(iter(self._values))
+            if oldest == keep:
+                break
+            self._drop(oldest, "bytes")
+
+    def get(self, key: str) -> V:
+        with self._lock:
+            now = time.monotonic()
+            if key in self._values and self._idle(key, now):
+                self._drop(key, "idle")
+            if key not in self._values:
+                value = self._factory()
+                self._values[key] = value
+                self._sizes[key] = self._sizer(value)
+                self._bytes += self._sizes[key]
+            else:
+                self._values.move_to_end(key)
+            self._last_used[key] = now
+            self._enforce_limits(key)
+            return self._values[key]
+
+    def peek(self, key: str) -> Optional[V]:
+        """The live value for ``key`` without creating or touching it"""
+        with self._lock:
+            if key not in self._values or self._idle(key, time.monotonic()):
+                return None
+            return self._values[key]
+
+    def resize(self, key: str) -> None:
+        """Recount a session's bytes after its value changed in place"""
+        with self._lock:
+            if key not in self._values:
+                return
+            size = self._sizer(self._values[key])
+            self._bytes += size - self._sizes[key]
+            self._sizes[key] = size
+            self._enforce_limits(key)
+
+    def pop(self, key: str) -> Optional[V]:
+        with self._lock:
+            if key not in self._values:
+                return None
+            value = self._values[key]
+            self._drop(key)
+            return value
+
+    def sweep(self) -> int:
+        """Remove idle sessions; returns how many were evicted"""
+        with self._lock:
+            now = time.monotonic()
+            idle = [key for key in self._values if self._idle(key, now)]
+            for key in idle:
+                self._drop(key, "idle")
+            self._sweeps += 1
+            return len(idle)
+
+    def start_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL) -> None:
+        if not (self._sweeper and self._sweeper.is_alive()):
+            self._stop.clear()
+            self._sweeper = run_periodically(self.sweep, interval, self._stop, "session-sweeper")
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        if self._sweeper:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key: object) -> bool:
+        return self.peek(key) is not None if isinstance(key, str) else False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": len(self._values),
+                "bytes": self._bytes,
+                "largest_bytes": max(self._sizes.values(), default=0),
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "idle_ttl": self.idle_ttl,
+                "evictions": dict(self._evictions),
+                "sweeps": self._sweeps,
+            }
 
 
 class SessionStore:
+    """Conversation history per session_id; see the implementations below"""
+
     def __init__(self, history_limit: int = 8):
-        self._sessions: Dict[str, Session] = {}
         self._history_limit = history_limit
 
+    def get(self, session_id: str) -> Session:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def peek(self, session_id: str) -> Optional[Session]:  # pragma: no cover - interface
+        """The session if it exists, without creating or touching it"""
+        raise NotImplementedError
+
+    def append(self, session_id: str, role: str, content: str) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def remember(self, session_id: str, attributes: Dict[str, Any]) -> None:  # pragma: no cover - interface
+        """Merge ``attributes`` into the session's entity memory"""
+        raise NotImplementedError
+
+    def reset(self, session_id: str) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def active_sessions(self) -> int:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def start_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL) -> None:
+        pass
+
+    def stop_sweeper(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.stop_sweeper()
+
+
+class InMemorySessionStore(SessionStore):
+    """Sessions in this process only: fastest, but not shared between workers"""
+
+    def __init__(self, history_limit: int = 8, **limits: Any):
+        super().__init__(history_limit)
+        self._sessions: SessionTable[Session] = SessionTable(Session, **limits)
+
     def get(self, session_id: str) -> Session:
-        if session_id not in self._sessions:
-            self._sessions[session_id] = Session()
-        return self._sessions[session_id]
+        return self._sessions.get(session_id)
+
+    def peek(self, session_id: str) -> Optional[Session]:
+        return self._sessions.peek(session_id)
 
     def append(self, session_id: str, role: str, content: str) -> None:
         session = self.get(session_id)
         session.history.append({"role": role, "content": content})
         if len(session.history) > self._history_limit:
             session.history = session.history[-self._history_limit:]
+        self._sessions.resize(session_id)
+
+    def remember(self, session_id: str, attributes: Dict[str, Any]) -> None:
+        self.get(session_id).attributes.update(attributes)
+        self._sessions.resize(session_id)
 
     def reset(self, session_id: str) -> None:
-        self._sessions.pop(session_id, None)
+        self._sessions.pop(session_id)
 
     def active_sessions(self) -> int:
         return len(self._sessions)
+
+    def start_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL) -> None:
+        self._sessions.start_sweeper(interval)
+
+    def stop_sweeper(self) -> None:
+        self._sessions.stop_sweeper()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", **self._sessions.stats()}
+
+
+SQLITE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+        session_id TEXT PRIMARY KEY,
+        attributes TEXT NOT NULL DEFAULT '{}',
+        updated_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated_at ON chat_sessions(updated_at)",
+    """
+    CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages(session_id, id)",
+]
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions in a SQLite file shared by every worker process that opens it.
+
+    Appends are queued and written by a background thread in batches (one
+    transaction per ``batch_size`` messages or per ``flush_interval``
+    seconds, whichever comes first). Reads in this process see queued
+    messages immediately. Other workers see them once they are flushed,
+    which happens well before the next chat turn arrives. The file can be
+    ``users.db`` itself, since the tables are prefixed ``chat_``.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        history_limit: int = 8,
+        *,
+        max_sessions: int = SESSION_MAX_COUNT,
+        idle_ttl: float = SESSION_IDLE_TTL,
+        batch_size: int = SESSION_WRITE_BATCH,
+        flush_interval: float = SESSION_FLUSH_INTERVAL,
+    ):
+        super().__init__(history_limit)
+        self.path = Path(path)
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pool = ConnectionPool(self.path)
+        with self._pool.writer() as conn:
+            for statement in SQLITE_SCHEMA:
+                conn.execute(statement)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(chat_sessions)")}
+            if "attributes" not in columns:
+                conn.execute("ALTER TABLE chat_sessions ADD COLUMN attributes TEXT NOT NULL DEFAULT '{}'")
+
+        self._pending: List[Tuple[str, str, str, float]] = []
+        self._queued = threading.Condition()
+        # Held while a batch moves from the queue to the database, so readers
+        # never see it in neither place
+        self._flush_lock = threading.RLock()
+        self._closed = False
+        self._flushes = 0
+        self._flushed_messages = 0
+        self._largest_batch = 0
+        self._evictions = {"lru": 0, "idle": 0}
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self._writer = threading.Thread(target=self._write_behind, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _write_behind(self) -> None:
+        while True:
+            with self._queued:
+                self._queued.wait_for(lambda: self._pending or self._closed)
+                self._queued.wait_for(
+                    lambda: len(self._pending) >= self.batch_size or self._closed,
+                    timeout=self.flush_interval,
+                )
+                if self._closed and not self._pending:
+                    return
+            self.flush()
+
+    def flush(self) -> int:
+        """Write queued messages now; returns how many were written"""
+        with self._flush_lock:
+            with self._queued:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            touched: Dict[str, float] = {}
+            for session_id, _, _, created_at in batch:
+                touched[session_id] = created_at
+            try:
+                with self._pool.writer() as conn:
+                    conn.executemany(
+                        "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                        batch,
+                    )
+                    conn.executemany(
+                        """
+                        INSERT INTO chat_sessions (session_id, updated_at) VALUES (?, ?)
+                        ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at
+                        """,
+                        touched.items(),
+                    )
+                    # Keep only the newest history_limit messages per session
+                    conn.executemany(
+                        """
+                        DELETE FROM chat_messages WHERE session_id = ? AND id <= (
+                            SELECT id FROM chat_messages WHERE session_id = ?
+                            ORDER BY id DESC LIMIT 1 OFFSET ?
+                        )
+                        """,
+                        [(session_id, session_id, self._history_limit) for session_id in touched],
+                    )
+            except Exception as e:
+                logger.error(f"Error flushing {len(batch)} session messages: {e}")
+                with self._queued:
+                    self._pending[:0] = batch
+                return 0
+
+            self._flushes += 1
+            self._flushed_messages += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            return len(batch)
+
+    def _load(self, session_id: str) -> Optional[Session]:
+        with self._flush_lock:
+            with self._pool.reader() as conn:
+                row = conn.execute(
+                    "SELECT attributes, updated_at FROM chat_sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                rows = conn.execute(
+                    """
+                    SELECT role, content FROM (
+                        SELECT id, role, content FROM chat_messages
+                        WHERE session_id = ? ORDER BY id DESC LIMIT ?
+                    ) ORDER BY id
+                    """,
+                    (session_id, self._history_limit),
+                ).fetchall()
+            with self._queued:
+                queued = [(role, content) for owner, role, content, _ in self._pending if owner == session_id]
+
+        if row is None and not queued:
+            return None
+        if row is not None and not queued and self.idle_ttl > 0 and time.time() - row["updated_at"] > self.idle_ttl:
+            self.reset(session_id)
+            with self._flush_lock:
+                self._evictions["idle"] += 1
+            return None
+
+        history = [{"role": role, "content": content} for role, content in rows]
+        history.extend({"role": role, "content": content} for role, content in queued)
+        attributes = json.loads(row["attributes"]) if row is not None else {}
+        return Session(history=history[-self._history_limit:], attributes=attributes)
+
+    def get(self, session_id: str) -> Session:
+        return self._load(session_id) or Session()
+
+    def peek(self, session_id: str) -> Optional[Session]:
+        return self._load(session_id)
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        with self._queued:
+            if self._closed:
+                raise RuntimeError("Session store is closed")
+            self._pending.append((session_id, role, content, time.time()))
+            self._queued.notify()
+
+    def remember(self, session_id: str, attributes: Dict[str, Any]) -> None:
+        # Rare (only after tool calls), so written straight through
+        session = self._load(session_id) or Session()
+        session.attributes.update(attributes)
+        with self._pool.writer() as conn:
+            conn.execute(
+                """
+                INSERT INTO chat_sessions (session_id, attributes, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET attributes = excluded.attributes
+                """,
+                (session_id, json.dumps(session.attributes), time.time()),
+            )
+
+    def reset(self, session_id: str) -> None:
+        with self._flush_lock:
+            with self._queued:
+                self._pending = [entry for entry in self._pending if entry[0] != session_id]
+            with self._pool.writer() as conn:
+                conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+
+    def sweep(self) -> int:
+        """Delete idle sessions and the oldest ones past max_sessions"""
+        self.flush()
+        with self._flush_lock, self._pool.writer() as conn:
+            idle = []
+            if self.idle_ttl > 0:
+                idle = conn.execute(
+                    "SELECT session_id FROM chat_sessions WHERE updated_at < ?", (time.time() - self.idle_ttl,)
+                ).fetchall()
+            overflow = conn.execute(
+                "SELECT session_id FROM chat_sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?",
+                (self.max_sessions,),
+            ).fetchall()
+            idle_ids = {row[0] for row in idle}
+            overflow_ids = {row[0] for row in overflow} - idle_ids
+            doomed = [(session_id,) for session_id in idle_ids | overflow_ids]
+            conn.executemany("DELETE FROM chat_messages WHERE session_id = ?", doomed)
+            conn.executemany("DELETE FROM chat_sessions WHERE session_id = ?", doomed)
+            self._evictions["idle"] += len(idle_ids)
+            self._evictions["lru"] += len(overflow_ids)
+            return len(doomed)
+
+    def start_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL) -> None:
+        if not (self._sweeper and self._sweeper.is_alive()):
+            self._stop.clear()
+            self._sweeper = run_periodically(self.sweep, interval, self._stop, "session-sweeper")
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        if self._sweeper:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def active_sessions(self) -> int:
+        with self._pool.reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._pool.reader() as conn:
+            active = conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+            stored_bytes = conn.execute("SELECT COALESCE(SUM(length(content)), 0) FROM chat_messages").fetchone()[0]
+        with self._queued:
+            pending = len(self._pending)
+        return {
+            "backend": "sqlite",
+            "path": str(self.path),
+            "active": active,
+            "bytes": stored_bytes,
+            "max_sessions": self.max_sessions,
+            "idle_ttl": self.idle_ttl,
+            "evictions": dict(self._evictions),
+            "pending_writes": pending,
+            "flushes": self._flushes,
+            "avg_batch": round(self._flushed_messages / self._flushes, 2) if self._flushes else 0.0,
+            "largest_batch": self._largest_batch,
+        }
+
+    def close(self) -> None:
+        self.stop_sweeper()
+        with self._queued:
+            self._closed = True
+            self._queued.notify_all()
+        self._writer.join(timeout=5)
+        self.flush()
+        self._pool.close()
+
+
+def create_session_store(backend: str, history_limit: int, path: Optional[Path] = None) -> SessionStore:
+    """Session store for AI_SESSION_BACKEND: "memory" (default) or "sqlite" """
+    if backend == "sqlite":
+        return SqliteSessionStore(path or SESSION_DB_PATH, history_limit)
+    if backend != "memory":
+        logger.warning(f"Unknown session backend {backend!r}; using memory")
+    return InMemorySessionStore(history_limit)
@@ -1,17 +1,122 @@
 from __future__ import annotations
 
+import asyncio
+import time
 from dataclasses import dataclass, field
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from config import Settings
 from memory import SessionStore
-from tools import ToolRegistry
+from tools import ToolExecution, ToolRegistry
 
 
 @dataclass
 class ChatResult:
     message: str
     used_tools: List[str] = field(default_factory=list)
+    tool_timings: List[Dict[str, Any]] = field(default_factory=list)
+    tools_wall_ms: float = 0.0
+    rounds: int = 1
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: float = 0.0
+    stop_reason: str = "answered"
+    # Estimated size of the first prompt (system prompt, memory, history, message)
+    prompt_tokens_estimate: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def done_event(self, time_to_first_token_ms: Optional[float] = None) -> Dict[str, Any]:
+        """The final "done" stream event; every stream path sends these fields"""
+        return {
+            "event": "done",
+            "data": {
+                "message": self.message,
+                "tools_used": self.used_tools,
+                "tool_timings": self.tool_timings,
+                "rounds": self.rounds,
+                "stop_reason": self.stop_reason,
+                "prompt_tokens_estimate": self.prompt_tokens_estimate,
+                "time_to_first_token_ms": time_to_first_token_ms,
+                "total_ms": self.latency_ms,
+            },
+        }
+
+
+@dataclass
+class AgentLoop:
+    """Bookkeeping for one request's tool loop: rounds, token usage and budgets.
+
+    Each round is one completion. Tools are offered until the model answers
+    without them, or until the round, token or time budget runs out; then
+    one last completion without tools forces an answer.
+    """
+
+    max_tool_rounds: int
+    token_budget: int = 0
+    time_budget_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+    rounds: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    stop_reason: str = "answered"
+    executions: List[ToolExecution] = field(default_factory=list)
+    tools_wall_ms: float = 0.0
+    prompt_tokens_estimate: int = 0
+    # Tools offered on each round; None means all of them
+    tool_names: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AgentLoop":
+        return cls(
+            max_tool_rounds=settings.max_tool_rounds,
+            token_budget=settings.token_budget,
+            time_budget_seconds=settings.time_budget_seconds,
+        )
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def next_round(self) -> bool:
+        """Start a round and return whether tools may still be offered"""
+        self.rounds += 1
+        if self.rounds > self.max_tool_rounds:
+            self.stop_reason = "max_rounds"
+        elif self.token_budget and self.prompt_tokens + self.completion_tokens >= self.token_budget:
+            self.stop_reason = "token_budget"
+        elif self.time_budget_seconds and self.elapsed_ms >= self.time_budget_seconds * 1000:
+            self.stop_reason = "time_budget"
+        else:
+            return True
+        return False
+
+    def add_usage(self, usage: Any) -> None:
+        """Count tokens from a completion's usage block, when the API reports one"""
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+    def add_executions(self, executions: List[ToolExecution], wall_ms: float) -> None:
+        self.executions.extend(executions)
+        self.tools_wall_ms += wall_ms
+
+    def result(self, message: str) -> ChatResult:
+        return ChatResult(
+            message=message,
+            used_tools=[execution.name for execution in self.executions],
+            tool_timings=[execution.timing() for execution in self.executions],
+            tools_wall_ms=round(self.tools_wall_ms, 3),
+            rounds=self.rounds,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            latency_ms=round(self.elapsed_ms, 3),
+            stop_reason=self.stop_reason,
+            prompt_tokens_estimate=self.prompt_tokens_estimate,
+        )
 
 
 class ChatProvider:
@@ -22,3 +127,17 @@ class ChatProvider:
 
     def generate(self, message: str, session_id: str) -> ChatResult:  # pragma: no cover - interface
         raise NotImplementedError
+
+    async def generate_async(self, message: str, session_id: str) -> ChatResult:
+        """Non-blocking variant of generate; providers override with a native async path"""
+        return await asyncio.to_thread(self.generate, message, session_id)
+
+    async def stream(self, message: str, session_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield chat events ({"event": ..., "data": {...}}) ending with "done".
+
+        Providers that can stream tokens override this; the default sends the
+        whole reply as a single token event.
+        """
+        result = await self.generate_async(message, session_id)
+        yield {"event": "token", "data": {"content": result.message}}
+        yield result.done_event(time_to_first_token_ms=result.latency_ms)
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import logging
-from typing import List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
-from groq import Groq
+from groq import AsyncGroq, Groq
 
-from config import Settings
-from memory import SessionStore
-from providers.base import ChatProvider, ChatResult
-from tools import ToolRegistry
+from config import Settings, current_context
+from memory import SessionStore, compact_history, memory_note, message_tokens
+from metrics import metrics
+from providers.base import AgentLoop, ChatProvider, ChatResult
+from shared.prayer_calculator import MASQ_TIMEZONE
+from shared.serialization import dumps
+from tools import ToolCall, ToolExecution, ToolRegistry, entity_updates
 
 logger = logging.getLogger(__name__)
 
@@ -19,70 +27,321 @@ class GroqChatProvider(ChatProvider):
         super().__init__(settings, session_store, tool_registry)
         settings.ensure_groq_credentials()
         self._client = Groq(api_key=settings.groq_api_key)
+        self._async_client = AsyncGroq(api_key=settings.groq_api_key)
+        # Tools hit sqlite and prayer time lookups; run them off the event loop
+        self._tool_executor = ThreadPoolExecutor(
+            max_workers=settings.tool_workers,
+            thread_name_prefix="chat-tools",
+        )
+        self._prefixes: Set[str] = set()
 
-    def generate(self, message: str, session_id: str) -> ChatResult:
+    def _prompt_prefix(self, tool_names: Optional[Tuple[str, ...]]) -> str:
+        """Fingerprint of everything before the history: system prompt and tool schemas.
+
+        Providers cache prompt prefixes, so this should stay the same across
+        requests on the same topic; counts of reuses and changes are in /stats.
+        """
+        prompt_hash = hashlib.sha256(self.settings.system_prompt.encode()).hexdigest()[:16]
+        tools = ",".join(tool_names) if tool_names is not None else "*"
+        fingerprint = f"{prompt_hash}:{self.tool_registry.schema_fingerprint()}:{tools}"
+        if fingerprint in self._prefixes:
+            metrics.increment("chat.prefix_reused")
+        else:
+            metrics.increment("chat.prefix_changed")
+            self._prefixes.add(fingerprint)
+        return fingerprint
+
+    def _build_conversation(self, message: str, session_id: str, loop: AgentLoop) -> List[Dict[str, Any]]:
+        """Static system prompt, recent history that fits the token budget, then
+        one system message with everything that changes per request (date and
+        time, entity memory) right before the user's message, so the prefix
+        stays cacheable."""
         session = self.session_store.get(session_id)
+        history = compact_history(session.history, self.settings.history_token_budget)
         conversation = [{"role": "system", "content": self.settings.system_prompt}]
-        if session.history:
-            conversation.extend(session.history)
+        conversation.extend(history.messages)
+        dynamic = [current_context(datetime.now(MASQ_TIMEZONE)), memory_note(session.attributes, history.summary)]
+        conversation.append({"role": "system", "content": "\n\n".join(part for part in dynamic if part)})
         conversation.append({"role": "user", "content": message})
 
-        try:
-            initial = self._client.chat.completions.create(
-                model=self.settings.groq_model,
-                messages=conversation,
-                tools=self.tool_registry.as_openai_tools(),
-                tool_choice="auto",
-                temperature=self.settings.temperature,
-                max_tokens=self.settings.max_output_tokens,
-            )
-        except Exception as exc:  # noqa: BLE001
-            logger.error(f"Groq completion failed: {exc}")
-            raise
+        if self.settings.tool_subsetting:
+            loop.tool_names = self.tool_registry.relevant_tools(message)
+        self._prompt_prefix(loop.tool_names)
+        loop.prompt_tokens_estimate = sum(message_tokens(entry) for entry in conversation)
+        metrics.increment("chat.tool_schema_tokens_estimate", self.tool_registry.schema_size(loop.tool_names) // 4)
+        metrics.increment("chat.prompt_tokens_estimate", loop.prompt_tokens_estimate)
+        metrics.increment("chat.prefix_tokens_estimate", message_tokens(conversation[0]))
+        if history.dropped:
+            metrics.increment("chat.history_dropped", len(history.dropped))
+        if history.truncated:
+            metrics.increment("chat.history_truncated", history.truncated)
+        return conversation
 
-        choice = initial.choices[0]
-        assistant_message = choice.message
-        used_tools: List[str] = []
+    def _completion_params(
+        self,
+        conversation: List[Dict[str, Any]],
+        *,
+        with_tools: bool,
+        tool_names: Optional[Tuple[str, ...]] = None,
+    ) -> Dict[str, Any]:
+        params: Dict[str, Any] = {
+            "model": self.settings.groq_model,
+            "messages": conversation,
+            "temperature": self.settings.temperature,
+            "max_tokens": self.settings.max_output_tokens,
+        }
+        if with_tools:
+            params["tools"] = self.tool_registry.as_openai_tools(tool_names)
+            params["tool_choice"] = "auto"
+        return params
 
-        if assistant_message.tool_calls:
+    @staticmethod
+    def _tool_requests(assistant_message: Any, conversation: List[Dict[str, Any]]) -> List[ToolCall]:
+        """Record the assistant's tool calls and decode their arguments"""
+        conversation.append(
+            {
+                "role": "assistant",
+                "content": assistant_message.content,
+                "tool_calls": assistant_message.tool_calls,
+            }
+        )
+
+        return [
+            (tool_call.id, tool_call.function.name, GroqChatProvider._decode_arguments(tool_call.function.arguments))
+            for tool_call in assistant_message.tool_calls
+        ]
+
+    @staticmethod
+    def _decode_arguments(raw: Optional[str]) -> Dict[str, Any]:
+        try:
+            return json.loads(raw or "{}")
+        except json.JSONDecodeError:
+            logger.error("Failed to decode tool arguments", exc_info=True)
+            return {}
+
+    @staticmethod
+    def _record_tool_results(
+        executions: List[ToolExecution], wall_ms: float, conversation: List[Dict[str, Any]]
+    ) -> None:
+        """Append tool results in tool_call order and record per-call wall time"""
+        for execution in executions:
             conversation.append(
                 {
-                    "role": "assistant",
-                    "content": assistant_message.content,
-                    "tool_calls": assistant_message.tool_calls,
+                    "role": "tool",
+                    "tool_call_id": execution.call_id,
+                    "content": dumps(execution.result),
                 }
             )
+            metrics.observe(f"tools.{execution.name}", execution.elapsed_ms)
+            if execution.timed_out:
+                metrics.increment("tools.timeouts")
 
-            for tool_call in assistant_message.tool_calls:
-                tool_name = tool_call.function.name
-                used_tools.append(tool_name)
-                try:
-                    arguments = json.loads(tool_call.function.arguments or "{}")
-                except json.JSONDecodeError:
-                    logger.error("Failed to decode tool arguments", exc_info=True)
-                    arguments = {}
+        metrics.observe("tools.batch_wall", wall_ms)
+        if len(executions) > 1:
+            # Sequential execution would have cost the sum of the calls
+            metrics.increment("tools.multi_call_turns")
+            metrics.observe(
+                "tools.parallel_saved",
+                max(0.0, sum(execution.elapsed_ms for execution in executions) - wall_ms),
+            )
 
-                tool_result = self.tool_registry.execute(tool_name, arguments)
-                conversation.append(
-                    {
-                        "role": "tool",
-                        "tool_call_id": tool_call.id,
-                        "content": json.dumps(tool_result),
-                    }
-                )
+    def _fast_path(self, executions: List[ToolExecution], message: str, loop: AgentLoop) -> Optional[str]:
+        """Template reply for deterministic tool results, saving the follow-up completion"""
+        rendered = self.tool_registry.render(executions, message)
+        if rendered is not None:
+            loop.stop_reason = "fast_path"
+            metrics.increment("chat.completions_skipped")
+        return rendered
 
-            final = self._client.chat.completions.create(
-                model=self.settings.groq_model,
-                messages=conversation,
-                temperature=self.settings.temperature,
-                max_tokens=self.settings.max_output_tokens,
-            )
-            final_message = final.choices[0].message.content or ""
-        else:
-            final_message = assistant_message.content or ""
+    @staticmethod
+    def _record_loop(loop: AgentLoop) -> None:
+        metrics.increment("chat.requests")
+        metrics.increment("chat.rounds", loop.rounds)
+        metrics.increment("chat.prompt_tokens", loop.prompt_tokens)
+        metrics.increment("chat.completion_tokens", loop.completion_tokens)
+        metrics.increment(f"chat.stop.{loop.stop_reason}")
+        metrics.observe("chat.latency", loop.elapsed_ms)
 
+    def _finish(self, message: str, session_id: str, final_message: str, loop: AgentLoop) -> ChatResult:
         final_message = final_message.strip()
         self.session_store.append(session_id, "user", message)
         self.session_store.append(session_id, "assistant", final_message)
+        if loop.executions:
+            updates = entity_updates(loop.executions, self.session_store.get(session_id).attributes)
+            if updates:
+                self.session_store.remember(session_id, updates)
+        self._record_loop(loop)
+        return loop.result(final_message)
+
+    def generate(self, message: str, session_id: str) -> ChatResult:
+        loop = AgentLoop.from_settings(self.settings)
+        conversation = self._build_conversation(message, session_id, loop)
+
+        while True:
+            with_tools = loop.next_round()
+            try:
+                response = self._client.chat.completions.create(
+                    **self._completion_params(conversation, with_tools=with_tools, tool_names=loop.tool_names)
+                )
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"Groq completion failed: {exc}")
+                raise
+
+            loop.add_usage(getattr(response, "usage", None))
+            assistant_message = response.choices[0].message
+            if not with_tools or not assistant_message.tool_calls:
+                break
+
+            calls = self._tool_requests(assistant_message, conversation)
+            started = time.perf_counter()
+            executions = self.tool_registry.execute_many(
+                calls, self._tool_executor, self.settings.tool_timeout_seconds
+            )
+            tools_wall_ms = (time.perf_counter() - started) * 1000
+            self._record_tool_results(executions, tools_wall_ms, conversation)
+            loop.add_executions(executions, tools_wall_ms)
+
+            rendered = self._fast_path(executions, message, loop)
+            if rendered is not None:
+                return self._finish(message, session_id, rendered, loop)
+
+        return self._finish(message, session_id, assistant_message.content or "", loop)
+
+    async def generate_async(self, message: str, session_id: str) -> ChatResult:
+        loop = AgentLoop.from_settings(self.settings)
+        # The session store may be SQLite-backed, so its reads and writes stay off the event loop
+        conversation = await asyncio.to_thread(self._build_conversation, message, session_id, loop)
+
+        while True:
+            with_tools = loop.next_round()
+            try:
+                response = await self._async_client.chat.completions.create(
+                    **self._completion_params(conversation, with_tools=with_tools, tool_names=loop.tool_names)
+                )
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"Groq completion failed: {exc}")
+                raise
+
+            loop.add_usage(getattr(response, "usage", None))
+            assistant_message = response.choices[0].message
+            if not with_tools or not assistant_message.tool_calls:
+                break
+
+            calls = self._tool_requests(assistant_message, conversation)
+            started = time.perf_counter()
+            executions = await self.tool_registry.execute_many_async(
+                calls, self._tool_executor, self.settings.tool_timeout_seconds
+            )
+            tools_wall_ms = (time.perf_counter() - started) * 1000
+            self._record_tool_results(executions, tools_wall_ms, conversation)
+            loop.add_executions(executions, tools_wall_ms)
+
+            rendered = self._fast_path(executions, message, loop)
+            if rendered is not None:
+                return await asyncio.to_thread(self._finish, message, session_id, rendered, loop)
+
+        return await asyncio.to_thread(self._finish, message, session_id, assistant_message.content or "", loop)
+
+    async def _stream_completion(
+        self,
+        conversation: List[Dict[str, Any]],
+        *,
+        with_tools: bool,
+        tool_names: Optional[Tuple[str, ...]] = None,
+    ) -> AsyncIterator[Any]:
+        """Yield content strings as they arrive, then the accumulated tool calls (if any)"""
+        stream = await self._async_client.chat.completions.create(
+            **self._completion_params(conversation, with_tools=with_tools, tool_names=tool_names),
+            stream=True,
+        )
+
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            for call in delta.tool_calls or []:
+                entry = tool_calls.setdefault(
+                    call.index,
+                    {"id": "", "type": "function", "function": {"name": "", "arguments": ""}},
+                )
+                if call.id:
+                    entry["id"] = call.id
+                if call.function:
+                    entry["function"]["name"] += call.function.name or ""
+                    entry["function"]["arguments"] += call.function.arguments or ""
+            if delta.content:
+                yield delta.content
+
+        if tool_calls:
+            yield [tool_calls[index] for index in sorted(tool_calls)]
+
+    async def stream(self, message: str, session_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the reply as events: tool progress first, then tokens, then "done".
+
+        Streamed completions don't report token usage, so only the round and
+        time budgets apply here.
+        """
+        loop = AgentLoop.from_settings(self.settings)
+        first_token_ms: Optional[float] = None
+        streamed: List[str] = []
+        conversation = await asyncio.to_thread(self._build_conversation, message, session_id, loop)
+
+        try:
+            while True:
+                with_tools = loop.next_round()
+                parts: List[str] = []
+                requested_tools = None
+                async for item in self._stream_completion(
+                    conversation, with_tools=with_tools, tool_names=loop.tool_names
+                ):
+                    if isinstance(item, list):
+                        requested_tools = item
+                        continue
+                    if first_token_ms is None:
+                        first_token_ms = loop.elapsed_ms
+                    parts.append(item)
+                    streamed.append(item)
+                    yield {"event": "token", "data": {"content": item}}
+
+                if not with_tools or not requested_tools:
+                    break
+
+                conversation.append(
+                    {"role": "assistant", "content": "".join(parts) or None, "tool_calls": requested_tools}
+                )
+                calls = [
+                    (call["id"], call["function"]["name"], self._decode_arguments(call["function"]["arguments"]))
+                    for call in requested_tools
+                ]
+                yield {"event": "tool_start", "data": {"tools": [name for _, name, _ in calls], "round": loop.rounds}}
+
+                started = time.perf_counter()
+                executions = await self.tool_registry.execute_many_async(
+                    calls, self._tool_executor, self.settings.tool_timeout_seconds
+                )
+                tools_wall_ms = (time.perf_counter() - started) * 1000
+                self._record_tool_results(executions, tools_wall_ms, conversation)
+                loop.add_executions(executions, tools_wall_ms)
+                for execution in executions:
+                    yield {"event": "tool_result", "data": execution.timing()}
+
+                rendered = self._fast_path(executions, message, loop)
+                if rendered is not None:
+                    if first_token_ms is None:
+                        first_token_ms = loop.elapsed_ms
+                    streamed.append(rendered)
+                    yield {"event": "token", "data": {"content": rendered}}
+                    break
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Groq streaming failed: {exc}")
+            metrics.increment("chat.stream_errors")
+            yield {"event": "error", "data": {"detail": "Failed to process chat message"}}
+            return
+
+        # Store what the client was shown, including text from rounds that went on to call tools
+        result = await asyncio.to_thread(self._finish, message, session_id, "".join(streamed), loop)
+        if first_token_ms is not None:
+            metrics.observe("chat.time_to_first_token", first_token_ms)
 
-        return ChatResult(message=final_message, used_tools=used_tools)
+        yield result.done_event(round(first_token_ms, 3) if first_token_ms is not None else None)
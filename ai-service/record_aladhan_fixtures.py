@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Record Aladhan annual calendars as regression fixtures for the offline
+prayer time calculator (see test_prayer_calculator.py)
+
+Usage:
+    python record_aladhan_fixtures.py [year ...]
+"""
+
+import argparse
+import json
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from shared import prayer_times
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "aladhan"
+
+
+def record(year: int) -> Path:
+    """Save Aladhan's annual calendar for ``year`` as a regression fixture"""
+    response = requests.get(
+        f"{prayer_times.ALADHAN_BASE_URL}/calendarByAddress",
+        params={
+            "address": prayer_times.MASQ_ADDRESS,
+            "method": prayer_times.ISNA_METHOD,
+            "year": year,
+            "annual": "true",
+        },
+        timeout=30,
+    )
+    response.raise_for_status()
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    path = FIXTURES_DIR / f"calendar_{year}.json"
+    path.write_text(json.dumps(response.json()))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("years", nargs="*", type=int, default=[datetime.now().year])
+    args = parser.parse_args()
+    for year in args.years:
+        print(f"Recorded {record(year)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, Optional, Set, Tuple
+
+from providers.base import ChatResult
+from router import MONTHS, NUMBERS, WEEKDAYS
+from shared.database import get_pool
+from shared.prayer_calculator import MASQ_TIMEZONE
+from tools.renderers import PRAYER_ALIASES
+
+# Words that change the answer; two messages only match fuzzily when they agree on all of them
+ENTITY_WORDS = (
+    set(PRAYER_ALIASES)
+    | set(WEEKDAYS)
+    | set(MONTHS)
+    | set(NUMBERS)
+    | {"today", "tonight", "tomorrow", "yesterday", "next", "last", "this", "week", "weekend", "month", "year", "not"}
+)
+FILLER_WORDS = {"please", "pls", "plz", "hi", "hey", "hello", "salam", "salaam", "thanks", "thank", "you"}
+# Dropped before comparing two questions word by word: "events for this week"
+# asks the same thing as "events this week"
+FUNCTION_WORDS = {"a", "an", "the", "is", "are", "for", "of", "there", "any"}
+# Shorter words differ in meaning more often than in spelling ("men"/"women", "fee"/"few")
+MIN_TYPO_LENGTH = 5
+
+# Replies cut short by a budget aren't worth repeating to the next session
+CACHEABLE_STOP_REASONS = {"answered", "fast_path"}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Where each dependency's current version comes from
+DEPENDENCY_VERSIONS: Dict[str, Callable[[], Any]] = {
+    # Advances whenever anything commits to users.db (events, RSVPs, ...). The
+    # pool reads it from one connection, so versions() and get() agree even
+    # when they run on different worker threads.
+    "database": lambda: get_pool().data_generation(),
+    # "When is Maghrib?" has a new answer every day at the masjid
+    "prayer_date": lambda: datetime.now(MASQ_TIMEZONE).date().isoformat(),
+}
+
+
+def normalize_message(message: str) -> str:
+    words = _PUNCTUATION.sub(" ", message.lower().replace("'", "")).split()
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text} "
+    return frozenset(padded[index:index + 3] for index in range(len(padded) - 2))
+
+
+def _entities(text: str) -> FrozenSet[str]:
+    return frozenset(word for word in text.split() if word in ENTITY_WORDS or word.isdigit())
+
+
+def _content_words(text: str) -> Tuple[str, ...]:
+    return tuple(word for word in text.split() if word not in FUNCTION_WORDS)
+
+
+def _one_typo_apart(first: str, second: str) -> bool:
+    """True for one substituted, inserted, deleted or swapped character"""
+    if min(len(first), len(second)) < MIN_TYPO_LENGTH:
+        return False
+    if len(first) == len(second):
+        diffs = [index for index, (a, b) in enumerate(zip(first, second)) if a != b]
+        return len(diffs) == 1 or (
+            len(diffs) == 2 and diffs[1] == diffs[0] + 1 and first[diffs[0]] == second[diffs[1]]
+            and first[diffs[1]] == second[diffs[0]]
+        )
+    if abs(len(first) - len(second)) != 1:
+        return False
+    longer, shorter = (first, second) if len(first) > len(second) else (second, first)
+    return any(longer[:index] + longer[index + 1:] == shorter for index in range(len(longer)))
+
+
+def _same_wording(first: Tuple[str, ...], second: Tuple[str, ...]) -> bool:
+    """Same content words in the same order, differing at most by spelling"""
+    return len(first) == len(second) and all(
+        a == b or _one_typo_apart(a, b) for a, b in zip(first, second)
+    )
+
+
+@dataclass
+class CachedResponse:
+    result: ChatResult
+    grams: FrozenSet[str]
+    entities: FrozenSet[str]
+    words: Tuple[str, ...]
+    dependencies: Tuple[str, ...]
+    versions: Tuple[Any, ...]
+    stored_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class ResponseCache:
+    """Reuses answers to first-turn questions that other sessions already asked.
+
+    Entries are keyed on the normalized message. A lookup that misses the
+    exact key falls back to the most similar cached question (character
+    trigram Jaccard >= ``similarity``) that mentions the same prayers, dates
+    and numbers and has the same content words up to a typo each, so "class
+    for women" never answers "class for men". An entry records what its tool results depended on (the
+    database's data version, today's date for prayer times) and is dropped as
+    soon as any of those change.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 512,
+        ttl: float = 600.0,
+        similarity: float = 0.85,
+        versions: Optional[Dict[str, Callable[[], Any]]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.similarity = similarity
+        self._versions = versions or DEPENDENCY_VERSIONS
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._by_entities: Dict[FrozenSet[str], Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+        self.expirations = 0
+
+    def _current_versions(self, dependencies: Tuple[str, ...]) -> Tuple[Any, ...]:
+        return tuple(self._versions[name]() for name in dependencies)
+
+    def versions(self) -> Dict[str, Any]:
+        """Current version of every dependency; take this before generating a reply"""
+        return {name: version() for name, version in self._versions.items()}
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        keys = self._by_entities.get(entry.entities)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_entities[entry.entities]
+
+    def _valid(self, key: str, entry: CachedResponse) -> bool:
+        if time.monotonic() - entry.stored_at > self.ttl:
+            self.expirations += 1
+        elif entry.versions != self._current_versions(entry.dependencies):
+            self.invalidations += 1
+        else:
+            return True
+        self._remove(key)
+        return False
+
+    def _similar_key(self, text: str) -> Optional[str]:
+        grams, words = _trigrams(text), _content_words(text)
+        best_key, best_score = None, self.similarity
+        for key in self._by_entities.get(_entities(text), ()):
+            entry = self._entries[key]
+            score = len(grams & entry.grams) / len(grams | entry.grams)
+            if score >= best_score and _same_wording(words, entry.words):
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, message: str) -> Optional[ChatResult]:
+        if self.maxsize <= 0:
+            return None
+        started = time.perf_counter()
+        text = normalize_message(message)
+        with self._lock:
+            key = text if text in self._entries else None
+            similar = False
+            if key is None and self.similarity > 0:
+                key = self._similar_key(text)
+                similar = key is not None
+
+            if key is None or not self._valid(key, self._entries[key]):
+                self.misses += 1
+                return None
+
+            entry = self._entries[key]
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            if similar:
+                self.similar_hits += 1
+        return replace(
+            entry.result,
+            rounds=0,
+            prompt_tokens=0,
+            completion_tokens=0,
+            prompt_tokens_estimate=0,
+            latency_ms=round((time.perf_counter() - started) * 1000, 3),
+            stop_reason="cached",
+        )
+
+    def put(
+        self,
+        message: str,
+        result: ChatResult,
+        dependencies: Optional[Tuple[str, ...]],
+        versions: Dict[str, Any],
+    ) -> bool:
+        """Cache a reply generated against ``versions`` (from versions()).
+
+        ``dependencies`` None means a tool wrote something or read the clock,
+        so the reply is not reused.
+        """
+        if (
+            self.maxsize <= 0
+            or dependencies is None
+            or not result.message
+            or result.stop_reason not in CACHEABLE_STOP_REASONS
+        ):
+            return False
+        text = normalize_message(message)
+        entry = CachedResponse(
+            result=result,
+            grams=_trigrams(text),
+            entities=_entities(text),
+            words=_content_words(text),
+            dependencies=dependencies,
+            versions=tuple(versions[name] for name in dependencies),
+        )
+        with self._lock:
+            if text in self._entries:
+                self._remove(text)
+            self._entries[text] = entry
+            self._by_entities.setdefault(entry.entities, set()).add(text)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+            self.stores += 1
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_entities.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "similarity": self.similarity,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+            }
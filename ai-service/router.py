@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import logging
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+
+from memory import SessionStore
+from metrics import metrics
+from providers.base import ChatResult
+from shared.prayer_calculator import MASQ_TIMEZONE
+from tools import ToolExecution, ToolRegistry, entity_updates
+from tools.renderers import (
+    PRAYER_ALIASES,
+    Renderer,
+    render_events,
+    render_next_prayer,
+    render_prayer_times,
+    render_volunteer_contact,
+)
+
+logger = logging.getLogger(__name__)
+
+# Longer questions usually carry more than one ask; leave those to the model
+MAX_ROUTED_WORDS = 14
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = {
+    name: index
+    for index, names in enumerate(
+        [
+            ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+            ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+            ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december"),
+        ],
+        start=1,
+    )
+    for name in names
+}
+NUMBERS = {"a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7}
+
+_ISO_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_IN_DAYS = re.compile(r"\bin (\d+|" + "|".join(NUMBERS) + r") (day|days|week|weeks)\b")
+_WEEKDAY = re.compile(r"\b(?:(this|next|on) )?(" + "|".join(WEEKDAYS) + r")\b")
+_MONTH_NAMES = "|".join(MONTHS)
+_MONTH_DAY = re.compile(
+    r"\b(?:(" + _MONTH_NAMES + r")\.? (\d{1,2})(?:st|nd|rd|th)?"
+    r"|(\d{1,2})(?:st|nd|rd|th)? (?:of )?(" + _MONTH_NAMES + r"))\b"
+)
+# Date-ish words the extractor can't resolve; seeing one means we aren't sure
+_UNRESOLVED_DATE = re.compile(
+    r"\b(week|weekend|month|year|ramadan|eid|jumu?'?ah|yesterday|last|ago|until|between|from)\b"
+)
+# Words that carry no content of their own in a routed question. Anything
+# else left after removing the intent phrase and the date ("kids", "sisters",
+# "main hall") narrows or changes the question, so the model answers it.
+FILLER_WORDS = {
+    "a", "an", "and", "any", "are", "at", "be", "can", "coming", "do", "does", "event", "events",
+    "for", "get", "give", "have", "i", "in", "is", "it", "know", "list", "masjid", "me", "mosque",
+    "of", "on", "please", "pray", "prayer", "prayers", "salah", "show", "tell", "the", "there",
+    "time", "times", "to", "up", "us", "we", "what", "whats", "when", "will", "you",
+}
+DATE_WORDS = (
+    set(WEEKDAYS) | set(MONTHS) | set(NUMBERS)
+    | {"today", "tonight", "tomorrow", "day", "days", "week", "weeks", "after", "this", "next",
+       "morning", "afternoon", "evening"}
+)
+_WORD = re.compile(r"[a-z0-9]+")
+_DATE_NUMBER = re.compile(r"\d+(st|nd|rd|th)?")
+
+# Requests that act on something or need judgement go to the model
+_NEEDS_MODEL = re.compile(
+    r"\b(rsvp|register|sign me|signup|sign up|cancel|why|how|explain|difference|should|remind|email me)\b"
+)
+
+
+def extract_date(text: str, today: date) -> Tuple[Optional[date], bool]:
+    """Find the date a message refers to.
+
+    Returns ``(day, resolved)``. ``day`` is None when the message doesn't
+    mention a date. ``resolved`` is False when it mentions one we can't pin
+    down ("next month", "after Eid").
+    """
+    text = text.lower()
+
+    match = _ISO_DATE.search(text)
+    if match:
+        try:
+            return date(int(match[1]), int(match[2]), int(match[3])), True
+        except ValueError:
+            return None, False
+
+    if "day after tomorrow" in text:
+        return today + timedelta(days=2), True
+    if "tomorrow" in text:
+        return today + timedelta(days=1), True
+
+    match = _IN_DAYS.search(text)
+    if match:
+        count = int(match[1]) if match[1].isdigit() else NUMBERS[match[1]]
+        return today + timedelta(days=count * (7 if match[2].startswith("week") else 1)), True
+
+    if _UNRESOLVED_DATE.search(text):
+        return None, False
+
+    match = _MONTH_DAY.search(text)
+    if match:
+        month = MONTHS[match[1] or match[4]]
+        day = int(match[2] or match[3])
+        try:
+            candidate = date(today.year, month, day)
+        except ValueError:
+            return None, False
+        if candidate < today:
+            candidate = candidate.replace(year=today.year + 1)
+        return candidate, True
+
+    match = _WEEKDAY.search(text)
+    if match:
+        ahead = (WEEKDAYS.index(match[2]) - today.weekday()) % 7
+        if match[1] == "next" and ahead == 0:
+            ahead = 7
+        return today + timedelta(days=ahead), True
+
+    if re.search(r"\b(today|tonight|this (morning|afternoon|evening))\b", text):
+        return today, True
+
+    return None, True
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    pattern: Pattern[str]
+    tool: str
+    renderer: Renderer
+    arguments: Callable[[date], Dict[str, Any]]
+    # Whether a date in the message changes the answer; if not, a date means
+    # the question is something this intent can't answer
+    takes_date: bool = False
+
+
+_PRAYER_NAMES = "|".join(PRAYER_ALIASES)
+
+INTENTS: List[Intent] = [
+    Intent(
+        name="next_prayer",
+        pattern=re.compile(r"\b(next|upcoming) (prayer|salah|salat|namaz)\b|\bwhich prayer is next\b"),
+        tool="get_next_prayer_time",
+        renderer=render_next_prayer,
+        arguments=lambda day: {},
+    ),
+    Intent(
+        name="prayer_times",
+        pattern=re.compile(
+            r"(?<!next )(?<!upcoming )\b(prayer|salah|salat|namaz|adhan|athan|iqama|iqamah) times?\b"
+            r"|\b(" + _PRAYER_NAMES + r")\b"
+        ),
+        tool="get_prayer_times",
+        renderer=render_prayer_times,
+        arguments=lambda day: {"date": day.isoformat()},
+        takes_date=True,
+    ),
+    Intent(
+        name="upcoming_events",
+        pattern=re.compile(
+            r"\b(upcoming|next|coming up|any|what) (events?|programs?)\b|\bevents? (coming up|this week)\b"
+            r"|\bwhat'?s (happening|going on)\b"
+        ),
+        tool="search_events",
+        renderer=render_events,
+        arguments=lambda day: {"limit": 5},
+    ),
+    Intent(
+        name="volunteer_contact",
+        pattern=re.compile(
+            r"\b(who|whom) (can|do|should) i (contact|email|reach)\b.*\bvolunteer|\bvolunteer contact\b"
+        ),
+        tool="find_volunteer_contact_for_recent_event",
+        renderer=render_volunteer_contact,
+        arguments=lambda day: {},
+    ),
+]
+
+
+def leftover_words(text: str, intent: Intent) -> List[str]:
+    """Content words in ``text`` besides the intent phrase, dates, prayer names and filler"""
+    remaining = intent.pattern.sub(" ", text).replace("'", "")
+    return [
+        word
+        for word in _WORD.findall(remaining)
+        if word not in FILLER_WORDS
+        and word not in DATE_WORDS
+        and word not in PRAYER_ALIASES
+        and not _DATE_NUMBER.fullmatch(word)
+    ]
+
+
+class IntentRouter:
+    """Answers the most common questions from tools directly, without the LLM.
+
+    A message is routed only when exactly one intent matches and nothing in
+    it suggests the model is needed (an action, a second question, a date we
+    can't resolve, or words the intent would ignore, like "events for kids").
+    Everything else returns None and goes to the provider.
+    """
+
+    def __init__(self, tool_registry: ToolRegistry, session_store: SessionStore, intents: List[Intent] = INTENTS):
+        self.tool_registry = tool_registry
+        self.session_store = session_store
+        self.intents = intents
+
+    def classify(self, message: str, today: Optional[date] = None) -> Optional[Tuple[Intent, Dict[str, Any]]]:
+        text = " ".join(message.lower().split())
+        if not text or len(text.split()) > MAX_ROUTED_WORDS or _NEEDS_MODEL.search(text):
+            return None
+
+        matches = [intent for intent in self.intents if intent.pattern.search(text)]
+        if len(matches) != 1:
+            return None
+        intent = matches[0]
+
+        today = today or datetime.now(MASQ_TIMEZONE).date()
+        day, resolved = extract_date(text, today)
+        if not resolved or (day and not intent.takes_date):
+            return None
+        if leftover_words(text, intent):
+            return None
+        # "When is Maghrib?" means today at the masjid, whatever the server's clock says
+        return intent, intent.arguments(day or today)
+
+    def answer(self, message: str, session_id: str, today: Optional[date] = None) -> Optional[ChatResult]:
+        started = time.perf_counter()
+        classified = self.classify(message, today)
+        if not classified:
+            metrics.increment("router.fallback")
+            metrics.observe("router.classify", (time.perf_counter() - started) * 1000)
+            return None
+
+        intent, arguments = classified
+        tool_started = time.perf_counter()
+        try:
+            result = self.tool_registry.execute(intent.tool, arguments)
+            reply = intent.renderer(result, message)
+        except Exception as exc:  # noqa: BLE001
+            logger.error(f"Routed {intent.name} failed: {exc}")
+            reply = None
+        tool_ms = (time.perf_counter() - tool_started) * 1000
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if not reply:
+            metrics.increment(f"router.declined.{intent.name}")
+            metrics.increment("router.fallback")
+            return None
+
+        metrics.increment(f"router.hits.{intent.name}")
+        metrics.observe(f"router.{intent.name}", elapsed_ms)
+
+        self.session_store.append(session_id, "user", message)
+        self.session_store.append(session_id, "assistant", reply)
+        execution = ToolExecution(call_id=f"routed-{intent.name}", name=intent.tool, result=result, elapsed_ms=tool_ms)
+        updates = entity_updates([execution], self.session_store.get(session_id).attributes)
+        if updates:
+            self.session_store.remember(session_id, updates)
+        return ChatResult(
+            message=reply,
+            used_tools=[intent.tool],
+            tool_timings=[execution.timing()],
+            tools_wall_ms=round(tool_ms, 3),
+            rounds=0,
+            latency_ms=round(elapsed_ms, 3),
+            stop_reason=f"routed:{intent.name}",
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-intent hits and share of all routed-or-fallback chats"""
+        hits = {intent.name: int(metrics.counter(f"router.hits.{intent.name}")) for intent in self.intents}
+        fallback = int(metrics.counter("router.fallback"))
+        total = sum(hits.values()) + fallback
+        return {
+            "total": total,
+            "fallback": fallback,
+            "hit_rate": round(sum(hits.values()) / total, 4) if total else 0.0,
+            "intents": {
+                name: {"hits": count, "hit_rate": round(count / total, 4) if total else 0.0}
+                for name, count in hits.items()
+            },
+        }
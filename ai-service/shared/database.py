@@ -3,247 +3,976 @@
 Shared database functions for MAS Queens AI Service
 """
 
+import os
+import re
 import sqlite3
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Sequence
+from typing import List, Dict, Any, Callable, Hashable, Iterator, Optional, Sequence, Tuple
+
+from shared.models import EVENT_COLUMNS, EVENT_FIELDS, Event
+from shared.query_guard import Parameters, QueryResult, run_guarded_query
 
 logger = logging.getLogger(__name__)
 
 # Database path
 DB_PATH = Path(__file__).parent.parent.parent / "users.db"
 
+# Maximum number of long-lived per-thread read connections
+DB_POOL_SIZE = int(os.getenv("AI_DB_POOL_SIZE", "8"))
+
+# How long a connection waits on a locked database before giving up
+DB_BUSY_TIMEOUT_MS = int(os.getenv("AI_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Read-through cache for event lookups
+EVENT_CACHE_SIZE = int(os.getenv("AI_EVENT_CACHE_SIZE", "256"))
+EVENT_CACHE_TTL = float(os.getenv("AI_EVENT_CACHE_TTL", "300"))
+
+# Write-behind queue for RSVPs and volunteer signups: writes are committed in
+# group transactions of up to AI_DB_WRITE_BATCH writes (0 commits each on its
+# own). The writer waits up to AI_DB_WRITE_FLUSH_MS for a batch to fill;
+# callers block on their row, so the default is to commit whatever is queued
+# as soon as the previous commit finishes.
+DB_WRITE_BATCH = int(os.getenv("AI_DB_WRITE_BATCH", "64"))
+DB_WRITE_FLUSH_MS = float(os.getenv("AI_DB_WRITE_FLUSH_MS", "0"))
+# How long a caller waits for its queued row before withdrawing it (rows
+# already in a transaction are waited for, since they may still commit)
+DB_WRITE_TIMEOUT = float(os.getenv("AI_DB_WRITE_TIMEOUT", "10"))
+
+# "fts" searches events through an FTS5 index (built at startup by shared.indexes), "like" scans the table
+EVENT_SEARCH = os.getenv("AI_EVENT_SEARCH", "fts").lower()
+
+# External-content FTS5 index over events, kept in sync by triggers, so
+# writes from the Next.js app are indexed too
+EVENT_SEARCH_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+        title, description, category,
+        content='events', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts (rowid, title, description, category)
+        VALUES (new.id, new.title, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+        INSERT INTO events_fts (events_fts, rowid, title, description, category)
+        VALUES ('delete', old.id, old.title, old.description, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF title, description, category ON events BEGIN
+        INSERT INTO events_fts (events_fts, rowid, title, description, category)
+        VALUES ('delete', old.id, old.title, old.description, old.category);
+        INSERT INTO events_fts (rowid, title, description, category)
+        VALUES (new.id, new.title, new.description, new.category);
+    END
+    """,
+]
+
+# bm25() column weights: a title match outranks a category match outranks a description match
+EVENT_SEARCH_WEIGHTS = (10.0, 1.0, 3.0)
+
+
+class ConnectionPool:
+    """Per-thread read connections plus a single serialized writer connection.
+
+    Each worker thread keeps its own read-only (``mode=ro``) connection for
+    its lifetime, so helpers stop paying the connect/schema-parse cost on
+    every call. Once ``size`` threads hold a reader, further threads get a
+    short-lived overflow connection instead of blocking. All writes go
+    through one connection guarded by a lock and run inside
+    ``BEGIN IMMEDIATE`` so the time spent waiting for SQLite's write lock
+    (held e.g. by the Next.js admin API) can be measured.
+
+    The database is switched to WAL journaling on first use, so readers
+    never block writers and writers never block readers.
+    """
+
+    def __init__(self, db_path: Path, size: int = DB_POOL_SIZE, busy_timeout_ms: int = DB_BUSY_TIMEOUT_MS):
+        self.db_path = Path(db_path)
+        self.size = max(1, size)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.journal_mode: Optional[str] = None
+        self._local = threading.local()
+        self._readers: Dict[int, sqlite3.Connection] = {}
+        self._readers_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        self._overflow_connections = 0
+        self._lock_waits = 0
+        self._lock_wait_total = 0.0
+        self._lock_wait_max = 0.0
+        self._lock_timeouts = 0
+        # Dedicated connection whose data_version drives data_generation()
+        self._watcher: Optional[sqlite3.Connection] = None
+        self._watch_lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        self._generation = 0
+        self._closed = False
+        # None until the first search checks for the FTS5 index
+        self.event_search: Optional[str] = None
+
+    def _connect(self, readonly: bool = True) -> sqlite3.Connection:
+        if self.journal_mode is None:
+            self._ensure_wal()
+
+        if readonly:
+            uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            # Autocommit mode: transactions are opened explicitly in writer()
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_wal(self) -> None:
+        """Switch the database to WAL journaling (persists in the file)"""
+        try:
+            conn = sqlite3.connect(str(self.db_path), timeout=self.busy_timeout_ms / 1000)
+            try:
+                self.journal_mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not enable WAL mode on {self.db_path}: {e}")
+            self.journal_mode = "unknown"
+
+    def _prune_dead_readers(self) -> None:
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in self._readers if ident not in alive]:
+            self._readers.pop(ident).close()
+
+    def _thread_reader(self) -> Optional[sqlite3.Connection]:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+
+        with self._readers_lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if len(self._readers) >= self.size:
+                self._prune_dead_readers()
+            if len(self._readers) >= self.size:
+                return None
+            conn = self._connect()
+            self._readers[threading.get_ident()] = conn
+
+        self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Yield this thread's read-only connection (or an overflow one)"""
+        conn = self._thread_reader()
+        if conn is not None:
+            yield conn
+            return
+
+        with self._readers_lock:
+            self._overflow_connections += 1
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _record_lock_wait(self, waited: float) -> None:
+        self._lock_waits += 1
+        self._lock_wait_total += waited
+        self._lock_wait_max = max(self._lock_wait_max, waited)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Yield the shared writer connection inside one immediate transaction.
+
+        Commits on success and rolls back on error. Nested use from the same
+        thread joins the outer transaction.
+        """
+        started = time.perf_counter()
+        with self._writer_lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if self._writer is None:
+                self._writer = self._connect(readonly=False)
+            conn = self._writer
+
+            if self._writer_depth:
+                self._writer_depth += 1
+                try:
+                    yield conn
+                finally:
+                    self._writer_depth -= 1
+                return
+
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                self._lock_timeouts += 1
+                raise
+            finally:
+                self._record_lock_wait(time.perf_counter() - started)
+
+            self._writer_depth = 1
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._writer_depth = 0
+
+    def data_generation(self) -> int:
+        """Counter that advances whenever the database may have changed.
+
+        Reads ``PRAGMA data_version`` on one dedicated read-only connection,
+        which changes when any other connection (our writer or another
+        process) commits. Every thread sees the same value, so pool size and
+        thread count don't affect it.
+        """
+        with self._watch_lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if self._watcher is None:
+                self._watcher = self._connect()
+            version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            if self._data_version is not None and version != self._data_version:
+                self._generation += 1
+            self._data_version = version
+            return self._generation
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "db_path": str(self.db_path),
+            "journal_mode": self.journal_mode,
+            "event_search": self.event_search,
+            "busy_timeout_ms": self.busy_timeout_ms,
+            "size": self.size,
+            "readers": len(self._readers),
+            "overflow_connections": self._overflow_connections,
+            "writer_open": self._writer is not None,
+            "lock_wait": {
+                "count": self._lock_waits,
+                "total_ms": round(self._lock_wait_total * 1000, 3),
+                "max_ms": round(self._lock_wait_max * 1000, 3),
+                "timeouts": self._lock_timeouts,
+            },
+        }
+
+    def health_check(self) -> Dict[str, Any]:
+        """Run a trivial query on a pooled reader and report pool state"""
+        started = time.perf_counter()
+        try:
+            with self.reader() as conn:
+                conn.execute("SELECT 1").fetchone()
+            health: Dict[str, Any] = {"status": "ok"}
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Database health check failed: {e}")
+            health = {"status": "error", "error": str(e)}
+
+        health["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        health.update(self.stats())
+        return health
+
+    def close(self) -> None:
+        with self._readers_lock:
+            self._closed = True
+            for conn in self._readers.values():
+                conn.close()
+            self._readers.clear()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._watch_lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    Every entry is tagged with the database generation it was read at; a
+    lookup with a newer generation treats the entry as invalidated.
+    """
+
+    def __init__(self, maxsize: int = EVENT_CACHE_SIZE, ttl: float = EVENT_CACHE_TTL):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, generation: int) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_generation, value = entry
+                if entry_generation != generation:
+                    del self._entries[key]
+                    self.invalidations += 1
+                elif expires_at <= time.monotonic():
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, generation: int, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, generation, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# Inserts the write queue accepts; RETURNING is empty when the row already exists
+QUEUED_INSERTS = {
+    table: f"""
+        INSERT INTO {table} (user_id, event_id, created_at)
+        VALUES (?, ?, datetime('now'))
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    """
+    for table in ("event_rsvps", "volunteer_signups")
+}
+
+# Per-row outcomes a write future resolves to
+WRITE_CREATED = "created"
+WRITE_DUPLICATE = "duplicate"
+WRITE_FAILED = "failed"
+
+# Runs on the writer connection inside a group transaction; its return value resolves the future
+Write = Callable[[sqlite3.Connection], Any]
+
+
+def _insert_row(table: str, params: Tuple[Any, ...]) -> Write:
+    def insert(conn: sqlite3.Connection) -> str:
+        try:
+            created = conn.execute(QUEUED_INSERTS[table], params).fetchall()
+        except sqlite3.IntegrityError as e:
+            logger.error(f"Error inserting into {table} {params}: {e}")
+            return WRITE_FAILED
+        return WRITE_CREATED if created else WRITE_DUPLICATE
+
+    return insert
+
+
+class WriteQueue:
+    """Write-behind queue that commits writes in small group transactions.
+
+    ``submit`` queues one insert and ``submit_write`` any function of the
+    writer connection (reads and writes that must see the same database);
+    both return a Future right away. A background thread runs up to
+    ``batch_size`` pending writes in one writer transaction, after waiting at
+    most ``flush_interval`` seconds for the batch to fill, so writes that
+    arrive during one commit go out together in the next. Each write runs
+    under its own savepoint: one that raises is rolled back alone and its
+    Future gets the exception, the rest commit. An insert resolves to
+    "created", "duplicate" or "failed" (a constraint error on that row). If
+    the transaction itself fails, every Future in the batch gets the
+    exception. With ``batch_size`` 0 writes are run by the caller, one
+    transaction each.
+
+    A caller can withdraw its row with ``Future.cancel()`` until the writer
+    picks it up; after that the row is in a transaction and cancel() fails.
+    """
+
+    def __init__(self, batch_size: int = DB_WRITE_BATCH, flush_interval: float = DB_WRITE_FLUSH_MS / 1000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Tuple[str, Write, Future]] = []
+        self._queued = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._flushes = 0
+        self._rows = 0
+        self._largest_batch = 0
+        self._failed_batches = 0
+        self._cancelled = 0
+
+    def submit(self, table: str, params: Tuple[Any, ...]) -> Future:
+        if table not in QUEUED_INSERTS:
+            raise ValueError(f"No queued insert for {table}")
+        return self.submit_write(f"insert into {table} {params}", _insert_row(table, params))
+
+    def submit_write(self, label: str, write: Write) -> Future:
+        """Queue ``write``; ``label`` names it in logs"""
+        future: Future = Future()
+        if self.batch_size <= 0:
+            self._apply([(label, write, future)])
+            return future
+
+        with self._queued:
+            if self._closed:
+                raise RuntimeError("Write queue is closed")
+            self._pending.append((label, write, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_behind, name="db-writer", daemon=True)
+                self._thread.start()
+            # Wake the writer to start a batch, and again when one is full
+            if len(self._pending) in (1, self.batch_size):
+                self._queued.notify()
+        return future
+
+    def _write_behind(self) -> None:
+        while True:
+            with self._queued:
+                self._queued.wait_for(lambda: self._pending or self._closed)
+                self._queued.wait_for(
+                    lambda: len(self._pending) >= self.batch_size or self._closed,
+                    timeout=self.flush_interval,
+                )
+                if self._closed and not self._pending:
+                    return
+            self.flush()
+
+    def flush(self) -> int:
+        """Commit everything queued now (in batches); returns how many rows were written"""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._queued:
+                    size = max(1, self.batch_size)
+                    batch, self._pending = self._pending[:size], self._pending[size:]
+                if not batch:
+                    return written
+                written += self._apply(batch)
+
+    def _apply(self, batch: List[Tuple[str, Write, Future]]) -> int:
+        # Rows whose caller gave up are dropped; the rest can no longer be cancelled
+        picked = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        self._cancelled += len(batch) - len(picked)
+        batch = picked
+        if not batch:
+            return 0
+
+        outcomes: List[Tuple[Any, Optional[BaseException]]] = []
+        try:
+            with _pool.writer() as conn:
+                for label, write, _ in batch:
+                    conn.execute("SAVEPOINT queued_write")
+                    try:
+                        outcomes.append((write(conn), None))
+                    except Exception as e:  # noqa: BLE001
+                        # Only this write is rolled back; the rest of the batch commits
+                        logger.error(f"Error in queued {label}: {e}")
+                        conn.execute("ROLLBACK TO queued_write")
+                        outcomes.append((None, e))
+                    conn.execute("RELEASE queued_write")
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Error committing {len(batch)} queued writes: {e}")
+            self._failed_batches += 1
+            for _, _, future in batch:
+                future.set_exception(e)
+            return 0
+
+        self._flushes += 1
+        self._rows += len(batch)
+        self._largest_batch = max(self._largest_batch, len(batch))
+        for (_, _, future), (outcome, error) in zip(batch, outcomes):
+            if error is None:
+                future.set_result(outcome)
+            else:
+                future.set_exception(error)
+        return len(batch)
+
+    def close(self) -> None:
+        """Commit what is queued and stop the writer thread"""
+        with self._queued:
+            self._closed = True
+            self._queued.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._queued:
+            pending = len(self._pending)
+        return {
+            "batch_size": self.batch_size,
+            "flush_interval_ms": round(self.flush_interval * 1000, 3),
+            "pending": pending,
+            "flushes": self._flushes,
+            "rows": self._rows,
+            "largest_batch": self._largest_batch,
+            "average_batch": round(self._rows / self._flushes, 2) if self._flushes else 0.0,
+            "failed_batches": self._failed_batches,
+            "cancelled": self._cancelled,
+        }
+
+
+_pool = ConnectionPool(DB_PATH)
+_event_cache = TTLCache()
+_write_queue = WriteQueue()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide connection pool"""
+    return _pool
+
+
+def configure_pool(db_path: Optional[Path] = None, size: Optional[int] = None) -> ConnectionPool:
+    """Replace the process-wide pool, e.g. to point helpers at another database"""
+    global _pool
+    # Queued rows belong to the database they were submitted against
+    _write_queue.flush()
+    previous = _pool
+    _pool = ConnectionPool(db_path or previous.db_path, size or previous.size, previous.busy_timeout_ms)
+    previous.close()
+    _event_cache.clear()
+    return _pool
+
+
+def database_health() -> Dict[str, Any]:
+    """Health summary for the shared connection pool and write queue"""
+    health = _pool.health_check()
+    health["write_queue"] = _write_queue.stats()
+    return health
+
+
+def get_write_queue() -> WriteQueue:
+    """Return the process-wide write-behind queue"""
+    return _write_queue
+
+
+def event_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters for the event lookup cache"""
+    return _event_cache.stats()
+
+
+def clear_event_cache() -> None:
+    _event_cache.clear()
+
+
+def _read_through(key: Hashable, loader: Callable[[], Any]) -> Any:
+    """Serve ``key`` from the event cache, loading it on a miss or a DB change"""
+    generation = _pool.data_generation()
+    hit, value = _event_cache.get(key, generation)
+    if not hit:
+        value = loader()
+        _event_cache.put(key, generation, value)
+    return value
+
+
+def _utc_today() -> str:
+    """Today's date as SQLite's date('now') sees it"""
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+def _normalize_search(text: Optional[str]) -> str:
+    return " ".join((text or "").split()).lower()
+
+
+def _event_cursor(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    """Cursor that builds Event records straight from each row (select EVENT_COLUMNS)"""
+    cursor = conn.cursor()
+    cursor.row_factory = Event.row_factory
+    return cursor
+
+
 def get_db_connection():
-    """Get database connection with row factory"""
+    """Get a standalone database connection with row factory.
+
+    Helpers in this module use the shared pool; this is kept for callers
+    that need a connection they own and close themselves.
+    """
     try:
-        conn = sqlite3.connect(str(DB_PATH))
+        conn = sqlite3.connect(str(_pool.db_path))
         conn.row_factory = sqlite3.Row
         return conn
     except Exception as e:
         logger.error(f"Database connection error: {e}")
         return None
 
-def get_events(limit: int = 10, user_query: str = "", date_filter: str = None) -> List[Dict[str, Any]]:
-    """Get upcoming events with optional filtering"""
-    conn = get_db_connection()
-    if not conn:
-        return []
+def _event_search_mode() -> str:
+    """"fts" if the events_fts index exists, else "like"; never changes the schema"""
+    if _pool.event_search is not None:
+        return _pool.event_search
+    if EVENT_SEARCH != "fts":
+        _pool.event_search = "like"
+        return _pool.event_search
 
     try:
-        base_query = """
-            SELECT id, title, description, date, time, location, category, volunteers_needed, contact_email, price
-            FROM events
-            WHERE status = 'active' AND date >= date('now')
-        """
+        with _pool.reader() as conn:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'events_fts'").fetchone()
+        _pool.event_search = "fts" if exists else "like"
+    except Exception as e:
+        logger.warning(f"Could not check for the events_fts index, using LIKE: {e}")
+        _pool.event_search = "like"
+    return _pool.event_search
 
-        params = []
 
-        if date_filter:
-            base_query += " AND date >= ?"
-            params.append(date_filter)
+def ensure_event_search(create: bool = True) -> str:
+    """Create the events_fts index and its sync triggers; returns the search mode.
 
-        if user_query:
-            base_query += " AND (title LIKE ? OR description LIKE ? OR category LIKE ?)"
-            search_term = f"%{user_query}%"
-            params.extend([search_term, search_term, search_term])
+    This changes the schema of the shared users.db and backfills the index
+    from every event, so it runs once at startup (see shared.indexes) rather
+    than on a request path. Falls back to "like" if FTS5 is unavailable or
+    the file is read-only. With ``create`` False it only checks again
+    whether the index exists.
+    """
+    if EVENT_SEARCH != "fts" or not create:
+        _pool.event_search = None
+        return _event_search_mode()
 
-        base_query += " ORDER BY date ASC LIMIT ?"
-        params.append(limit)
+    try:
+        with _pool.writer() as conn:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'events_fts'").fetchone()
+            for statement in EVENT_SEARCH_SCHEMA:
+                conn.execute(statement)
+            if not exists:
+                conn.execute("INSERT INTO events_fts (events_fts) VALUES ('rebuild')")
+                logger.info("Built events_fts full-text index")
+        _pool.event_search = "fts"
+    except Exception as e:
+        logger.warning(f"Full-text event search unavailable, using LIKE: {e}")
+        _pool.event_search = "like"
+    return _pool.event_search
 
-        cursor = conn.execute(base_query, params)
-        events = []
 
-        for row in cursor.fetchall():
-            events.append({
-                "id": row["id"],
-                "title": row["title"],
-                "description": row["description"],
-                "date": row["date"],
-                "time": row["time"],
-                "location": row["location"],
-                "category": row["category"],
-                "volunteers_needed": row["volunteers_needed"],
-                "contact_email": row["contact_email"],
-                "price": row["price"]
-            })
-
-        return events
+def _fts_query(text: str, operator: str = "AND", column: Optional[str] = None) -> Optional[str]:
+    """FTS5 query matching every word (or, with "OR", any word) as a prefix"""
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    query = f" {operator} ".join(f'"{word}"*' for word in words)
+    return f"{column} : ({query})" if column else query
+
+
+_EVENTS_QUALIFIED = ", ".join(f"events.{name}" for name in EVENT_FIELDS)
+_BM25 = f"bm25(events_fts, {', '.join(str(weight) for weight in EVENT_SEARCH_WEIGHTS)})"
+
+
+def _fts_events_sql(date_filter: Optional[str]) -> str:
+    date_clause = " AND events.date >= ?" if date_filter else ""
+    return f"""
+        SELECT {_EVENTS_QUALIFIED}
+        FROM events_fts JOIN events ON events.id = events_fts.rowid
+        WHERE events_fts MATCH ? AND events.status = 'active' AND events.date >= date('now'){date_clause}
+        ORDER BY {_BM25}, events.date
+        LIMIT ?
+    """
+
+
+def _fetch_events_fts(limit: int, user_query: str, date_filter: Optional[str]) -> List[Event]:
+    """Upcoming events matching all words of the query, best BM25 match first.
+
+    Falls back to matching any word when no event has all of them, since
+    model-written queries often carry extra words ("halaqa events").
+    """
+    sql = _fts_events_sql(date_filter)
+    operators = ("AND", "OR") if len(user_query.split()) > 1 else ("AND",)
+    rows: List[Event] = []
+    with _pool.reader() as conn:
+        for operator in operators:
+            params: List[Any] = [_fts_query(user_query, operator)]
+            if date_filter:
+                params.append(date_filter)
+            params.append(limit)
+            rows = _event_cursor(conn).execute(sql, params).fetchall()
+            if rows:
+                break
+    return rows
+
+
+def _like_events_query(limit: int, user_query: str, date_filter: Optional[str]) -> Tuple[str, List[Any]]:
+    base_query = f"""
+        SELECT {EVENT_COLUMNS}
+        FROM events
+        WHERE status = 'active' AND date >= date('now')
+    """
+
+    params = []
+
+    if date_filter:
+        base_query += " AND date >= ?"
+        params.append(date_filter)
+
+    if user_query:
+        base_query += " AND (title LIKE ? OR description LIKE ? OR category LIKE ?)"
+        search_term = f"%{user_query}%"
+        params.extend([search_term, search_term, search_term])
+
+    base_query += " ORDER BY date ASC LIMIT ?"
+    params.append(limit)
+    return base_query, params
+
+
+def _fetch_events(limit: int, user_query: str, date_filter: Optional[str]) -> List[Event]:
+    if user_query and _fts_query(user_query) and _event_search_mode() == "fts":
+        return _fetch_events_fts(limit, user_query, date_filter)
+
+    sql, params = _like_events_query(limit, user_query, date_filter)
+    with _pool.reader() as conn:
+        return _event_cursor(conn).execute(sql, params).fetchall()
+
+def get_events(limit: int = 10, user_query: str = "", date_filter: str = None) -> List[Event]:
+    """Get upcoming events with optional filtering"""
+    try:
+        limit = int(limit)
+        user_query = _normalize_search(user_query)
+        date_filter = date_filter or None
+        events = _read_through(
+            ("events", limit, user_query, date_filter, _utc_today()),
+            lambda: _fetch_events(limit, user_query, date_filter),
+        )
+        # Records are immutable, so the cached list only needs a shallow copy
+        return list(events)
 
     except Exception as e:
         logger.error(f"Error fetching events: {e}")
         return []
-    finally:
-        conn.close()
 
-def get_event_by_title(title: str) -> Optional[Dict[str, Any]]:
-    """Get specific event by title"""
-    conn = get_db_connection()
-    if not conn:
-        return None
+_FTS_TITLE_SQL = f"""
+    SELECT {_EVENTS_QUALIFIED}
+    FROM events_fts JOIN events ON events.id = events_fts.rowid
+    WHERE events_fts MATCH ? AND events.status = 'active'
+    ORDER BY {_BM25}
+    LIMIT 1
+"""
+
+_LIKE_TITLE_SQL = f"""
+    SELECT {EVENT_COLUMNS}
+    FROM events
+    WHERE LOWER(title) LIKE LOWER(?) AND status = 'active'
+    LIMIT 1
+"""
+
+
+def _find_event_by_title(conn: sqlite3.Connection, title: str) -> Optional[Event]:
+    """Best title match from the index; substring LIKE when nothing matches word prefixes"""
+    query = _fts_query(title, column="title")
+    if query is not None and _event_search_mode() == "fts":
+        event = _event_cursor(conn).execute(_FTS_TITLE_SQL, (query,)).fetchone()
+        if event:
+            return event
+
+    return _event_cursor(conn).execute(_LIKE_TITLE_SQL, (f"%{title}%",)).fetchone()
 
+def _fetch_event_by_title(title: str) -> Optional[Event]:
+    with _pool.reader() as conn:
+        return _find_event_by_title(conn, title)
+
+def get_event_by_title(title: str) -> Optional[Event]:
+    """Get specific event by title"""
     try:
-        cursor = conn.execute("""
-            SELECT id, title, description, date, time, location, category, volunteers_needed, contact_email, price, status
-            FROM events
-            WHERE LOWER(title) LIKE LOWER(?) AND status = 'active'
-            LIMIT 1
-        """, (f"%{title}%",))
-
-        row = cursor.fetchone()
-        if row:
-            return {
-                "id": row["id"],
-                "title": row["title"],
-                "description": row["description"],
-                "date": row["date"],
-                "time": row["time"],
-                "location": row["location"],
-                "category": row["category"],
-                "volunteers_needed": row["volunteers_needed"],
-                "contact_email": row["contact_email"],
-                "price": row["price"],
-                "status": row["status"]
-            }
-        return None
+        title = _normalize_search(title)
+        return _read_through(("event_by_title", title), lambda: _fetch_event_by_title(title))
 
     except Exception as e:
         logger.error(f"Error fetching event by title: {e}")
         return None
-    finally:
-        conn.close()
+
+_VOLUNTEER_OPPORTUNITIES_SQL = """
+    SELECT title, date, time, volunteers_needed, description, contact_email
+    FROM events
+    WHERE date >= date('now') AND volunteers_needed > 0 AND status = 'active'
+    ORDER BY date ASC
+    LIMIT 10
+"""
+
+
+def _fetch_volunteer_opportunities() -> List[Dict[str, Any]]:
+    with _pool.reader() as conn:
+        rows = conn.execute(_VOLUNTEER_OPPORTUNITIES_SQL).fetchall()
+
+    opportunities = []
+    for row in rows:
+        opportunities.append({
+            "title": row["title"],
+            "date": row["date"],
+            "time": row["time"],
+            "volunteers_needed": row["volunteers_needed"],
+            "description": row["description"],
+            "contact_email": row["contact_email"]
+        })
+
+    return opportunities
 
 def get_volunteer_opportunities() -> List[Dict[str, Any]]:
     """Get volunteer opportunities"""
-    conn = get_db_connection()
-    if not conn:
-        return []
-
     try:
-        cursor = conn.execute("""
-            SELECT title, date, time, volunteers_needed, description, contact_email
-            FROM events
-            WHERE date >= date('now') AND volunteers_needed > 0 AND status = 'active'
-            ORDER BY date ASC
-            LIMIT 10
-        """)
-
-        opportunities = []
-        for row in cursor.fetchall():
-            opportunities.append({
-                "title": row["title"],
-                "date": row["date"],
-                "time": row["time"],
-                "volunteers_needed": row["volunteers_needed"],
-                "description": row["description"],
-                "contact_email": row["contact_email"]
-            })
-
-        return opportunities
+        opportunities = _read_through(
+            ("volunteer_opportunities", _utc_today()),
+            _fetch_volunteer_opportunities,
+        )
+        return [dict(opportunity) for opportunity in opportunities]
     except Exception as e:
         logger.error(f"Error fetching volunteer opportunities: {e}")
         return []
-    finally:
-        conn.close()
 
+def execute_guarded_query(
+    sql: str,
+    parameters: Optional[Parameters] = None,
+    *,
+    allowed_operations: Optional[List[str]] = None,
+) -> QueryResult:
+    """Run model-written SQL through shared.query_guard on a pooled reader"""
+    try:
+        with _pool.reader() as conn:
+            return run_guarded_query(conn, sql, parameters, allowed_operations=allowed_operations or ["SELECT", "WITH"])
+    except Exception as exc:  # noqa: BLE001
+        logger.error(f"Error executing SQL query: {exc}")
+        return QueryResult(error=f"SQL error: {exc}")
 
 def execute_select_query(
     sql: str,
-    parameters: Optional[Sequence[Any]] = None,
+    parameters: Optional[Parameters] = None,
     *,
     allowed_operations: Optional[List[str]] = None,
 ) -> List[Dict[str, Any]]:
     """Run a safe read-only SQL query against the primary database."""
-    conn = get_db_connection()
-    if not conn:
-        return []
+    return execute_guarded_query(sql, parameters, allowed_operations=allowed_operations).rows
+
+@dataclass(frozen=True)
+class RsvpOutcome:
+    """What rsvp_to_event did; ``status`` is one of RSVP_STATUSES"""
+
+    status: str
+    user: Optional[Dict[str, Any]] = None
+    event: Optional[Event] = None
+    rsvp_date: Optional[str] = None
+    error: Optional[str] = None
+
+
+RSVP_STATUSES = ("created", "already_rsvpd", "user_not_found", "event_not_found", "not_open", "payment_required", "error")
+
+
+def _rsvp(conn: sqlite3.Connection, user_email: str, event_title: str) -> RsvpOutcome:
+    row = conn.execute(_USER_BY_EMAIL_SQL, (user_email,)).fetchone()
+    if row is None:
+        return RsvpOutcome("user_not_found")
+    user = dict(row)
+
+    event = _find_event_by_title(conn, _normalize_search(event_title))
+    if event is None:
+        return RsvpOutcome("event_not_found", user)
+    if event.status != "active":
+        return RsvpOutcome("not_open", user, event)
+    if event.price and event.price > 0:
+        return RsvpOutcome("payment_required", user, event)
+
+    created = conn.execute("""
+        INSERT INTO event_rsvps (user_id, event_id, created_at)
+        VALUES (?, ?, datetime('now'))
+        ON CONFLICT DO NOTHING
+        RETURNING created_at
+    """, (user["id"], event.id)).fetchall()
+    if created:
+        return RsvpOutcome("created", user, event, created[0]["created_at"])
+
+    existing = conn.execute(_RSVP_STATUS_SQL, (user["id"], event.id)).fetchone()
+    return RsvpOutcome("already_rsvpd", user, event, existing["created_at"] if existing else None)
 
+
+def rsvp_to_event(user_email: str, event_title: str) -> RsvpOutcome:
+    """Resolve the user and event and RSVP in one write transaction.
+
+    The lookups, checks and insert run as one write on the write queue, so
+    they see the same database even when other RSVPs share the group
+    commit. The insert uses ``ON CONFLICT DO NOTHING RETURNING``, so of any
+    number of concurrent RSVPs for the same user and event (from this process
+    or the Next.js app) exactly one reports "created" and the rest
+    "already_rsvpd".
+    """
     try:
-        normalized = sql.strip().upper()
-        if not normalized:
-            return []
-
-        if allowed_operations:
-            if not any(normalized.startswith(op) for op in allowed_operations):
-                raise ValueError("SQL operation not permitted")
-
-        dangerous_keywords = [
-            "DROP",
-            "DELETE",
-            "UPDATE",
-            "INSERT",
-            "ALTER",
-            "TRUNCATE",
-            "REPLACE",
-            "ATTACH",
-            "DETACH",
-            "PRAGMA",
-        ]
-
-        for keyword in dangerous_keywords:
-            if keyword in normalized:
-                raise ValueError("SQL contains a restricted keyword")
-
-        cursor = conn.execute(sql, parameters or [])
-        columns = [col[0] for col in cursor.description]
-        rows = cursor.fetchall()
-        return [dict(zip(columns, row)) for row in rows]
-    except Exception as exc:  # noqa: BLE001
-        logger.error(f"Error executing SQL query: {exc}")
-        return []
-    finally:
-        conn.close()
+        # Check for the search index before queueing behind the write lock
+        _event_search_mode()
+        outcome = _queued_write(
+            f"RSVP of {user_email} to {event_title!r}", lambda conn: _rsvp(conn, user_email, event_title)
+        )
+        return outcome if outcome is not None else RsvpOutcome("error", error="timed out waiting for the database")
+    except Exception as e:
+        logger.error(f"Error creating RSVP: {e}")
+        return RsvpOutcome("error", error=str(e))
 
-def create_event_rsvp(user_id: int, event_id: int) -> bool:
-    """Create an event RSVP (future agent capability)"""
-    conn = get_db_connection()
-    if not conn:
-        return False
+def _queued_write(label: str, write: Write) -> Any:
+    """Run ``write`` on the write queue and return its result, or None if it was withdrawn"""
+    future = _write_queue.submit_write(label, write)
+    try:
+        return future.result(DB_WRITE_TIMEOUT)
+    except FutureTimeoutError:
+        if future.cancel():
+            logger.error(f"Withdrew queued {label} after {DB_WRITE_TIMEOUT}s")
+            return None
+        # Already in a transaction, so it may still commit: report what actually happened
+        return future.result()
+
+def _queued_insert(table: str, params: Tuple[Any, ...]) -> bool:
+    """Insert through the write queue; True only if this call created the row"""
+    if table not in QUEUED_INSERTS:
+        raise ValueError(f"No queued insert for {table}")
+    return _queued_write(f"insert into {table} {params}", _insert_row(table, params)) == WRITE_CREATED
 
+def create_event_rsvp(user_id: int, event_id: int) -> bool:
+    """Create an event RSVP (future agent capability); False if it exists or failed"""
     try:
-        conn.execute("""
-            INSERT INTO event_rsvps (user_id, event_id, created_at)
-            VALUES (?, ?, datetime('now'))
-        """, (user_id, event_id))
-        conn.commit()
-        return True
+        return _queued_insert("event_rsvps", (user_id, event_id))
     except Exception as e:
         logger.error(f"Error creating RSVP: {e}")
         return False
-    finally:
-        conn.close()
 
 def create_volunteer_signup(user_id: int, event_id: int) -> bool:
-    """Create a volunteer signup (future agent capability)"""
-    conn = get_db_connection()
-    if not conn:
-        return False
-
+    """Create a volunteer signup (future agent capability); False if it exists or failed"""
     try:
-        conn.execute("""
-            INSERT INTO volunteer_signups (user_id, event_id, created_at)
-            VALUES (?, ?, datetime('now'))
-        """, (user_id, event_id))
-        conn.commit()
-        return True
+        return _queued_insert("volunteer_signups", (user_id, event_id))
     except Exception as e:
         logger.error(f"Error creating volunteer signup: {e}")
         return False
-    finally:
-        conn.close()
+
+_RSVP_STATUS_SQL = """
+    SELECT created_at FROM event_rsvps
+    WHERE user_id = ? AND event_id = ?
+"""
+
 
 def check_user_rsvp_status(user_id: int, event_id: int) -> Dict[str, Any]:
     """Check if user has already RSVP'd to an event"""
-    conn = get_db_connection()
-    if not conn:
-        return {"error": "Database connection failed"}
-
     try:
-        cursor = conn.execute("""
-            SELECT created_at FROM event_rsvps
-            WHERE user_id = ? AND event_id = ?
-        """, (user_id, event_id))
-
-        existing_rsvp = cursor.fetchone()
+        with _pool.reader() as conn:
+            existing_rsvp = conn.execute(_RSVP_STATUS_SQL, (user_id, event_id)).fetchone()
 
         return {
             "has_rsvpd": existing_rsvp is not None,
@@ -252,60 +981,41 @@ def check_user_rsvp_status(user_id: int, event_id: int) -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"Error checking RSVP status: {e}")
         return {"error": f"Error checking RSVP status: {e}"}
-    finally:
-        conn.close()
 
-def get_event_by_id(event_id: int) -> Optional[Dict[str, Any]]:
-    """Get event details by ID"""
-    conn = get_db_connection()
-    if not conn:
-        return None
+_EVENT_BY_ID_SQL = f"""
+    SELECT {EVENT_COLUMNS}
+    FROM events
+    WHERE id = ?
+"""
 
+
+def _fetch_event_by_id(event_id: int) -> Optional[Event]:
+    with _pool.reader() as conn:
+        return _event_cursor(conn).execute(_EVENT_BY_ID_SQL, (event_id,)).fetchone()
+
+def get_event_by_id(event_id: int) -> Optional[Event]:
+    """Get event details by ID"""
     try:
-        cursor = conn.execute("""
-            SELECT id, title, description, date, time, location, category,
-                   volunteers_needed, contact_email, price, status
-            FROM events
-            WHERE id = ?
-        """, (event_id,))
-
-        row = cursor.fetchone()
-        if row:
-            return {
-                "id": row["id"],
-                "title": row["title"],
-                "description": row["description"],
-                "date": row["date"],
-                "time": row["time"],
-                "location": row["location"],
-                "category": row["category"],
-                "volunteers_needed": row["volunteers_needed"],
-                "contact_email": row["contact_email"],
-                "price": row["price"],
-                "status": row["status"]
-            }
-        return None
+        event_id = int(event_id)
+        return _read_through(("event_by_id", event_id), lambda: _fetch_event_by_id(event_id))
 
     except Exception as e:
         logger.error(f"Error fetching event by ID: {e}")
         return None
-    finally:
-        conn.close()
+
+_USER_BY_EMAIL_SQL = """
+    SELECT id, first_name, last_name, email, phone
+    FROM users
+    WHERE email = ?
+"""
+
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     """Get user by email address"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-
     try:
-        cursor = conn.execute("""
-            SELECT id, first_name, last_name, email, phone
-            FROM users
-            WHERE email = ?
-        """, (email,))
+        with _pool.reader() as conn:
+            row = conn.execute(_USER_BY_EMAIL_SQL, (email,)).fetchone()
 
-        row = cursor.fetchone()
         if row:
             return {
                 "id": row["id"],
@@ -319,5 +1029,20 @@ def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     except Exception as e:
         logger.error(f"Error fetching user by email: {e}")
         return None
-    finally:
-        conn.close()
+
+
+def helper_queries() -> Dict[str, Tuple[str, List[Any]]]:
+    """The SQL each lookup helper runs, with sample parameters, for plan checks"""
+    queries: Dict[str, Tuple[str, List[Any]]] = {
+        "get_events": _like_events_query(10, "", None),
+        "get_events.like": _like_events_query(10, "halaqa", "2026-01-01"),
+        "get_event_by_title.like": (_LIKE_TITLE_SQL, ["%halaqa%"]),
+        "get_event_by_id": (_EVENT_BY_ID_SQL, [1]),
+        "get_volunteer_opportunities": (_VOLUNTEER_OPPORTUNITIES_SQL, []),
+        "check_user_rsvp_status": (_RSVP_STATUS_SQL, [1, 1]),
+        "get_user_by_email": (_USER_BY_EMAIL_SQL, ["someone@example.com"]),
+    }
+    if _pool.event_search == "fts":
+        queries["get_events.fts"] = (_fts_events_sql("2026-01-01"), ['"halaqa"*', "2026-01-01", 10])
+        queries["get_event_by_title.fts"] = (_FTS_TITLE_SQL, ['title : ("halaqa"*)'])
+    return queries
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Index advisor for the tables the AI tools read.
+
+users.db is created and migrated by the Next.js app, which only declares the
+indexes its own pages need. At startup the AI service checks for the indexes
+its helpers and typical ``execute_sql_query`` joins rely on, creates any that
+are missing (including the events_fts full-text index), and runs ``EXPLAIN
+QUERY PLAN`` over those queries so full table scans show up in
+``GET /diagnostics/database`` instead of in latency graphs.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.database import ensure_event_search, get_pool, helper_queries
+from shared.query_guard import explain
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    table: str
+    columns: Tuple[str, ...]
+    reason: str
+
+    @property
+    def name(self) -> str:
+        return f"idx_{self.table}_{'_'.join(self.columns)}"
+
+    @property
+    def sql(self) -> str:
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table} ({', '.join(self.columns)})"
+
+
+RECOMMENDED_INDEXES = [
+    IndexSpec("events", ("status", "date"), "upcoming events and volunteer opportunities filter on status, then date"),
+    IndexSpec("users", ("email",), "RSVP and volunteer tools look the caller up by email"),
+    IndexSpec("event_rsvps", ("event_id",), "model-written SQL joins RSVPs to events on event_id"),
+    IndexSpec("volunteer_signups", ("event_id",), "model-written SQL joins signups to events on event_id"),
+]
+
+# Shapes execute_sql_query produces most often, checked alongside the helpers
+TOOL_QUERIES: Dict[str, Tuple[str, List[Any]]] = {
+    "execute_sql_query.rsvp_count": (
+        """
+        SELECT e.title, COUNT(r.user_id) AS rsvps
+        FROM events e JOIN event_rsvps r ON r.event_id = e.id
+        WHERE e.id = ?
+        """,
+        [1],
+    ),
+    "execute_sql_query.event_volunteers": (
+        """
+        SELECT u.first_name, u.last_name, u.email
+        FROM volunteer_signups v JOIN users u ON u.id = v.user_id
+        WHERE v.event_id = ?
+        """,
+        [1],
+    ),
+}
+
+_report: Optional[Dict[str, Any]] = None
+_report_lock = threading.Lock()
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    """Own read-only connection: pooled ones cache prepared EXPLAINs across schema changes"""
+    return sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+
+
+def _tables(conn: sqlite3.Connection) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _index_prefixes(conn: sqlite3.Connection, table: str) -> List[Tuple[str, ...]]:
+    """Leading columns of every index on ``table`` (including UNIQUE constraints)"""
+    prefixes = []
+    for index in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        columns = conn.execute(f"PRAGMA index_info({index[1]})").fetchall()
+        prefixes.append(tuple(column[2] for column in sorted(columns, key=lambda column: column[0])))
+    return prefixes
+
+
+def missing_indexes(conn: sqlite3.Connection) -> List[IndexSpec]:
+    """Recommended indexes whose columns no existing index leads with"""
+    tables = _tables(conn)
+    missing = []
+    for spec in RECOMMENDED_INDEXES:
+        if spec.table not in tables:
+            continue
+        width = len(spec.columns)
+        if not any(prefix[:width] == spec.columns for prefix in _index_prefixes(conn, spec.table)):
+            missing.append(spec)
+    return missing
+
+
+def check_query_plans(conn: sqlite3.Connection) -> Dict[str, Dict[str, Any]]:
+    plans = {}
+    for name, (sql, parameters) in {**helper_queries(), **TOOL_QUERIES}.items():
+        try:
+            plans[name] = explain(conn, sql, parameters)
+        except sqlite3.Error as e:
+            plans[name] = {"error": str(e)}
+    return plans
+
+
+def run_index_advisor(create: bool = True) -> Dict[str, Any]:
+    """Create missing recommended indexes (if ``create``) and check query plans.
+
+    The result is kept for ``index_report()``. Errors are logged and
+    reported rather than raised, so a read-only database never stops startup.
+    """
+    global _report
+    started = time.perf_counter()
+    pool = get_pool()
+    report: Dict[str, Any] = {"db_path": str(pool.db_path), "created": [], "missing": []}
+    try:
+        conn = _connect(pool.db_path)
+        try:
+            missing = missing_indexes(conn)
+        finally:
+            conn.close()
+        if create and missing:
+            with pool.writer() as conn:
+                for spec in missing:
+                    conn.execute(spec.sql)
+                    logger.info(f"Created index {spec.name}: {spec.reason}")
+            report["created"] = [spec.name for spec in missing]
+        else:
+            report["missing"] = [{"name": spec.name, "sql": spec.sql, "reason": spec.reason} for spec in missing]
+        report["event_search"] = ensure_event_search(create=create)
+
+        conn = _connect(pool.db_path)
+        try:
+            plans = check_query_plans(conn)
+        finally:
+            conn.close()
+        report["queries"] = plans
+        report["full_scans"] = sorted(name for name, plan in plans.items() if plan.get("full_scans"))
+        for name in report["full_scans"]:
+            logger.warning(f"{name} scans {', '.join(plans[name]['full_scans'])} in full")
+    except Exception as e:  # noqa: BLE001
+        logger.error(f"Index advisor failed: {e}")
+        report["error"] = str(e)
+
+    report["checked_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    with _report_lock:
+        _report = report
+    return report
+
+
+def index_report(refresh: bool = False) -> Dict[str, Any]:
+    """Last advisor result; ``refresh`` re-checks plans without creating indexes"""
+    with _report_lock:
+        report = _report
+    if report is None or refresh:
+        report = run_index_advisor(create=False)
+    return report
@@ -0,0 +1,55 @@
+"""Typed records for rows the service reads on every request"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass, fields
+from typing import Any, Iterator, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Event:
+    """One row of ``events``.
+
+    Frozen, so cached records are shared between requests instead of copied.
+    Reads like the dicts it replaced (``event["title"]``, ``event.get("price")``,
+    ``dict(event)``); serialize with shared.serialization.
+    """
+
+    id: int
+    title: str
+    description: Optional[str]
+    date: str
+    time: Optional[str]
+    location: Optional[str]
+    category: Optional[str]
+    volunteers_needed: Optional[int]
+    contact_email: Optional[str]
+    price: Optional[float]
+    status: Optional[str]
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in EVENT_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in EVENT_FIELDS else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return EVENT_FIELDS
+
+    def __contains__(self, key: object) -> bool:
+        return key in EVENT_FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(EVENT_FIELDS)
+
+    @staticmethod
+    def row_factory(cursor: sqlite3.Cursor, row: Tuple[Any, ...]) -> "Event":
+        """sqlite3 row factory; the query must select EVENT_COLUMNS in order"""
+        return Event(*row)
+
+
+EVENT_FIELDS: Tuple[str, ...] = tuple(field.name for field in fields(Event))
+EVENT_COLUMNS = ", ".join(EVENT_FIELDS)
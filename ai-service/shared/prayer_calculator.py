@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Offline prayer time calculator for MAS Queens AI Service
+
+Computes ISNA (method 2) times for the masjid's fixed coordinates from the
+sun's position, following the same algorithm Aladhan uses (PrayTimes.org),
+so prayer times never depend on the network.
+"""
+
+import math
+from datetime import date as date_cls, datetime, timedelta
+from typing import Dict, List, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+# 89-89 168th St, Jamaica, NY 11432
+MASQ_LATITUDE = 40.7097
+MASQ_LONGITUDE = -73.7934
+MASQ_TIMEZONE = ZoneInfo("America/New_York")
+
+# ISNA: Fajr and Isha at 15 degrees below the horizon, Shafi'i Asr
+ISNA_FAJR_ANGLE = 15.0
+ISNA_ISHA_ANGLE = 15.0
+ASR_SHADOW_FACTOR = 1.0
+
+# Sun's apparent radius plus atmospheric refraction at the horizon
+RISE_SET_ANGLE = 0.833
+
+_RAD = math.pi / 180.0
+
+
+def _fix(value: float, modulus: float) -> float:
+    value = math.fmod(value, modulus)
+    return value + modulus if value < 0 else value
+
+
+def _julian_day(year: int, month: int, day: int) -> float:
+    if month <= 2:
+        year -= 1
+        month += 12
+    a = year // 100
+    b = 2 - a + a // 4
+    return math.floor(365.25 * (year + 4716)) + math.floor(30.6001 * (month + 1)) + day + b - 1524.5
+
+
+def _sun_position(jd: float):
+    """Return (declination in degrees, equation of time in hours)"""
+    d = jd - 2451545.0
+    g = _fix(357.529 + 0.98560028 * d, 360.0) * _RAD
+    q = _fix(280.459 + 0.98564736 * d, 360.0)
+    ecliptic_longitude = _fix(q + 1.915 * math.sin(g) + 0.020 * math.sin(2 * g), 360.0) * _RAD
+    obliquity = (23.439 - 0.00000036 * d) * _RAD
+
+    right_ascension = math.atan2(
+        math.cos(obliquity) * math.sin(ecliptic_longitude), math.cos(ecliptic_longitude)
+    ) / _RAD / 15.0
+    equation = q / 15.0 - _fix(right_ascension, 24.0)
+    declination = math.asin(math.sin(obliquity) * math.sin(ecliptic_longitude)) / _RAD
+    return declination, equation
+
+
+def _sun_positions(jds: Sequence[float]) -> Tuple[List[float], List[float]]:
+    """Declinations and equations of time for a column of Julian days"""
+    positions = [_sun_position(jd) for jd in jds]
+    return [declination for declination, _ in positions], [equation for _, equation in positions]
+
+
+def _mid_days(equations: Sequence[float]) -> List[float]:
+    return [_fix(12.0 - equation, 24.0) for equation in equations]
+
+
+def _angle_times(
+    angles: Sequence[float],
+    declinations: Sequence[float],
+    noons: Sequence[float],
+    latitude: float,
+    before_noon: bool = False,
+) -> List[float]:
+    """Local solar hours at which the sun is ``angle`` degrees below the horizon, per day"""
+    lat = latitude * _RAD
+    sign = -1.0 if before_noon else 1.0
+    times = []
+    for angle, declination, noon in zip(angles, declinations, noons):
+        decl = declination * _RAD
+        cos_hour_angle = (-math.sin(angle * _RAD) - math.sin(decl) * math.sin(lat)) / (math.cos(decl) * math.cos(lat))
+        times.append(noon + sign * math.acos(max(-1.0, min(1.0, cos_hour_angle))) / _RAD / 15.0)
+    return times
+
+
+def _asr_angles(declinations: Sequence[float], latitude: float, factor: float) -> List[float]:
+    return [
+        -math.atan(1.0 / (factor + math.tan(abs(latitude - declination) * _RAD))) / _RAD
+        for declination in declinations
+    ]
+
+
+def _format(hours: float) -> str:
+    """Local hours to "HH:MM", rounded to the nearest minute"""
+    minutes = int(math.floor(_fix(hours + 0.5 / 60.0, 24.0) * 60.0))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def calculate_timings(
+    days: Sequence[date_cls],
+    *,
+    latitude: float = MASQ_LATITUDE,
+    longitude: float = MASQ_LONGITUDE,
+    tz: ZoneInfo = MASQ_TIMEZONE,
+) -> List[Dict[str, str]]:
+    """Compute Aladhan-style timings ("HH:MM" strings) for each date in ``days``.
+
+    Works column by column: every step maps one list of per-day values to
+    another, with no state carried between days, so a numpy port only has to
+    swap the list comprehensions for array operations.
+    """
+    jds = [_julian_day(day.year, day.month, day.day) - longitude / (15.0 * 24.0) for day in days]
+    shifts = [
+        datetime(day.year, day.month, day.day, 12, tzinfo=tz).utcoffset().total_seconds() / 3600.0 - longitude / 15.0
+        for day in days
+    ]
+    count = len(jds)
+
+    # Sun position at each event's approximate local hour, one column per hour
+    at = {hour: _sun_positions([jd + hour / 24.0 for jd in jds]) for hour in (5.0, 6.0, 12.0, 13.0, 18.0)}
+    noons = {hour: _mid_days(equations) for hour, (_, equations) in at.items()}
+
+    fajr = _angle_times([ISNA_FAJR_ANGLE] * count, at[5.0][0], noons[5.0], latitude, before_noon=True)
+    sunrise = _angle_times([RISE_SET_ANGLE] * count, at[6.0][0], noons[6.0], latitude, before_noon=True)
+    dhuhr = noons[12.0]
+    asr = _angle_times(_asr_angles(at[13.0][0], latitude, ASR_SHADOW_FACTOR), at[13.0][0], noons[13.0], latitude)
+    sunset = _angle_times([RISE_SET_ANGLE] * count, at[18.0][0], noons[18.0], latitude)
+    isha = _angle_times([ISNA_ISHA_ANGLE] * count, at[18.0][0], noons[18.0], latitude)
+
+    # Angle-based high latitude rule (Aladhan's default): Fajr/Isha may
+    # not be further from sunrise/sunset than angle/60 of the night.
+    nights = [_fix(rise - fall, 24.0) for rise, fall in zip(sunrise, sunset)]
+    fajr = [max(time, rise - ISNA_FAJR_ANGLE / 60.0 * night) for time, rise, night in zip(fajr, sunrise, nights)]
+    isha = [min(time, fall + ISNA_ISHA_ANGLE / 60.0 * night) for time, fall, night in zip(isha, sunset, nights)]
+
+    columns = {
+        "Fajr": fajr, "Sunrise": sunrise, "Dhuhr": dhuhr, "Asr": asr,
+        "Sunset": sunset, "Maghrib": sunset, "Isha": isha,
+    }
+    return [
+        {name: _format(column[index] + shifts[index]) for name, column in columns.items()}
+        for index in range(count)
+    ]
+
+
+def calculate_day(day: date_cls) -> Dict[str, str]:
+    return calculate_timings([day])[0]
+
+
+def calculate_year(year: int) -> Dict[str, Dict[str, str]]:
+    """Timings for every day of ``year``, keyed by YYYY-MM-DD"""
+    start = date_cls(year, 1, 1)
+    days = [start + timedelta(days=offset) for offset in range((date_cls(year + 1, 1, 1) - start).days)]
+    return {day.isoformat(): timings for day, timings in zip(days, calculate_timings(days))}
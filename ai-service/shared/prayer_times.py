@@ -3,16 +3,220 @@
 Shared prayer times functionality for MAS Queens AI Service
 """
 
+import json
+import os
+import sqlite3
+import threading
+import time
 import requests
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from hijri_converter import Hijri, Gregorian
 
+from shared.prayer_calculator import calculate_day
+
 logger = logging.getLogger(__name__)
 
+# MAS Queens address
+MASQ_ADDRESS = "89-89 168th St, Jamaica, NY 11432"
+ISNA_METHOD = 2
+
+# "aladhan" uses the cached Aladhan API; "calculated" computes times offline
+PRAYER_TIMES_BACKEND = os.getenv("PRAYER_TIMES_BACKEND", "aladhan").lower()
+
+ALADHAN_BASE_URL = os.getenv("ALADHAN_BASE_URL", "http://api.aladhan.com/v1")
+ALADHAN_TIMEOUT = float(os.getenv("ALADHAN_TIMEOUT", "10"))
+
+# Timings for a date never change, but refresh old rows now and then in case
+# the upstream calculation is corrected. Stale rows are still served when the
+# upstream is unreachable.
+PRAYER_CACHE_PATH = Path(os.getenv("PRAYER_CACHE_PATH", Path(__file__).parent.parent / "prayer_times.db"))
+PRAYER_CACHE_MAX_AGE_DAYS = float(os.getenv("PRAYER_CACHE_MAX_AGE_DAYS", "30"))
+
+# "month" or "year": how much of the calendar to fetch on a cache miss
+PRAYER_PREFETCH = os.getenv("PRAYER_PREFETCH", "month").lower()
+
+# After an upstream failure, don't retry (and wait on the timeout) for this long
+PRAYER_UPSTREAM_RETRY_SECONDS = float(os.getenv("PRAYER_UPSTREAM_RETRY_SECONDS", "60"))
+
+
+class PrayerTimesCache:
+    """Disk-backed store of raw Aladhan timings keyed by date, method and address"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS prayer_times (
+                    date TEXT NOT NULL,
+                    method INTEGER NOT NULL,
+                    address TEXT NOT NULL,
+                    timings TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (date, method, address)
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, date: str, method: int, address: str) -> Optional[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT timings, fetched_at FROM prayer_times WHERE date = ? AND method = ? AND address = ?",
+                (date, method, address),
+            ).fetchone()
+        if not row:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put_many(self, method: int, address: str, days: Iterable[Tuple[str, Dict[str, str]]]) -> int:
+        fetched_at = time.time()
+        rows = [(date, method, address, json.dumps(timings), fetched_at) for date, timings in days]
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO prayer_times (date, method, address, timings, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache = PrayerTimesCache(PRAYER_CACHE_PATH)
+_fetch_lock = threading.Lock()
+_upstream_failed_at: Optional[float] = None
+
+
+def configure_prayer_cache(path: Path) -> PrayerTimesCache:
+    """Point the prayer times cache at another file, e.g. in tests"""
+    global _cache, _upstream_failed_at
+    _cache.close()
+    _cache = PrayerTimesCache(path)
+    _upstream_failed_at = None
+    return _cache
+
+
+def _calendar_days(payload: Dict[str, Any]) -> List[Tuple[str, Dict[str, str]]]:
+    """Flatten a calendar response (one month, or a whole year keyed by month)"""
+    data = payload["data"]
+    months = data.values() if isinstance(data, dict) else [data]
+
+    days = []
+    for month_days in months:
+        for day in month_days:
+            gregorian = datetime.strptime(day["date"]["gregorian"]["date"], "%d-%m-%Y")
+            days.append((gregorian.strftime("%Y-%m-%d"), day["timings"]))
+    return days
+
+
+def prefetch_prayer_times(
+    year: int,
+    month: Optional[int] = None,
+    *,
+    method: int = ISNA_METHOD,
+    address: str = MASQ_ADDRESS,
+) -> int:
+    """Fetch a whole month (or year, when month is None) in one request and cache it.
+
+    Returns the number of days stored. Raises on network or payload errors.
+    """
+    params: Dict[str, Any] = {"address": address, "method": method, "year": year}
+    if month is None:
+        params["annual"] = "true"
+    else:
+        params["month"] = month
+
+    response = requests.get(f"{ALADHAN_BASE_URL}/calendarByAddress", params=params, timeout=ALADHAN_TIMEOUT)
+    response.raise_for_status()
+    return _cache.put_many(method, address, _calendar_days(response.json()))
+
+
+def _refresh_calendar(target_date: datetime, method: int, address: str) -> bool:
+    """Prefetch the calendar around target_date unless the upstream recently failed"""
+    global _upstream_failed_at
+
+    with _fetch_lock:
+        if _upstream_failed_at and time.monotonic() - _upstream_failed_at < PRAYER_UPSTREAM_RETRY_SECONDS:
+            return False
+        try:
+            month = None if PRAYER_PREFETCH == "year" else target_date.month
+            prefetch_prayer_times(target_date.year, month, method=method, address=address)
+            _upstream_failed_at = None
+            return True
+        except Exception as e:
+            logger.error(f"Error fetching prayer calendar: {e}")
+            _upstream_failed_at = time.monotonic()
+            return False
+
+
+def _cached_timings(date: str, target_date: datetime, method: int, address: str) -> Optional[Dict[str, str]]:
+    cached = _cache.get(date, method, address)
+    if cached:
+        timings, fetched_at = cached
+        if time.time() - fetched_at < PRAYER_CACHE_MAX_AGE_DAYS * 86400:
+            return timings
+
+    if _refresh_calendar(target_date, method, address):
+        refreshed = _cache.get(date, method, address)
+        if refreshed:
+            return refreshed[0]
+
+    if cached:
+        logger.warning(f"Serving stale prayer times for {date}")
+        return cached[0]
+    return None
+
+
+def _format_prayer_times(date: str, target_date: datetime, timings: Dict[str, str]) -> Dict[str, Any]:
+    # Convert to 12-hour format
+    def convert_time(time_24):
+        time_obj = datetime.strptime(time_24.split()[0], "%H:%M")
+        return time_obj.strftime("%I:%M %p").lstrip("0")
+
+    # Calculate Iqama times (10 minutes after Adhan, except Maghrib which is 5 minutes)
+    def get_iqama_time(adhan_time, delay_minutes=10):
+        time_obj = datetime.strptime(adhan_time.split()[0], "%H:%M")
+        iqama_time = time_obj + timedelta(minutes=delay_minutes)
+        return iqama_time.strftime("%I:%M %p").lstrip("0")
+
+    # Get Hijri date
+    gregorian_date = Gregorian(target_date.year, target_date.month, target_date.day)
+    hijri_date = gregorian_date.to_hijri()
+
+    return {
+        "date": date,
+        "hijri_date": f"{hijri_date.day} {hijri_date.month_name()} {hijri_date.year} AH",
+        "fajr": convert_time(timings["Fajr"]),
+        "fajr_iqama": get_iqama_time(timings["Fajr"], 20),  # 20 min for Fajr
+        "sunrise": convert_time(timings["Sunrise"]),
+        "dhuhr": convert_time(timings["Dhuhr"]),
+        "dhuhr_iqama": get_iqama_time(timings["Dhuhr"], 10),
+        "asr": convert_time(timings["Asr"]),
+        "asr_iqama": get_iqama_time(timings["Asr"], 10),
+        "maghrib": convert_time(timings["Maghrib"]),
+        "maghrib_iqama": get_iqama_time(timings["Maghrib"], 5),  # 5 min for Maghrib
+        "isha": convert_time(timings["Isha"]),
+        "isha_iqama": get_iqama_time(timings["Isha"], 10)
+    }
+
+
 def get_prayer_times(date: str = None) -> Dict[str, Any]:
-    """Get prayer times for specific date using Aladhan API"""
+    """Get prayer times for specific date from the configured backend"""
     try:
         if not date:
             date = datetime.now().strftime("%Y-%m-%d")
@@ -20,58 +224,18 @@ def get_prayer_times(date: str = None) -> Dict[str, Any]:
         # Parse the date
         target_date = datetime.strptime(date, "%Y-%m-%d")
 
-        # MAS Queens address
-        address = "89-89 168th St, Jamaica, NY 11432"
-
-        # Aladhan API call
-        response = requests.get(
-            "http://api.aladhan.com/v1/timingsByAddress",
-            params={
-                "address": address,
-                "method": 2,  # ISNA method
-                "date": target_date.strftime("%d-%m-%Y")
-            },
-            timeout=10
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            timings = data["data"]["timings"]
-
-            # Convert to 12-hour format
-            def convert_time(time_24):
-                time_obj = datetime.strptime(time_24.split()[0], "%H:%M")
-                return time_obj.strftime("%I:%M %p").lstrip("0")
-
-            # Calculate Iqama times (10 minutes after Adhan, except Maghrib which is 5 minutes)
-            def get_iqama_time(adhan_time, delay_minutes=10):
-                time_obj = datetime.strptime(adhan_time.split()[0], "%H:%M")
-                iqama_time = time_obj + timedelta(minutes=delay_minutes)
-                return iqama_time.strftime("%I:%M %p").lstrip("0")
-
-            # Get Hijri date
-            gregorian_date = Gregorian(target_date.year, target_date.month, target_date.day)
-            hijri_date = gregorian_date.to_hijri()
-
-            return {
-                "date": date,
-                "hijri_date": f"{hijri_date.day} {hijri_date.month_name()} {hijri_date.year} AH",
-                "fajr": convert_time(timings["Fajr"]),
-                "fajr_iqama": get_iqama_time(timings["Fajr"], 20),  # 20 min for Fajr
-                "sunrise": convert_time(timings["Sunrise"]),
-                "dhuhr": convert_time(timings["Dhuhr"]),
-                "dhuhr_iqama": get_iqama_time(timings["Dhuhr"], 10),
-                "asr": convert_time(timings["Asr"]),
-                "asr_iqama": get_iqama_time(timings["Asr"], 10),
-                "maghrib": convert_time(timings["Maghrib"]),
-                "maghrib_iqama": get_iqama_time(timings["Maghrib"], 5),  # 5 min for Maghrib
-                "isha": convert_time(timings["Isha"]),
-                "isha_iqama": get_iqama_time(timings["Isha"], 10)
-            }
+        if PRAYER_TIMES_BACKEND == "calculated":
+            timings = calculate_day(target_date.date())
+        else:
+            timings = _cached_timings(date, target_date, ISNA_METHOD, MASQ_ADDRESS)
+
+        if timings:
+            return _format_prayer_times(date, target_date, timings)
 
     except Exception as e:
         logger.error(f"Error fetching prayer times: {e}")
-        return {
-            "error": "Unable to fetch prayer times",
-            "date": date or datetime.now().strftime("%Y-%m-%d")
-        }
\ No newline at end of file
+
+    return {
+        "error": "Unable to fetch prayer times",
+        "date": date or datetime.now().strftime("%Y-%m-%d")
+    }
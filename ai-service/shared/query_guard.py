@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Guarded execution of model-written SQL.
+
+``execute_sql_query`` hands the model a raw SQL surface over users.db. A
+query here has to get through four checks before its rows come back:
+
+1. It must be exactly one statement that starts with an allowed operation.
+   Restricted keywords are matched as whole words outside strings and
+   comments, so a column like ``updated_at`` is fine.
+2. A SQLite authorizer admits reads only, and blanks out password hashes.
+3. ``EXPLAIN QUERY PLAN`` must not show an unbounded full scan of a large
+   table.
+4. A progress handler aborts it after an instruction budget or a
+   wall-clock timeout, and rows are fetched in batches up to a row cap.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Set, Union
+
+logger = logging.getLogger(__name__)
+
+Parameters = Union[Sequence[Any], Dict[str, Any]]
+
+# Rows returned to the model; anything past this is dropped and flagged
+SQL_ROW_LIMIT = int(os.getenv("AI_SQL_ROW_LIMIT", "200"))
+SQL_TIMEOUT_SECONDS = float(os.getenv("AI_SQL_TIMEOUT", "2"))
+# SQLite VM instructions one query may run
+SQL_INSTRUCTION_BUDGET = int(os.getenv("AI_SQL_INSTRUCTION_BUDGET", "50000000"))
+# Full scans of tables larger than this are rejected unless the query has a LIMIT
+SQL_SCAN_ROW_LIMIT = int(os.getenv("AI_SQL_SCAN_ROW_LIMIT", "50000"))
+
+# How often (in VM instructions) the progress handler checks the budgets
+PROGRESS_INTERVAL = 1000
+FETCH_BATCH = 50
+
+RESTRICTED_KEYWORDS = {
+    "ALTER", "ANALYZE", "ATTACH", "CREATE", "DELETE", "DETACH", "DROP", "INSERT",
+    "PRAGMA", "REINDEX", "REPLACE", "TRUNCATE", "UPDATE", "VACUUM",
+}
+
+# Columns the model may name but never read
+HIDDEN_COLUMNS = {("users", "password")}
+
+# Pragmas SQLite runs internally for reads (FTS5 checks data_version)
+_INTERNAL_PRAGMAS = {"data_version"}
+
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+_TOKEN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?(?:\*/|$))
+    | (?P<string>'(?:[^']|'')*'?)
+    | (?P<quoted>"(?:[^"]|"")*"?|`[^`]*`?|\[[^\]]*\]?)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    | (?P<other>.)
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+# Every SCAN step reads a whole table, even through an index ("SCAN r USING
+# COVERING INDEX ..."); FTS5 lookups ("SCAN events_fts VIRTUAL TABLE ...") don't
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX \w+)?$")
+_TABLE_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+
+
+class QueryRejected(ValueError):
+    """The query isn't a single bounded read, or ran past its budget"""
+
+
+@dataclass
+class QueryResult:
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    truncated: bool = False
+    elapsed_ms: float = 0.0
+    error: Optional[str] = None
+    # Tables the statement reads (filled in when it was validated)
+    tables: FrozenSet[str] = frozenset()
+    plan: List[str] = field(default_factory=list)
+    # The statement or plan check refused it; the same SQL always will
+    rejected: bool = False
+    cached: bool = False
+
+    def as_tool_result(self) -> Dict[str, Any]:
+        if self.error:
+            return {"error": self.error}
+        result: Dict[str, Any] = {"rows": self.rows, "row_count": len(self.rows)}
+        if self.truncated:
+            result["truncated"] = True
+        return result
+
+
+def _significant_tokens(sql: str) -> List[str]:
+    """Words (upper-cased) and punctuation, without whitespace, comments or literals"""
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind == "word":
+            tokens.append(match.group().upper())
+        elif kind == "other":
+            tokens.append(match.group())
+        elif kind in ("string", "quoted"):
+            tokens.append("?")
+    return tokens
+
+
+def check_statement(sql: str, allowed_operations: Sequence[str] = ("SELECT", "WITH")) -> List[str]:
+    """Reject anything but one read statement; returns its tokens"""
+    tokens = _significant_tokens(sql)
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    if not tokens:
+        raise QueryRejected("empty query")
+    if ";" in tokens:
+        raise QueryRejected("only one statement is allowed")
+    if tokens[0] not in {operation.upper() for operation in allowed_operations}:
+        raise QueryRejected(f"{tokens[0]} statements are not permitted")
+    for index, token in enumerate(tokens):
+        # replace(x, y, z) is a string function, REPLACE INTO a write
+        is_function = index + 1 < len(tokens) and tokens[index + 1] == "("
+        if token in RESTRICTED_KEYWORDS and not is_function:
+            raise QueryRejected(f"{token} is not permitted")
+    return tokens
+
+
+def _read_only_authorizer(tables: Set[str]) -> Callable[..., int]:
+    """Authorizer that admits reads only and records the tables they touch in ``tables``"""
+
+    def authorize(action: int, arg1: Optional[str], arg2: Optional[str], database: Optional[str], source: Optional[str]) -> int:
+        if action == sqlite3.SQLITE_READ:
+            tables.add(arg1)
+            if (arg1, arg2) in HIDDEN_COLUMNS:
+                return sqlite3.SQLITE_IGNORE
+        if action in _READ_ACTIONS:
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_PRAGMA and arg1 in _INTERNAL_PRAGMAS and arg2 is None:
+            return sqlite3.SQLITE_OK
+        return sqlite3.SQLITE_DENY
+
+    return authorize
+
+
+def explain(conn: sqlite3.Connection, sql: str, parameters: Parameters = ()) -> Dict[str, Any]:
+    """``EXPLAIN QUERY PLAN`` steps for a query and the tables (or aliases) it scans in full"""
+    steps = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()]
+    full_scans = [match[1] for match in map(_FULL_SCAN.match, steps) if match]
+    return {
+        "plan": steps,
+        "full_scans": full_scans,
+        "temp_sort": any(step.startswith("USE TEMP B-TREE") for step in steps),
+    }
+
+
+def _table_rows(conn: sqlite3.Connection, table: str) -> int:
+    """Rough row count: the largest rowid, which costs one index seek"""
+    try:
+        row = conn.execute(f'SELECT MAX(_rowid_) FROM "{table}"').fetchone()
+    except sqlite3.Error:
+        # CTEs, subqueries, WITHOUT ROWID tables: the progress budget covers them
+        return 0
+    return int(row[0] or 0)
+
+
+def _outer_tokens(tokens: List[str]) -> List[str]:
+    """Tokens outside any parentheses: the outermost statement, not its subqueries or CTEs"""
+    outer = []
+    depth = 0
+    for token in tokens:
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth = max(0, depth - 1)
+        elif not depth:
+            outer.append(token)
+    return outer
+
+
+def check_plan(
+    conn: sqlite3.Connection, sql: str, parameters: Parameters, tokens: List[str], scan_limit: int
+) -> Dict[str, Any]:
+    """Reject full scans of tables over ``scan_limit`` rows unless the outer LIMIT bounds them"""
+    plan = explain(conn, sql, parameters)
+    if not plan["full_scans"]:
+        return plan
+    # A LIMIT inside a subquery bounds only that subquery, not the scans around it
+    if "LIMIT" in _outer_tokens(tokens) and not plan["temp_sort"] and "GROUP" not in tokens:
+        return plan
+    aliases = {alias or table: table for table, alias in _TABLE_ALIAS.findall(sql)}
+    for scanned in plan["full_scans"]:
+        table = aliases.get(scanned, scanned)
+        rows = _table_rows(conn, table)
+        if rows > scan_limit:
+            raise QueryRejected(
+                f"query scans all ~{rows} rows of {table}; filter on an indexed column or add a LIMIT"
+            )
+    return plan
+
+
+def run_guarded_query(
+    conn: sqlite3.Connection,
+    sql: str,
+    parameters: Optional[Parameters] = None,
+    *,
+    allowed_operations: Sequence[str] = ("SELECT", "WITH"),
+    row_limit: int = SQL_ROW_LIMIT,
+    timeout: float = SQL_TIMEOUT_SECONDS,
+    instruction_budget: int = SQL_INSTRUCTION_BUDGET,
+    scan_limit: int = SQL_SCAN_ROW_LIMIT,
+    checked: bool = False,
+) -> QueryResult:
+    """Run model-written SQL on ``conn`` within the checks above.
+
+    Never raises for a bad query; the reason is in ``QueryResult.error`` so
+    the model can rewrite it. ``checked`` skips the statement and plan checks
+    for SQL that already passed them; the authorizer and budgets still apply.
+    """
+    started = time.perf_counter()
+    parameters = parameters or []
+    result = QueryResult()
+    executed = [0]
+    deadline = started + timeout
+
+    def progress() -> int:
+        executed[0] += PROGRESS_INTERVAL
+        return int(executed[0] > instruction_budget or time.perf_counter() > deadline)
+
+    tables: Set[str] = set()
+    conn.set_authorizer(_read_only_authorizer(tables))
+    try:
+        if not checked:
+            tokens = check_statement(sql, allowed_operations)
+            result.plan = check_plan(conn, sql, parameters, tokens, scan_limit)["plan"]
+            result.tables = frozenset(tables)
+
+        conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+        cursor = conn.execute(sql, parameters)
+        columns = [column[0] for column in cursor.description]
+        rows: List[Any] = []
+        # One row past the cap tells us whether anything was cut off
+        while len(rows) <= row_limit:
+            batch = cursor.fetchmany(min(FETCH_BATCH, row_limit + 1 - len(rows)))
+            if not batch:
+                break
+            rows.extend(batch)
+        cursor.close()
+        result.truncated = len(rows) > row_limit
+        result.rows = [dict(zip(columns, row)) for row in rows[:row_limit]]
+    except QueryRejected as e:
+        result.error = f"Query rejected: {e}"
+        result.rejected = True
+    except sqlite3.Error as e:
+        if "interrupted" in str(e):
+            budget = "time" if time.perf_counter() > deadline else "instruction"
+            result.error = f"Query rejected: exceeded its {budget} budget; narrow the filters or add a LIMIT"
+        elif "not authorized" in str(e):
+            result.error = "Query rejected: only reads are permitted"
+        else:
+            result.error = f"SQL error: {e}"
+    finally:
+        conn.set_progress_handler(None, 0)
+        conn.set_authorizer(None)
+
+    result.elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+    if result.error:
+        logger.warning(f"{result.error} ({' '.join(sql.split())[:200]})")
+    return result
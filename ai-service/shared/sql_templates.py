@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Template catalog for model-written SQL.
+
+The model asks ``execute_sql_query`` the same few questions over and over
+("how many RSVPs does X have", "events in category Y"), varying only the
+literals. Each query is normalized into a template with its literals pulled
+out as parameters. A template is validated by shared.query_guard once (per
+schema version), and results are cached per template and parameters until
+one of the tables the template reads changes. A repeated question costs
+one dictionary lookup instead of a validation, a plan check and a query.
+
+Per-table change counters live in ``ai_table_versions`` and are bumped by
+triggers, so writes from the Next.js app invalidate results too. Those
+triggers change the schema of the Next.js app's database, so they are only
+installed at startup when AI_SQL_TABLE_VERSIONS is set. Without them, any
+commit to the database invalidates every result instead.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Sequence, Tuple
+
+from shared.database import ConnectionPool, TTLCache, get_pool
+from shared.query_guard import Parameters, QueryResult, run_guarded_query
+
+logger = logging.getLogger(__name__)
+
+SQL_TEMPLATE_CACHE_SIZE = int(os.getenv("AI_SQL_TEMPLATE_CACHE_SIZE", "256"))
+SQL_RESULT_CACHE_SIZE = int(os.getenv("AI_SQL_RESULT_CACHE_SIZE", "256"))
+SQL_RESULT_CACHE_TTL = float(os.getenv("AI_SQL_RESULT_CACHE_TTL", "300"))
+
+# Tables execute_sql_query describes to the model; each gets a change counter
+VERSIONED_TABLES = ("events", "users", "event_rsvps", "volunteer_signups")
+
+# FTS5 index (and its events_fts_* shadow tables) change exactly when their content table does
+DERIVED_TABLES = {"events_fts": "events"}
+
+_TOKEN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?(?:\*/|$))
+    | (?P<blob>[xX]'[0-9A-Fa-f]*')
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+    | (?P<number>0[xX][0-9A-Fa-f]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<placeholder>\?\d*|[:@$]\w+)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    | (?P<other>.)
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+
+# Words that end an ORDER BY / GROUP BY list, where numbers are column positions
+_END_OF_BY = {"LIMIT", "HAVING", "WINDOW", "UNION", "EXCEPT", "INTERSECT", "FROM", "WHERE", "SELECT"}
+
+
+def _literal(kind: str, text: str) -> Any:
+    if kind == "string":
+        return text[1:-1].replace("''", "'")
+    if text[:2].lower() == "0x":
+        return int(text, 16)
+    if any(character in text for character in ".eE"):
+        return float(text)
+    return int(text)
+
+
+def _source_table(table: str) -> str:
+    for derived, source in DERIVED_TABLES.items():
+        if table == derived or table.startswith(f"{derived}_"):
+            return source
+    return table
+
+
+def _freeze(value: Any) -> Optional[Hashable]:
+    """Hashable cache key for a parameter list, or None if a value can't be one"""
+    try:
+        hash(value)
+    except TypeError:
+        return None
+    return value
+
+
+def normalize_query(sql: str, parameters: Optional[Parameters] = None) -> Tuple[str, Parameters]:
+    """Template and parameters for ``sql``: literals become ``?`` placeholders.
+
+    Whitespace runs and comments collapse to one space. Literals stay in
+    place where replacing them would change the result: in a SELECT list
+    (they name the output columns) and in ORDER BY / GROUP BY positions.
+    Queries with named or numbered placeholders only get their whitespace
+    normalized.
+    """
+    provided = list(parameters or [])
+    extract = not isinstance(parameters, dict)
+    parts: List[str] = []
+    values: List[Any] = []
+    # One frame per parenthesis depth: [in SELECT list, in ORDER/GROUP BY list]
+    frames = [[False, False]]
+    previous_word = ""
+    spaced = False
+
+    for match in _TOKEN.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind in ("space", "comment"):
+            spaced = bool(parts)
+            continue
+        if spaced:
+            parts.append(" ")
+            spaced = False
+
+        frame = frames[-1]
+        if kind == "word":
+            word = text.upper()
+            if word == "SELECT":
+                frame[0] = True
+            elif word == "FROM":
+                frame[0] = False
+            if word == "BY" and previous_word in ("ORDER", "GROUP"):
+                frame[1] = True
+            elif word in _END_OF_BY:
+                frame[1] = False
+            previous_word = word
+        elif text == "(":
+            frames.append([False, False])
+        elif text == ")" and len(frames) > 1:
+            frames.pop()
+        elif kind == "placeholder":
+            if text != "?" or not extract or not provided:
+                extract = False
+            else:
+                values.append(provided.pop(0))
+
+        in_select_list = any(select for select, _ in frames)
+        if kind in ("string", "number") and extract and not in_select_list and not (kind == "number" and frame[1]):
+            values.append(_literal(kind, text))
+            parts.append("?")
+        else:
+            parts.append(text)
+
+    if not extract or provided:
+        return " ".join(sql.split()), parameters or []
+    return "".join(parts), values
+
+
+@dataclass
+class TemplateEntry:
+    template: str
+    schema_version: int
+    tables: FrozenSet[str] = frozenset()
+    plan: List[str] = field(default_factory=list)
+    # Set when the template failed validation; repeats get the same answer
+    error: Optional[str] = None
+    uses: int = 0
+    result_hits: int = 0
+
+
+class QueryCatalog:
+    """Validated SQL templates plus a result cache invalidated per table"""
+
+    def __init__(
+        self,
+        maxsize: int = SQL_TEMPLATE_CACHE_SIZE,
+        result_cache_size: int = SQL_RESULT_CACHE_SIZE,
+        result_ttl: float = SQL_RESULT_CACHE_TTL,
+    ):
+        self.maxsize = max(1, maxsize)
+        self._templates: "OrderedDict[str, TemplateEntry]" = OrderedDict()
+        self._results = TTLCache(result_cache_size, result_ttl)
+        self._lock = threading.Lock()
+        self._pool: Optional[ConnectionPool] = None
+        # "triggers" if ai_table_versions is installed, else "database"
+        self.versioning: Optional[str] = None
+        self._generation: Optional[int] = None
+        self._schema_version = 0
+        self._table_versions: Dict[str, int] = {}
+        self.lookups = 0
+        self.validations = 0
+        self.result_hits = 0
+        self.rejected_hits = 0
+
+    def _reset(self, pool: ConnectionPool) -> None:
+        self._pool = pool
+        self._templates.clear()
+        self._results.clear()
+        self.versioning = None
+        self._generation = None
+
+    def _detect_versioning(self, pool: ConnectionPool) -> None:
+        with pool.reader() as conn:
+            installed = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ai_table_versions'"
+            ).fetchone()
+        self.versioning = "triggers" if installed else "database"
+
+    def install_table_versions(self) -> bool:
+        """Create ai_table_versions and its change-counting triggers; True if they're in place.
+
+        Every insert, update and delete on a versioned table (including the
+        Next.js app's) then also bumps a counter, so this is a startup step
+        behind AI_SQL_TABLE_VERSIONS, never something a query does.
+        """
+        pool = get_pool()
+        try:
+            with pool.writer() as conn:
+                existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                versioned = [table for table in VERSIONED_TABLES if table in existing]
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS ai_table_versions "
+                    "(name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+                )
+                for table in versioned:
+                    conn.execute("INSERT OR IGNORE INTO ai_table_versions (name) VALUES (?)", (table,))
+                    for operation in ("INSERT", "UPDATE", "DELETE"):
+                        conn.execute(
+                            f"CREATE TRIGGER IF NOT EXISTS ai_version_{table}_{operation.lower()} "
+                            f"AFTER {operation} ON {table} BEGIN "
+                            f"UPDATE ai_table_versions SET version = version + 1 WHERE name = '{table}'; END"
+                        )
+            logger.info(f"Per-table SQL result invalidation installed for {', '.join(versioned)}")
+            installed = True
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"Per-table SQL result invalidation unavailable, using database commits: {e}")
+            installed = False
+        with self._lock:
+            # Checked again on the next query
+            self.versioning = None
+        return installed
+
+    def _refresh(self) -> Tuple[int, int]:
+        """Schema version and database generation, re-reading table versions on a change"""
+        pool = get_pool()
+        with self._lock:
+            if pool is not self._pool:
+                self._reset(pool)
+            if self.versioning is None:
+                self._detect_versioning(pool)
+
+        generation = pool.data_generation()
+        with self._lock:
+            if generation != self._generation:
+                with pool.reader() as conn:
+                    self._schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+                    if self.versioning == "triggers":
+                        self._table_versions = dict(conn.execute("SELECT name, version FROM ai_table_versions"))
+                self._generation = generation
+            return self._schema_version, generation
+
+    def _result_version(self, tables: FrozenSet[str], generation: int) -> Tuple[Any, ...]:
+        sources = sorted({_source_table(table) for table in tables})
+        if self.versioning == "triggers" and all(table in self._table_versions for table in sources):
+            return tuple(self._table_versions[table] for table in sources)
+        return ("database", generation)
+
+    def execute(
+        self,
+        sql: str,
+        parameters: Optional[Parameters] = None,
+        *,
+        allowed_operations: Sequence[str] = ("SELECT", "WITH"),
+    ) -> QueryResult:
+        """Answer from the result cache, or validate (once per template) and run the query"""
+        started = time.perf_counter()
+        template, values = normalize_query(sql, parameters)
+        key = _freeze((template, tuple(sorted(values.items())) if isinstance(values, dict) else tuple(values)))
+        schema_version, generation = self._refresh()
+
+        with self._lock:
+            self.lookups += 1
+            entry = self._templates.get(template)
+            if entry is not None and entry.schema_version != schema_version:
+                del self._templates[template]
+                entry = None
+            if entry is not None:
+                self._templates.move_to_end(template)
+                entry.uses += 1
+                if entry.error:
+                    self.rejected_hits += 1
+                    return QueryResult(error=entry.error, cached=True)
+                version = self._result_version(entry.tables, generation)
+
+        if entry is not None and key is not None:
+            hit, cached = self._results.get(key, version)
+            if hit:
+                with self._lock:
+                    entry.result_hits += 1
+                    self.result_hits += 1
+                return replace(
+                    cached,
+                    rows=list(cached.rows),
+                    cached=True,
+                    elapsed_ms=round((time.perf_counter() - started) * 1000, 3),
+                )
+
+        with get_pool().reader() as conn:
+            result = run_guarded_query(
+                conn, template, values, allowed_operations=allowed_operations, checked=entry is not None
+            )
+
+        # Remember templates that passed the checks or that the checks refused.
+        # An error before planning (a parameter count mismatch) may not recur
+        # with other values, so that template is validated again next time.
+        if entry is None and (result.rejected or result.plan or not result.error):
+            entry = TemplateEntry(
+                template,
+                schema_version,
+                tables=result.tables,
+                plan=result.plan,
+                error=result.error if result.rejected else None,
+                uses=1,
+            )
+            with self._lock:
+                self.validations += 1
+                self._templates[template] = entry
+                while len(self._templates) > self.maxsize:
+                    self._templates.popitem(last=False)
+            version = self._result_version(entry.tables, generation)
+
+        if not result.error and key is not None:
+            self._results.put(key, version, result)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+            self._results.clear()
+
+    def stats(self, top: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            entries = sorted(self._templates.values(), key=lambda entry: entry.uses, reverse=True)[:top]
+            return {
+                "templates": len(self._templates),
+                "lookups": self.lookups,
+                "validations": self.validations,
+                "result_hits": self.result_hits,
+                "hit_rate": round(self.result_hits / self.lookups, 4) if self.lookups else 0.0,
+                "rejected_hits": self.rejected_hits,
+                "versioning": self.versioning,
+                "results": self._results.stats(),
+                "top": [
+                    {
+                        "template": entry.template,
+                        "uses": entry.uses,
+                        "result_hits": entry.result_hits,
+                        "hit_rate": round(entry.result_hits / entry.uses, 4) if entry.uses else 0.0,
+                        "tables": sorted(entry.tables),
+                        "rejected": entry.error is not None,
+                    }
+                    for entry in entries
+                ],
+            }
+
+
+query_catalog = QueryCatalog()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Multi-round tool loop tests against a scripted fake Groq client"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from config import Settings
+from memory import InMemorySessionStore
+from providers.base import ChatProvider, ChatResult
+from providers.groq import GroqChatProvider
+from shared import prayer_times
+from tools import ToolDefinition, ToolRegistry
+
+
+def _tool_call(call_id, name, arguments="{}"):
+    return SimpleNamespace(id=call_id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class ScriptedCompletions:
+    """Replays one assistant message per completion and records the requests"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    def create(self, **params):
+        self.requests.append(params)
+        tool_calls = self.replies.pop(0) if params.get("tools") else None
+        message = SimpleNamespace(content=None if tool_calls else "Done.", tool_calls=tool_calls)
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=10)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+class AsyncScriptedCompletions(ScriptedCompletions):
+    async def create(self, **params):
+        return super().create(**params)
+
+
+class StreamingCompletions:
+    """Streams one round per completion: text chunks, then any tool calls"""
+
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+        self.requests = []
+
+    async def create(self, **params):
+        self.requests.append(params)
+        texts, tool_calls = self.rounds.pop(0)
+
+        async def chunks():
+            for text in texts:
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None))])
+            for index, call in enumerate(tool_calls or []):
+                delta = SimpleNamespace(content=None, tool_calls=[SimpleNamespace(index=index, id=call.id, function=call.function)])
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+        return chunks()
+
+
+class LoopCheckingStore(InMemorySessionStore):
+    """Records session store calls made on the event loop thread"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_event_loop = []
+
+    def _check(self, name):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self.on_event_loop.append(name)
+
+    def get(self, session_id):
+        self._check("get")
+        return super().get(session_id)
+
+    def append(self, session_id, role, content):
+        self._check("append")
+        super().append(session_id, role, content)
+
+    def remember(self, session_id, attributes):
+        self._check("remember")
+        super().remember(session_id, attributes)
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def _provider(completions, **overrides):
+    settings = Settings(groq_api_key="test", **overrides)
+    registry = ToolRegistry()
+    for name, handler in [
+        ("search_events", lambda arguments: {"events": [{"id": 7, "title": "Halaqa"}]}),
+        ("rsvp_event", lambda arguments: {"success": True, "event_id": arguments.get("event_id")}),
+    ]:
+        registry.register(ToolDefinition(name, name, {"type": "object", "properties": {}}, handler))
+    provider = GroqChatProvider(settings, LoopCheckingStore(settings.max_history_messages), registry)
+    provider._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    provider._async_client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return provider
+
+
+def test_chained_tool_rounds():
+    completions = ScriptedCompletions(
+        [
+            [_tool_call("a", "search_events", '{"query": "halaqa"}')],
+            [_tool_call("b", "rsvp_event", '{"event_id": 7}')],
+            None,
+        ]
+    )
+    result = _provider(completions).generate("RSVP me to the next halaqa", "s1")
+
+    assert result.message == "Done."
+    assert result.used_tools == ["search_events", "rsvp_event"]
+    assert result.rounds == 3
+    assert result.stop_reason == "answered"
+    assert (result.prompt_tokens, result.completion_tokens) == (300, 30)
+    assert result.latency_ms > 0
+    assert all("tools" in request for request in completions.requests)
+
+
+def test_round_limit_forces_an_answer():
+    looping = [[_tool_call(str(index), "search_events")] for index in range(10)]
+    completions = AsyncScriptedCompletions(looping)
+    provider = _provider(completions, max_tool_rounds=2)
+    result = asyncio.run(provider.generate_async("Find everything", "s2"))
+
+    assert result.rounds == 3
+    assert result.stop_reason == "max_rounds"
+    assert result.used_tools == ["search_events", "search_events"]
+    assert "tools" not in completions.requests[-1]
+
+
+def test_token_budget_stops_tool_rounds():
+    looping = [[_tool_call(str(index), "search_events")] for index in range(10)]
+    completions = ScriptedCompletions(looping)
+    result = _provider(completions, token_budget=200).generate("Find everything", "s3")
+
+    assert result.stop_reason == "token_budget"
+    assert result.rounds == 3
+    assert result.total_tokens == 330
+
+
+def test_fast_path_skips_follow_up_completion(monkeypatch):
+    monkeypatch.setattr(prayer_times, "PRAYER_TIMES_BACKEND", "calculated")
+    completions = ScriptedCompletions([[_tool_call("p", "get_prayer_times", '{"date": "2026-10-17"}')]])
+    provider = _provider(completions)
+    provider.tool_registry = ToolRegistry(fast_path_tools=["get_prayer_times"])
+    result = provider.generate("What time is maghrib and isha?", "s4")
+
+    assert len(completions.requests) == 1
+    assert result.stop_reason == "fast_path"
+    assert result.message.startswith("On Saturday, October 17, 2026:")
+    assert "- Maghrib: " in result.message and "- Isha: " in result.message
+    assert "Fajr" not in result.message
+
+    provider.tool_registry.set_renderer("get_prayer_times", None)
+    completions.replies = [[_tool_call("q", "get_prayer_times")], None]
+    assert provider.generate("Prayer times?", "s5").stop_reason == "answered"
+
+
+@pytest.mark.parametrize("message", [
+    "How long between Maghrib and Isha today?",
+    "Is Fajr earlier tomorrow?",
+    "How many minutes until Asr?",
+    "Can I still pray Dhuhr at 3pm?",
+])
+def test_fast_path_leaves_comparisons_to_the_model(monkeypatch, message):
+    monkeypatch.setattr(prayer_times, "PRAYER_TIMES_BACKEND", "calculated")
+    completions = ScriptedCompletions([[_tool_call("p", "get_prayer_times", '{"date": "2026-10-17"}')], None])
+    provider = _provider(completions)
+    provider.tool_registry = ToolRegistry(fast_path_tools=["get_prayer_times"])
+    result = provider.generate(message, "s14")
+
+    assert result.stop_reason == "answered"
+    assert len(completions.requests) == 2
+
+
+def test_history_is_compacted_and_entities_remembered():
+    completions = ScriptedCompletions([[_tool_call("a", "search_events")], None])
+    provider = _provider(completions, history_token_budget=120)
+    for index in range(6):
+        provider.session_store.append("s6", "user", f"Tell me about program {index} " + "please " * 30)
+        provider.session_store.append("s6", "assistant", "It is on Friday.")
+
+    result = provider.generate("What events are coming up?", "s6")
+    messages = completions.requests[0]["messages"]
+    dynamic = [message for message in messages if message["role"] == "system"][1]
+
+    assert "Earlier the user asked:" in dynamic["content"]
+    assert len(messages) < 2 + 12 + 1
+    assert result.prompt_tokens_estimate > 0
+    assert provider.session_store.get("s6").attributes["discussed_events"] == ["Halaqa"]
+
+    completions.replies = [None]
+    provider.generate("When does it start?", "s6")
+    assert "Events discussed: Halaqa." in completions.requests[-1]["messages"][-2]["content"]
+
+
+def test_system_prompt_prefix_is_stable():
+    completions = ScriptedCompletions([None, None])
+    provider = _provider(completions)
+    provider.generate("Salam", "s7")
+    provider.generate("Jazakallah khair", "s8")
+    first, second = (request["messages"] for request in completions.requests)
+
+    assert first[0] == second[0]
+    assert "- Date:" not in first[0]["content"]
+    assert second[-2]["content"].startswith("CURRENT CONTEXT:\n- Date: ")
+    assert completions.requests[0]["tools"] == completions.requests[1]["tools"]
+    assert len(provider._prefixes) == 1
+
+
+def test_tools_are_subset_by_topic():
+    completions = ScriptedCompletions([None, None, None])
+    provider = _provider(completions, tool_subsetting=True)
+    provider.generate("What time is maghrib tomorrow?", "s9")
+    provider.generate("Is it free?", "s9")
+    prayer, follow_up = (request["tools"] for request in completions.requests[:2])
+
+    assert [tool["function"]["name"] for tool in prayer] == ["get_prayer_times", "get_next_prayer_time"]
+    assert "rsvp_to_event" in [tool["function"]["name"] for tool in follow_up]
+    assert provider.tool_registry.as_openai_tools(["get_next_prayer_time", "get_prayer_times"]) == prayer
+
+    provider.settings.tool_subsetting = False
+    provider.generate("What time is maghrib tomorrow?", "s10")
+    assert completions.requests[-1]["tools"] == provider.tool_registry.as_openai_tools()
+
+
+def test_stream_stores_what_the_client_was_shown():
+    completions = StreamingCompletions(
+        [
+            (["Let me check. "], [_tool_call("a", "search_events", '{"query": "halaqa"}')]),
+            (["The halaqa ", "is on Friday."], None),
+        ]
+    )
+    provider = _provider(completions)
+    events = asyncio.run(_collect(provider.stream("When is the halaqa?", "s11")))
+    shown = "".join(event["data"]["content"] for event in events if event["event"] == "token")
+    done = events[-1]["data"]
+
+    assert shown == "Let me check. The halaqa is on Friday."
+    assert done["message"] == shown
+    assert provider.session_store.get("s11").history[-1]["content"] == shown
+    assert (done["rounds"], done["stop_reason"], done["tools_used"]) == (2, "answered", ["search_events"])
+
+
+def test_default_stream_sends_the_full_done_payload():
+    class OneShotProvider(ChatProvider):
+        def generate(self, message, session_id):
+            return ChatResult(message="Salam!", rounds=1, latency_ms=12.5)
+
+    provider = OneShotProvider(Settings(groq_api_key="test"), InMemorySessionStore(), ToolRegistry())
+    done = asyncio.run(_collect(provider.stream("Salam", "s12")))[-1]
+
+    assert done["event"] == "done"
+    assert done["data"] == ChatResult(message="Salam!", rounds=1, latency_ms=12.5).done_event(12.5)["data"]
+    assert {"tool_timings", "rounds", "stop_reason"} <= done["data"].keys()
+
+
+def test_async_paths_keep_the_session_store_off_the_event_loop():
+    completions = AsyncScriptedCompletions([[_tool_call("a", "search_events")], None])
+    provider = _provider(completions)
+    asyncio.run(provider.generate_async("What events are coming up?", "s13"))
+
+    provider._async_client.chat.completions = StreamingCompletions([(["Friday."], None)])
+    asyncio.run(_collect(provider.stream("And after that?", "s13")))
+
+    assert provider.session_store.on_event_loop == []
+    assert len(provider.session_store.get("s13").history) == 4
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Event cache invalidation tests against a temp copy of the users.db schema"""
+
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from shared import database
+
+
+def test_generation_is_stable_across_threads_without_writes(app_db, add_event):
+    add_event("Friday Halaqa")
+    pool = database.configure_pool(app_db, size=2)
+    baseline = pool.data_generation()
+
+    # Far more threads than pooled readers: overflow and first-seen readers alike
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        generations = set(executor.map(lambda _: pool.data_generation(), range(240)))
+        database.clear_event_cache()
+        list(executor.map(lambda _: database.get_events(5), range(240)))
+
+    assert generations == {baseline}
+    assert pool.data_generation() == baseline
+    stats = database.event_cache_stats()
+    assert stats["invalidations"] == 0
+    assert stats["misses"] <= 12
+
+
+def test_commit_from_another_connection_advances_generation(app_db, add_event):
+    add_event("Friday Halaqa")
+    pool = database.get_pool()
+    assert [event.title for event in database.get_events(5)] == ["Friday Halaqa"]
+    before = pool.data_generation()
+
+    conn = sqlite3.connect(app_db)
+    conn.execute("UPDATE events SET title = 'Saturday Halaqa'")
+    conn.commit()
+    conn.close()
+
+    assert pool.data_generation() == before + 1
+    assert [event.title for event in database.get_events(5)] == ["Saturday Halaqa"]
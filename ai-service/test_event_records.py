@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Event records from the row factory and their serialization"""
+
+import json
+import sqlite3
+
+import pytest
+
+from shared import serialization
+from shared.models import EVENT_COLUMNS, EVENT_FIELDS, Event
+
+ROW = (3, "Family Night", "Dinner and games", "2026-10-23", "18:30", "Gym", "Community", 4, "events@masq.org", 0, "active")
+
+
+def test_row_factory_builds_records():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE events ({EVENT_COLUMNS})")
+    conn.execute(f"INSERT INTO events VALUES ({', '.join('?' * len(EVENT_FIELDS))})", ROW)
+    cursor = conn.cursor()
+    cursor.row_factory = Event.row_factory
+    event = cursor.execute(f"SELECT {EVENT_COLUMNS} FROM events").fetchone()
+
+    assert event == Event(*ROW)
+    assert event["title"] == event.title == "Family Night"
+    assert event.get("price") == 0 and event.get("requirements", "n/a") == "n/a"
+    assert dict(event)["contact_email"] == "events@masq.org"
+    assert "status" in event and "requirements" not in event
+    with pytest.raises(KeyError):
+        event["requirements"]
+    with pytest.raises(AttributeError):
+        event.__dict__
+
+
+@pytest.mark.parametrize("backend", ["default", "json"])
+def test_serialization_matches_json(monkeypatch, backend):
+    if backend == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    payload = {"events": [Event(*ROW)], "count": 1, "tags": ("a", "b")}
+    decoded = json.loads(serialization.dumps(payload))
+
+    assert decoded["events"][0] == dict(zip(EVENT_FIELDS, ROW))
+    assert decoded["tags"] == ["a", "b"]
+    assert json.loads(serialization.dumps({"title": "Salām"}))["title"] == "Salām"
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Event search through the FTS5 index, and the LIKE fallback"""
+
+import sqlite3
+
+from shared import database
+
+
+def _titles(events):
+    return [event.title for event in events]
+
+
+def test_prefix_multi_term_and_ranking(add_event):
+    add_event("Youth Basketball Night", "Open gym for teens", category="Youth")
+    add_event("El Shinawy Halaqa", "Weekly tafsir circle", category="Education", days_ahead=3)
+    add_event("Family Dinner", "Potluck after the halaqa", days_ahead=1)
+    # Startup builds the index from the events already there
+    assert database.ensure_event_search() == "fts"
+
+    assert _titles(database.get_events(10, "halaq")) == ["El Shinawy Halaqa", "Family Dinner"]
+    assert _titles(database.get_events(10, "shinawy halaqa")) == ["El Shinawy Halaqa"]
+    # No event has every word, so any-word matches are returned instead
+    assert _titles(database.get_events(10, "basketball events")) == ["Youth Basketball Night"]
+    assert _titles(database.get_events(10, "youth")) == ["Youth Basketball Night"]
+    # Query syntax in user input is treated as plain words
+    assert _titles(database.get_events(10, '"tafsir" OR')) == ["El Shinawy Halaqa"]
+    assert database.get_pool().event_search == "fts"
+
+    assert database.get_event_by_title("shinawy").title == "El Shinawy Halaqa"
+    # Inside-a-word matches still work through the substring fallback
+    assert database.get_event_by_title("nawy").title == "El Shinawy Halaqa"
+
+
+def test_triggers_keep_index_in_sync(app_db, add_event):
+    database.ensure_event_search()
+    event_id = add_event("Quran Night", "Tajweed practice")
+    assert _titles(database.get_events(10, "tajweed")) == ["Quran Night"]
+
+    conn = sqlite3.connect(app_db)
+    conn.execute("UPDATE events SET title = 'Quran Evening' WHERE id = ?", (event_id,))
+    conn.commit()
+    assert _titles(database.get_events(10, "evening")) == ["Quran Evening"]
+    assert database.get_events(10, "night") == []
+
+    conn.execute("DELETE FROM events WHERE id = ?", (event_id,))
+    conn.commit()
+    assert database.get_events(10, "tajweed") == []
+    assert conn.execute("INSERT INTO events_fts (events_fts) VALUES ('integrity-check')").fetchall() == []
+    conn.close()
+
+
+def test_searches_never_create_the_index(app_db, add_event):
+    add_event("El Shinawy Halaqa", "Weekly tafsir circle")
+
+    assert _titles(database.get_events(10, "shinawy")) == ["El Shinawy Halaqa"]
+    assert database.get_event_by_title("shinawy").title == "El Shinawy Halaqa"
+    assert database.get_pool().event_search == "like"
+    conn = sqlite3.connect(app_db)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'events_fts%'").fetchall() == []
+    conn.close()
+
+
+def test_like_fallback(add_event, monkeypatch):
+    monkeypatch.setattr(database, "EVENT_SEARCH", "like")
+    add_event("El Shinawy Halaqa", "Weekly tafsir circle")
+    assert database.ensure_event_search() == "like"
+
+    assert _titles(database.get_events(10, "shinawy")) == ["El Shinawy Halaqa"]
+    assert database.get_pool().event_search == "like"
+    conn = sqlite3.connect(database.get_pool().db_path)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'events_fts'").fetchone() is None
+    conn.close()
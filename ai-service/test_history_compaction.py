@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Token-budgeted history: compaction, rolling summary and entity memory"""
+
+from memory import (
+    InMemorySessionStore,
+    SqliteSessionStore,
+    compact_history,
+    estimate_tokens,
+    memory_note,
+    message_tokens,
+)
+from tools import ToolExecution, entity_updates
+
+
+def _turns(count):
+    history = []
+    for index in range(count):
+        history.append({"role": "user", "content": f"question number {index} about the halaqa schedule"})
+        history.append({"role": "assistant", "content": f"answer number {index} " + "details " * 20})
+    return history
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("salam") == 2
+    assert estimate_tokens("a b c d e f") == 6
+    assert estimate_tokens("x" * 400) == 100
+
+
+def test_compaction_keeps_newest_turns_within_budget():
+    history = _turns(10)
+    compacted = compact_history(history, 200)
+
+    assert compacted.tokens <= 200
+    assert compacted.tokens == sum(message_tokens(message) for message in compacted.messages)
+    assert compacted.messages == history[len(history) - len(compacted.messages):]
+    assert compacted.messages[0]["role"] == "user"
+    assert len(compacted.dropped) + len(compacted.messages) == len(history)
+    assert compacted.summary.startswith("Earlier the user asked: ")
+    assert '"question number 0 about the halaqa schedule"' not in compacted.summary
+    assert '"question number 8 about the halaqa schedule"' not in compacted.summary
+
+    everything = compact_history(history, 10_000)
+    assert everything.messages == history and not everything.dropped and everything.summary == ""
+
+
+def test_oversized_message_is_truncated_not_dropped():
+    history = [
+        {"role": "user", "content": "when is jumuah"},
+        {"role": "assistant", "content": "word " * 2000},
+    ]
+    compacted = compact_history(history, 300)
+
+    assert len(compacted.messages) == 2
+    assert compacted.truncated == 1
+    assert compacted.messages[1]["content"].endswith("[truncated]")
+    assert compacted.tokens <= 300
+
+
+def test_entity_updates_and_memory_note():
+    executions = [
+        ToolExecution("a", "search_events", {"events": [{"title": "Family Night"}, {"title": "Halaqa"}]}, 1.0),
+        ToolExecution("b", "get_prayer_times", {"prayer_times": {"date": "2026-10-17"}}, 1.0),
+        ToolExecution("c", "get_event_details", {"error": "Event not found"}, 1.0),
+    ]
+    updates = entity_updates(executions, {"discussed_events": ["Halaqa", "Youth Hike"]})
+    assert updates == {
+        "discussed_events": ["Youth Hike", "Family Night", "Halaqa"],
+        "last_prayer_date": "2026-10-17",
+    }
+    assert entity_updates(executions, updates) == {}
+
+    note = memory_note(updates, "Earlier the user asked: \"when is the hike\".")
+    assert "Events discussed: Youth Hike; Family Night; Halaqa." in note
+    assert "2026-10-17" in note and "when is the hike" in note
+    assert memory_note({}) == ""
+
+
+def test_remember_survives_history_trimming(tmp_path):
+    for store in [InMemorySessionStore(history_limit=2), SqliteSessionStore(tmp_path / "sessions.db", 2)]:
+        store.remember("s", {"discussed_events": ["Halaqa"]})
+        for index in range(5):
+            store.append("s", "user", f"message {index}")
+        store.remember("s", {"last_prayer_date": "2026-10-17"})
+
+        session = store.get("s")
+        assert [message["content"] for message in session.history] == ["message 3", "message 4"]
+        assert session.attributes == {"discussed_events": ["Halaqa"], "last_prayer_date": "2026-10-17"}
+        store.close()
+
+    reopened = SqliteSessionStore(tmp_path / "sessions.db", 2)
+    assert reopened.get("s").attributes["discussed_events"] == ["Halaqa"]
+    reopened.close()
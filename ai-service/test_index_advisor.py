@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Startup index advisor: missing index detection, creation and plan checks"""
+
+import sqlite3
+
+from shared import indexes
+
+
+def _index_names(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        conn.close()
+
+
+def test_report_only_flags_missing_indexes_and_full_scans(app_db):
+    report = indexes.run_index_advisor(create=False)
+
+    # users.email is already covered by its UNIQUE constraint
+    assert [index["name"] for index in report["missing"]] == [
+        "idx_events_status_date",
+        "idx_event_rsvps_event_id",
+        "idx_volunteer_signups_event_id",
+    ]
+    assert report["created"] == []
+    assert "get_volunteer_opportunities" in report["full_scans"]
+    assert report["queries"]["get_volunteer_opportunities"]["full_scans"] == ["events"]
+    assert "idx_events_status_date" not in _index_names(app_db)
+    assert report["event_search"] == "like"
+    conn = sqlite3.connect(app_db)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'events_fts%'").fetchall() == []
+    conn.close()
+    assert indexes.index_report() is report
+
+
+def test_creates_indexes_and_plans_use_them(app_db):
+    report = indexes.run_index_advisor()
+
+    assert report["created"] == ["idx_events_status_date", "idx_event_rsvps_event_id", "idx_volunteer_signups_event_id"]
+    assert set(report["created"]) <= _index_names(app_db)
+    assert report["full_scans"] == []
+    assert "error" not in report
+    assert report["event_search"] == "fts"
+    assert "get_events.fts" in report["queries"]
+    plan = report["queries"]["execute_sql_query.rsvp_count"]["plan"]
+    assert any("idx_event_rsvps_event_id" in step for step in plan)
+
+    again = indexes.index_report(refresh=True)
+    assert again["missing"] == [] and again["created"] == []
+
+
+def test_explain_distinguishes_index_scans():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, status TEXT, date TEXT)")
+    assert indexes.explain(conn, "SELECT * FROM events WHERE status = ?", ["active"])["full_scans"] == ["events"]
+    conn.execute("CREATE INDEX idx_events_status_date ON events (status, date)")
+    result = indexes.explain(conn, "SELECT * FROM events WHERE status = ? ORDER BY date", ["active"])
+    assert result["full_scans"] == [] and not result["temp_sort"]
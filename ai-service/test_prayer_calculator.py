@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Offline prayer time calculator tests
+
+The calculator is checked every day of a year against an independent solar
+model (NOAA's equations, solved iteratively at each event's own time). The
+regression test against Aladhan itself needs recorded calendar responses in
+fixtures/aladhan/; record a year (network required) with:
+
+    python record_aladhan_fixtures.py 2026
+"""
+
+import json
+import math
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+
+from shared import prayer_times
+from shared.prayer_calculator import (
+    MASQ_LATITUDE,
+    MASQ_LONGITUDE,
+    MASQ_TIMEZONE,
+    calculate_day,
+    calculate_timings,
+    calculate_year,
+)
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "aladhan"
+PRAYERS = ["Fajr", "Sunrise", "Dhuhr", "Asr", "Maghrib", "Isha"]
+
+
+def _minutes(value):
+    hours, minutes = value.split()[0].split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _recorded_days():
+    for path in sorted(FIXTURES_DIR.glob("*.json")):
+        days = prayer_times._calendar_days(json.loads(path.read_text()))
+        for day, timings in days:
+            yield path.name, day, timings
+
+
+def test_matches_recorded_aladhan_responses():
+    recorded = list(_recorded_days())
+    if not recorded:
+        pytest.skip("no recorded Aladhan calendars in fixtures/aladhan; run record_aladhan_fixtures.py")
+
+    mismatches = []
+    for fixture, day, expected in recorded:
+        actual = calculate_day(date.fromisoformat(day))
+        for prayer in PRAYERS:
+            if abs(_minutes(actual[prayer]) - _minutes(expected[prayer])) > 1:
+                mismatches.append((fixture, day, prayer, expected[prayer], actual[prayer]))
+
+    assert not mismatches, mismatches[:10]
+
+
+def _noaa_sun(jd):
+    """Declination (degrees) and equation of time (minutes) from NOAA's solar calculator equations"""
+    rad = math.radians
+    jc = (jd - 2451545.0) / 36525.0
+    mean_longitude = (280.46646 + jc * (36000.76983 + jc * 0.0003032)) % 360
+    anomaly = 357.52911 + jc * (35999.05029 - 0.0001537 * jc)
+    eccentricity = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+    center = (
+        math.sin(rad(anomaly)) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + math.sin(rad(2 * anomaly)) * (0.019993 - 0.000101 * jc)
+        + math.sin(rad(3 * anomaly)) * 0.000289
+    )
+    omega = 125.04 - 1934.136 * jc
+    apparent_longitude = mean_longitude + center - 0.00569 - 0.00478 * math.sin(rad(omega))
+    obliquity = (
+        23 + (26 + (21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))) / 60) / 60
+        + 0.00256 * math.cos(rad(omega))
+    )
+    declination = math.degrees(math.asin(math.sin(rad(obliquity)) * math.sin(rad(apparent_longitude))))
+    y = math.tan(rad(obliquity / 2)) ** 2
+    equation = 4 * math.degrees(
+        y * math.sin(2 * rad(mean_longitude))
+        - 2 * eccentricity * math.sin(rad(anomaly))
+        + 4 * eccentricity * y * math.sin(rad(anomaly)) * math.cos(2 * rad(mean_longitude))
+        - 0.5 * y * y * math.sin(4 * rad(mean_longitude))
+        - 1.25 * eccentricity * eccentricity * math.sin(2 * rad(anomaly))
+    )
+    return declination, equation
+
+
+def _julian_midnight(day):
+    return day.toordinal() + 1721424.5
+
+
+def _noaa_minutes(day, altitude, sign, guess):
+    """UTC minutes when the sun crosses ``altitude`` (degrees, or a function of declination)"""
+    rad = math.radians
+    midnight = _julian_midnight(day)
+    minutes = guess
+    for _ in range(3):
+        declination, equation = _noaa_sun(midnight + minutes / 1440)
+        noon = 720 - 4 * MASQ_LONGITUDE - equation
+        if sign == 0:
+            minutes = noon
+            continue
+        target = altitude(declination) if callable(altitude) else altitude
+        cos_hour_angle = (math.sin(rad(target)) - math.sin(rad(MASQ_LATITUDE)) * math.sin(rad(declination))) / (
+            math.cos(rad(MASQ_LATITUDE)) * math.cos(rad(declination))
+        )
+        minutes = noon + sign * 4 * math.degrees(math.acos(cos_hour_angle))
+    return minutes
+
+
+def _asr_altitude(declination):
+    return math.degrees(math.atan(1 / (1 + math.tan(math.radians(abs(MASQ_LATITUDE - declination))))))
+
+
+def test_matches_independent_solar_model():
+    events = {
+        "Fajr": (-15, -1, 600),
+        "Sunrise": (-0.833, -1, 660),
+        "Dhuhr": (0, 0, 1020),
+        "Asr": (_asr_altitude, 1, 1200),
+        "Maghrib": (-0.833, 1, 1380),
+        "Isha": (-15, 1, 1440),
+    }
+    mismatches = []
+    for day, timings in calculate_year(2026).items():
+        day = date.fromisoformat(day)
+        offset = datetime(day.year, day.month, day.day, 12, tzinfo=MASQ_TIMEZONE).utcoffset().total_seconds() / 60
+        for prayer, (altitude, sign, guess) in events.items():
+            expected = (_noaa_minutes(day, altitude, sign, guess) + offset) % 1440
+            if abs(expected - _minutes(timings[prayer])) > 1:
+                mismatches.append((day, prayer, round(expected, 1), timings[prayer]))
+
+    assert not mismatches, mismatches[:10]
+
+
+def test_prayers_are_ordered_every_day():
+    for day, timings in calculate_year(2026).items():
+        minutes = [_minutes(timings[prayer]) for prayer in PRAYERS]
+        assert minutes == sorted(minutes), (day, timings)
+
+
+def test_published_sunrise_and_sunset():
+    # Published New York sunrise/sunset on the solstices, within a couple of
+    # minutes since the masjid is a few miles east of Central Park
+    summer = calculate_day(date(2026, 6, 21))
+    winter = calculate_day(date(2026, 12, 21))
+    assert abs(_minutes(summer["Sunrise"]) - _minutes("05:25")) <= 2
+    assert abs(_minutes(summer["Sunset"]) - _minutes("20:31")) <= 2
+    assert abs(_minutes(winter["Sunrise"]) - _minutes("07:17")) <= 2
+    assert abs(_minutes(winter["Sunset"]) - _minutes("16:32")) <= 2
+
+
+def test_daylight_saving_shift():
+    before, after = calculate_timings([date(2026, 3, 7), date(2026, 3, 8)])
+    assert _minutes(after["Dhuhr"]) - _minutes(before["Dhuhr"]) == 60
+
+
+def test_full_year_is_fast():
+    started = time.perf_counter()
+    year = calculate_year(2028)
+    elapsed = time.perf_counter() - started
+    assert len(year) == 366
+    assert elapsed < 0.5
+
+
+def test_calculated_backend_keeps_response_shape(monkeypatch):
+    monkeypatch.setattr(prayer_times, "PRAYER_TIMES_BACKEND", "calculated")
+    result = prayer_times.get_prayer_times("2026-10-17")
+    timings = calculate_day(date(2026, 10, 17))
+
+    assert result["date"] == "2026-10-17"
+    assert result["hijri_date"].endswith("AH")
+    assert result["maghrib"] == datetime.strptime(timings["Maghrib"], "%H:%M").strftime("%I:%M %p").lstrip("0")
+    for prayer, delay in [("fajr", 20), ("dhuhr", 10), ("asr", 10), ("maghrib", 5), ("isha", 10)]:
+        adhan = datetime.strptime(result[prayer], "%I:%M %p")
+        iqama = datetime.strptime(result[f"{prayer}_iqama"], "%I:%M %p")
+        assert (iqama - adhan).seconds == delay * 60
+
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Prayer times cache tests against a local fake Aladhan server"""
+
+import calendar
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from shared import prayer_times
+
+
+class FakeAladhan(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):  # noqa: N802 - http.server API
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        FakeAladhan.requests_seen.append((url.path, params))
+
+        year = int(params["year"])
+        if params.get("annual") == "true":
+            data = {str(month): self._month(year, month) for month in range(1, 13)}
+        else:
+            data = self._month(year, int(params["month"]))
+
+        body = json.dumps({"code": 200, "status": "OK", "data": data}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def _month(year, month):
+        return [
+            {
+                "timings": {
+                    "Fajr": "05:%02d (EDT)" % (day % 60),
+                    "Sunrise": "06:40 (EDT)",
+                    "Dhuhr": "12:50 (EDT)",
+                    "Asr": "16:05 (EDT)",
+                    "Maghrib": "18:20 (EDT)",
+                    "Isha": "19:35 (EDT)",
+                },
+                "date": {"gregorian": {"date": "%02d-%02d-%04d" % (day, month, year)}},
+            }
+            for day in range(1, calendar.monthrange(year, month)[1] + 1)
+        ]
+
+    def log_message(self, format, *args):  # noqa: A002 - http.server API
+        pass
+
+
+@pytest.fixture
+def fake_aladhan(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAladhan)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    FakeAladhan.requests_seen = []
+
+    monkeypatch.setattr(prayer_times, "PRAYER_TIMES_BACKEND", "aladhan")
+    monkeypatch.setattr(prayer_times, "ALADHAN_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(prayer_times, "ALADHAN_TIMEOUT", 2)
+    prayer_times.configure_prayer_cache(tmp_path / "prayer_times.db")
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    prayer_times.configure_prayer_cache(prayer_times.PRAYER_CACHE_PATH)
+
+
+def test_month_is_fetched_once(fake_aladhan):
+    first = prayer_times.get_prayer_times("2026-10-07")
+    assert first["fajr"] == "5:07 AM"
+    assert first["fajr_iqama"] == "5:27 AM"
+    assert first["maghrib_iqama"] == "6:25 PM"
+
+    for day in range(1, 32):
+        assert "error" not in prayer_times.get_prayer_times(f"2026-10-{day:02d}")
+
+    assert len(FakeAladhan.requests_seen) == 1
+    path, params = FakeAladhan.requests_seen[0]
+    assert path == "/v1/calendarByAddress"
+    assert params["month"] == "10" and params["year"] == "2026" and params["method"] == "2"
+
+
+def test_cache_survives_restart(fake_aladhan, tmp_path):
+    prayer_times.get_prayer_times("2026-03-15")
+    prayer_times.configure_prayer_cache(tmp_path / "prayer_times.db")
+
+    assert prayer_times.get_prayer_times("2026-03-20")["dhuhr"] == "12:50 PM"
+    assert len(FakeAladhan.requests_seen) == 1
+
+
+def test_year_prefetch(fake_aladhan):
+    assert prayer_times.prefetch_prayer_times(2027) == 365
+    assert prayer_times.get_prayer_times("2027-12-31")["isha"] == "7:35 PM"
+    assert len(FakeAladhan.requests_seen) == 1
+
+
+def test_stale_entries_served_when_upstream_down(fake_aladhan, monkeypatch):
+    prayer_times.get_prayer_times("2026-05-01")
+    fake_aladhan.shutdown()
+    fake_aladhan.server_close()
+    monkeypatch.setattr(prayer_times, "PRAYER_CACHE_MAX_AGE_DAYS", 0)
+
+    stale = prayer_times.get_prayer_times("2026-05-02")
+    assert stale["asr"] == "4:05 PM"
+
+    missing = prayer_times.get_prayer_times("2026-06-01")
+    assert missing["error"] == "Unable to fetch prayer times"
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Guarded execution of model-written SQL (execute_sql_query)"""
+
+import sqlite3
+
+import pytest
+
+from shared.database import execute_guarded_query
+from shared.query_guard import QueryRejected, check_statement, run_guarded_query
+from tools import ToolRegistry
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT UNIQUE, password TEXT, updated_at TEXT)")
+    conn.executemany(
+        "INSERT INTO users (email, password, updated_at) VALUES (?, 'hash', '2026-10-17')",
+        [(f"user{index}@example.com",) for index in range(100)],
+    )
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT id, updated_at FROM users",
+    "select replace(email, '@', ' at ') from users;",
+    "SELECT 'drop table users' AS note -- ; DELETE",
+    "WITH recent AS (SELECT * FROM users) SELECT * FROM recent",
+])
+def test_reads_pass_the_parser(sql):
+    check_statement(sql)
+
+
+@pytest.mark.parametrize("sql, reason", [
+    ("SELECT 1; DROP TABLE users", "one statement"),
+    ("WITH doomed AS (SELECT id FROM users) DELETE FROM users", "DELETE"),
+    ("PRAGMA table_info(users)", "PRAGMA statements"),
+    ("  ", "empty"),
+])
+def test_writes_and_batches_are_rejected(sql, reason):
+    with pytest.raises(QueryRejected, match=reason):
+        check_statement(sql)
+
+
+def test_authorizer_allows_reads_only(conn):
+    result = run_guarded_query(conn, "SELECT id, password, updated_at FROM users WHERE id = 1")
+    assert result.rows == [{"id": 1, "password": None, "updated_at": "2026-10-17"}]
+
+    for sql in ["SELECT * FROM pragma_table_info('users')", "SELECT load_extension('evil')"]:
+        assert run_guarded_query(conn, sql).error == "Query rejected: only reads are permitted"
+
+
+def test_row_cap_marks_truncation(conn):
+    result = run_guarded_query(conn, "SELECT id FROM users LIMIT 60", row_limit=25)
+    assert len(result.rows) == 25 and result.truncated
+    assert result.as_tool_result()["truncated"] is True
+
+    result = run_guarded_query(conn, "SELECT id FROM users LIMIT 25", row_limit=25)
+    assert len(result.rows) == 25 and not result.truncated
+
+
+def test_budgets_interrupt_runaway_queries(conn):
+    runaway = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+    result = run_guarded_query(conn, runaway, timeout=0.2)
+    assert "time budget" in result.error and result.elapsed_ms < 1000
+
+    result = run_guarded_query(conn, runaway, instruction_budget=100_000)
+    assert "instruction budget" in result.error
+
+
+def test_unbounded_scans_of_large_tables_are_rejected(conn):
+    cartesian = run_guarded_query(conn, "SELECT COUNT(*) FROM users a, users b", scan_limit=50)
+    assert "scans all ~100 rows of users" in cartesian.error
+
+    assert run_guarded_query(conn, "SELECT * FROM users WHERE updated_at > '2026'", scan_limit=50).error
+    assert not run_guarded_query(conn, "SELECT * FROM users LIMIT 5", scan_limit=50).error
+    # Only the outermost LIMIT bounds the scan
+    inner_limit = "SELECT * FROM users WHERE updated_at >= (SELECT updated_at FROM users LIMIT 1)"
+    assert "scans all ~100 rows of users" in run_guarded_query(conn, inner_limit, scan_limit=50).error
+    outer_limit = "WITH everyone AS (SELECT * FROM users) SELECT * FROM everyone LIMIT 5"
+    assert not run_guarded_query(conn, outer_limit, scan_limit=50).error
+    assert not run_guarded_query(conn, "SELECT * FROM users WHERE email = 'user1@example.com'", scan_limit=50).error
+    assert not run_guarded_query(conn, "SELECT COUNT(*) FROM users a, users b", scan_limit=500).error
+
+
+def test_tool_reports_errors_to_the_model(app_db):
+    registry = ToolRegistry()
+    assert registry.execute("execute_sql_query", {"sql": "SELECT id, updated_at FROM users"}) == {
+        "rows": [],
+        "row_count": 0,
+    }
+    result = registry.execute("execute_sql_query", {"sql": "UPDATE users SET phone = NULL"})
+    assert result["error"] == "Query rejected: UPDATE statements are not permitted"
+    assert execute_guarded_query("SELECT nope FROM users").error.startswith("SQL error: no such column")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Response cache tests with stand-in dependency versions"""
+
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from providers.base import ChatResult
+from response_cache import ResponseCache, normalize_message
+
+
+def _cache(**kwargs):
+    versions = {"database": 1, "prayer_date": "2026-10-17"}
+    cache = ResponseCache(versions={name: (lambda name=name: versions[name]) for name in versions}, **kwargs)
+    return cache, versions
+
+
+def _reply(message, *tools, stop_reason="answered"):
+    return ChatResult(message=message, used_tools=list(tools), rounds=2, prompt_tokens=900, stop_reason=stop_reason)
+
+
+def test_normalized_and_similar_questions_hit():
+    cache, _ = _cache()
+    cache.put("What events are coming up this week?", _reply("Halaqa on Friday", "search_events"), ("database",), cache.versions())
+
+    assert normalize_message("  what EVENTS are coming up this week?? ") == "what events are coming up this week"
+    hit = cache.get("what events are coming up this week")
+    assert hit.message == "Halaqa on Friday"
+    assert (hit.stop_reason, hit.rounds, hit.prompt_tokens) == ("cached", 0, 0)
+
+    assert cache.get("Please, what events are coming up this week") is not None
+    assert cache.get("What events are coming up for this week?").message == "Halaqa on Friday"
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_different_entities_never_match():
+    cache, _ = _cache(similarity=0.5)
+    cache.put("When is Maghrib today?", _reply("6:12 PM", "get_prayer_times"), ("prayer_date",), cache.versions())
+
+    assert cache.get("When is Isha today?") is None
+    assert cache.get("When is Maghrib tomorrow?") is None
+    assert cache.get("When is maghrib today") is not None
+
+
+def test_similar_wording_with_a_different_word_misses():
+    cache, _ = _cache(similarity=0.5)
+    snapshot = cache.versions()
+    cache.put("When does the Quran class for women start?", _reply("Saturdays at 10", "search_events"), ("database",), snapshot)
+    cache.put("Is the event free?", _reply("Yes, no charge", "search_events"), ("database",), snapshot)
+
+    assert cache.get("When does the Quran class for men start?") is None
+    assert cache.get("Is the event full?") is None
+    assert cache.get("When does the Quran class for women strat?").message == "Saturdays at 10"
+    assert cache.stats()["similar_hits"] == 1
+
+
+def test_dependency_changes_invalidate():
+    cache, versions = _cache()
+    snapshot = cache.versions()
+    cache.put("Upcoming events", _reply("Halaqa", "search_events"), ("database",), snapshot)
+    cache.put("When is Maghrib?", _reply("6:12 PM", "get_prayer_times"), ("prayer_date",), snapshot)
+    cache.put("What are the pillars of Islam?", _reply("Five pillars"), (), snapshot)
+
+    versions["database"] += 1
+    assert cache.get("Upcoming events") is None
+    assert cache.get("When is Maghrib?") is not None
+
+    versions["prayer_date"] = "2026-10-18"
+    assert cache.get("When is Maghrib?") is None
+    assert cache.get("What are the pillars of Islam?") is not None
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_uncacheable_replies_are_skipped():
+    cache, _ = _cache()
+    snapshot = cache.versions()
+    assert not cache.put("RSVP me to the halaqa", _reply("Done!", "rsvp_current_user_to_event"), None, snapshot)
+    assert not cache.put("Find everything", _reply("Partial", "search_events", stop_reason="max_rounds"), ("database",), snapshot)
+    assert cache.stats()["size"] == 0
+
+
+def test_database_version_agrees_across_threads(app_db, add_event):
+    add_event("Friday Halaqa")
+    cache = ResponseCache()
+
+    # As in /chat: versions() and get() each run on whichever to_thread worker is free
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        snapshot = executor.submit(cache.versions).result()
+    cache.put("Upcoming events", _reply("Halaqa", "search_events"), ("database",), snapshot)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        hits = list(executor.map(lambda _: cache.get("Upcoming events"), range(64)))
+
+    assert all(hit is not None for hit in hits)
+    assert cache.stats()["invalidations"] == 0
+
+    conn = sqlite3.connect(app_db)
+    conn.execute("UPDATE events SET title = 'Saturday Halaqa'")
+    conn.commit()
+    conn.close()
+    assert cache.get("Upcoming events") is None
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Intent router tests: date extraction, classification and direct answers"""
+
+from datetime import date
+
+import pytest
+
+from memory import InMemorySessionStore
+from router import IntentRouter, extract_date
+from shared import prayer_times
+from tools import ToolRegistry
+
+TODAY = date(2026, 10, 17)  # a Saturday
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("when is maghrib", (None, True)),
+        ("fajr tomorrow", (date(2026, 10, 18), True)),
+        ("isha the day after tomorrow", (date(2026, 10, 19), True)),
+        ("prayer times in 3 days", (date(2026, 10, 20), True)),
+        ("prayer times in two weeks", (date(2026, 10, 31), True)),
+        ("asr on friday", (date(2026, 10, 23), True)),
+        ("asr next saturday", (date(2026, 10, 24), True)),
+        ("maghrib on oct 20th", (date(2026, 10, 20), True)),
+        ("fajr on 3 january", (date(2027, 1, 3), True)),
+        ("isha on 2026-12-01", (date(2026, 12, 1), True)),
+        ("isha tonight", (TODAY, True)),
+        ("prayer times next month", (None, False)),
+        ("taraweeh in ramadan", (None, False)),
+    ],
+)
+def test_extract_date(text, expected):
+    assert extract_date(text, TODAY) == expected
+
+
+@pytest.mark.parametrize(
+    "message, intent, arguments",
+    [
+        ("When is Maghrib?", "prayer_times", {"date": "2026-10-17"}),
+        ("What time is Fajr tomorrow?", "prayer_times", {"date": "2026-10-18"}),
+        ("What's the next prayer?", "next_prayer", {}),
+        ("When is the next prayer time", "next_prayer", {}),
+        ("What events are coming up?", "upcoming_events", {"limit": 5}),
+        ("Any upcoming events?", "upcoming_events", {"limit": 5}),
+        ("Isha prayer time on Oct 20th please", "prayer_times", {"date": "2026-10-20"}),
+        ("When do we pray Asr next Saturday?", "prayer_times", {"date": "2026-10-24"}),
+        ("Who can I contact to volunteer for the event?", "volunteer_contact", {}),
+    ],
+)
+def test_confident_intents(message, intent, arguments):
+    matched, matched_arguments = IntentRouter(ToolRegistry(), InMemorySessionStore()).classify(message, TODAY)
+    assert (matched.name, matched_arguments) == (intent, arguments)
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "RSVP me to the next halaqa",
+        "What is the importance of Salah?",
+        "Any events tomorrow?",
+        "Prayer times next month",
+        "When is the next prayer after maghrib?",
+        "Assalamu alaikum",
+        # The intent would ignore what the question is actually about
+        "Any events for kids?",
+        "What events are about Quran?",
+        "what programs do you offer for sisters",
+        "Can I bring kids to Isha?",
+        "is maghrib prayed in the main hall",
+    ],
+)
+def test_falls_back_when_unsure(message):
+    assert IntentRouter(ToolRegistry(), InMemorySessionStore()).classify(message, TODAY) is None
+
+
+def test_answers_without_the_model(monkeypatch):
+    monkeypatch.setattr(prayer_times, "PRAYER_TIMES_BACKEND", "calculated")
+    store = InMemorySessionStore()
+    router = IntentRouter(ToolRegistry(), store)
+    result = router.answer("What time is Isha tomorrow?", "s1", today=TODAY)
+
+    assert result.message.startswith("On Sunday, October 18, 2026:\n- Isha: ")
+    assert result.used_tools == ["get_prayer_times"]
+    assert result.stop_reason == "routed:prayer_times"
+    assert result.latency_ms < 50
+    assert [turn["role"] for turn in store.get("s1").history] == ["user", "assistant"]
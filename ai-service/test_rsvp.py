@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Atomic RSVPs: one transaction per request, exactly one RSVP per user and event"""
+
+import sqlite3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from shared import database
+from tools import ToolRegistry
+
+
+@pytest.fixture
+def add_users(app_db):
+    def add(count):
+        conn = sqlite3.connect(app_db)
+        conn.executemany(
+            "INSERT INTO users (email, password, first_name, last_name) VALUES (?, 'hash', 'Test', ?)",
+            [(f"user{index}@example.com", f"User {index}") for index in range(count)],
+        )
+        conn.commit()
+        conn.close()
+
+    return add
+
+
+def test_outcomes(add_users, add_event):
+    add_users(1)
+    add_event("Eid Dinner")
+    add_event("Gala Fundraiser", price=50)
+
+    created = database.rsvp_to_event("user0@example.com", "eid dinner")
+    assert created.status == "created" and created.event.title == "Eid Dinner" and created.rsvp_date
+    again = database.rsvp_to_event("user0@example.com", "Eid Dinner")
+    assert again.status == "already_rsvpd" and again.rsvp_date == created.rsvp_date
+
+    assert database.rsvp_to_event("nobody@example.com", "Eid Dinner").status == "user_not_found"
+    assert database.rsvp_to_event("user0@example.com", "Picnic").status == "event_not_found"
+    assert database.rsvp_to_event("user0@example.com", "Gala").status == "payment_required"
+
+    result = ToolRegistry().execute("rsvp_to_event", {"user_email": "user0@example.com", "event_title": "Eid Dinner"})
+    assert result["error"] == "You have already RSVP'd to 'Eid Dinner'"
+
+
+def test_parallel_rsvps_are_exactly_once(app_db, add_users, add_event, monkeypatch):
+    users, attempts = 40, 8
+    add_users(users)
+    event_id = add_event("Eid Dinner")
+    registry = ToolRegistry()
+    queue = database.WriteQueue(batch_size=64)
+    monkeypatch.setattr(database, "_write_queue", queue)
+    requests = [
+        {"user_email": f"user{index % users}@example.com", "event_title": "Eid Dinner"}
+        for index in range(users * attempts)
+    ]
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(lambda arguments: registry.execute("rsvp_to_event", arguments), requests))
+
+    outcomes = Counter("created" if result.get("success") else result["error"].split(" to ")[0] for result in results)
+    assert outcomes == {"created": users, "You have already RSVP'd": users * (attempts - 1)}
+
+    conn = sqlite3.connect(app_db)
+    rows = conn.execute("SELECT user_id, COUNT(*) FROM event_rsvps WHERE event_id = ? GROUP BY user_id", (event_id,))
+    assert sorted(count for _, count in rows) == [1] * users
+    conn.close()
+    # Concurrent RSVPs share commits
+    assert queue.stats()["rows"] == users * attempts
+    assert queue.stats()["flushes"] < users * attempts
+    queue.close()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Bounded session store: LRU and byte limits, idle expiry, sweeping"""
+
+import time
+
+from memory import InMemorySessionStore, SessionTable, SqliteSessionStore
+
+
+def test_lru_eviction_keeps_recent_sessions():
+    store = InMemorySessionStore(max_sessions=3)
+    for session_id in ["a", "b", "c"]:
+        store.append(session_id, "user", "salam")
+    store.get("a")
+    store.append("d", "user", "salam")
+
+    assert store.peek("b") is None
+    assert [store.peek(session_id) is not None for session_id in ["a", "c", "d"]] == [True, True, True]
+    assert store.stats()["evictions"]["lru"] == 1
+
+
+def test_byte_accounting_and_limit():
+    store = InMemorySessionStore(history_limit=4, max_bytes=4000)
+    store.append("small", "user", "hi")
+    small = store.stats()["bytes"]
+    store.append("big", "user", "x" * 3000)
+
+    stats = store.stats()
+    assert stats["bytes"] - small > 3000
+    assert stats["largest_bytes"] > 3000
+
+    store.append("big", "assistant", "y" * 2000)
+    assert store.peek("small") is None
+    assert store.stats()["evictions"]["bytes"] == 1
+
+    for _ in range(4):
+        store.append("big", "user", "short")
+    assert store.stats()["bytes"] < 2000
+
+
+def test_idle_sessions_expire_and_sweep():
+    store = InMemorySessionStore(idle_ttl=0.2)
+    store.append("idle", "user", "salam")
+    store.append("kept", "user", "salam")
+    time.sleep(0.12)
+    store.get("kept")
+    time.sleep(0.12)
+
+    assert store.peek("idle") is None
+    assert store.get("kept").history
+    store.start_sweeper(0.01)
+    time.sleep(0.04)
+    store.stop_sweeper()
+
+    stats = store.stats()
+    assert stats["active"] == 1
+    assert stats["evictions"]["idle"] == 1
+    assert stats["sweeps"] >= 1
+
+
+def test_reset_and_dict_values():
+    table = SessionTable(lambda: {"chat_history": []}, max_sessions=10)
+    table.get("s")["chat_history"].append({"role": "user", "content": "salam"})
+    table.resize("s")
+
+    assert "s" in table and len(table) == 1
+    assert table.pop("s") == {"chat_history": [{"role": "user", "content": "salam"}]}
+    assert table.stats()["bytes"] == 0 and "s" not in table
+
+
+def test_sqlite_sessions_are_shared_between_workers(tmp_path):
+    path = tmp_path / "sessions.db"
+    first = SqliteSessionStore(path, history_limit=4, flush_interval=5)
+    second = SqliteSessionStore(path, history_limit=4)
+    try:
+        for index in range(6):
+            first.append("s", "user" if index % 2 == 0 else "assistant", f"message {index}")
+
+        # Queued writes are visible to the worker that made them right away
+        assert [turn["content"] for turn in first.get("s").history] == [f"message {i}" for i in range(2, 6)]
+        assert second.peek("s") is None
+
+        assert first.flush() == 6
+        assert [turn["content"] for turn in second.get("s").history] == [f"message {i}" for i in range(2, 6)]
+        assert first.stats()["largest_batch"] == 6
+
+        second.reset("s")
+        assert first.peek("s") is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_sqlite_sweep_and_restart(tmp_path):
+    path = tmp_path / "sessions.db"
+    store = SqliteSessionStore(path, max_sessions=2)
+    for session_id in ["a", "b", "c"]:
+        store.append(session_id, "user", "salam")
+        store.flush()
+    assert store.sweep() == 1
+    assert store.peek("a") is None
+    store.close()
+
+    reopened = SqliteSessionStore(path, idle_ttl=0.05)
+    try:
+        assert reopened.get("c").history == [{"role": "user", "content": "salam"}]
+        time.sleep(0.08)
+        assert reopened.peek("b") is None
+        assert reopened.stats()["evictions"]["idle"] == 1
+    finally:
+        reopened.close()
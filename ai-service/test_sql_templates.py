@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""SQL template normalization, template validation cache and per-table result invalidation"""
+
+import sqlite3
+
+import pytest
+
+from shared.sql_templates import QueryCatalog, normalize_query
+
+
+@pytest.mark.parametrize("sql, parameters, template, values", [
+    (
+        "SELECT title FROM events\n  WHERE category = 'Youth' AND price > 10.5 -- cheap\nLIMIT 5",
+        None,
+        "SELECT title FROM events WHERE category = ? AND price > ? LIMIT ?",
+        ["Youth", 10.5, 5],
+    ),
+    (
+        "select * from events where id = ? and title like '%halaqa%'",
+        [3],
+        "select * from events where id = ? and title like ?",
+        [3, "%halaqa%"],
+    ),
+    (
+        # Literals that name output columns or pick ORDER BY positions stay put
+        "SELECT 'upcoming' AS kind, COUNT(*) FROM events WHERE date >= date('now') GROUP BY 1 ORDER BY 2 DESC",
+        None,
+        "SELECT 'upcoming' AS kind, COUNT(*) FROM events WHERE date >= date(?) GROUP BY 1 ORDER BY 2 DESC",
+        ["now"],
+    ),
+    (
+        "SELECT * FROM events WHERE id = :id",
+        {"id": 3},
+        "SELECT * FROM events WHERE id = :id",
+        {"id": 3},
+    ),
+])
+def test_normalize_query(sql, parameters, template, values):
+    assert normalize_query(sql, parameters) == (template, values)
+
+
+def _execute(app_db, sql):
+    conn = sqlite3.connect(app_db)
+    conn.execute(sql)
+    conn.commit()
+    conn.close()
+
+
+def test_repeated_questions_skip_validation_and_execution(app_db, add_event):
+    add_event("Youth Basketball Night", category="Youth")
+    add_event("Quran Circle", category="Education")
+    catalog = QueryCatalog()
+    assert catalog.install_table_versions()
+
+    first = catalog.execute("SELECT title FROM events WHERE category = 'Youth'")
+    again = catalog.execute("SELECT  title\n  FROM events   WHERE category = 'Youth'")
+    other = catalog.execute("SELECT title FROM events WHERE category = 'Education'")
+
+    assert first.rows == again.rows == [{"title": "Youth Basketball Night"}]
+    assert not first.cached and again.cached
+    assert other.rows == [{"title": "Quran Circle"}] and not other.cached
+
+    stats = catalog.stats()
+    assert (stats["templates"], stats["validations"], stats["result_hits"]) == (1, 1, 1)
+    assert stats["versioning"] == "triggers"
+    assert stats["top"][0] == {
+        "template": "SELECT title FROM events WHERE category = ?",
+        "uses": 3,
+        "result_hits": 1,
+        "hit_rate": 0.3333,
+        "tables": ["events"],
+        "rejected": False,
+    }
+
+
+def test_results_are_invalidated_per_table(app_db, add_event):
+    event_id = add_event("Youth Basketball Night", category="Youth")
+    catalog = QueryCatalog()
+    catalog.install_table_versions()
+    events_sql = "SELECT title FROM events WHERE id = 1"
+    rsvps_sql = "SELECT COUNT(*) AS rsvps FROM event_rsvps WHERE event_id = 1"
+    catalog.execute(events_sql)
+    catalog.execute(rsvps_sql)
+
+    # An RSVP from the Next.js app leaves cached event results alone
+    _execute(app_db, f"INSERT INTO event_rsvps (user_id, event_id) VALUES (1, {event_id})")
+    assert catalog.execute(events_sql).cached
+    rsvps = catalog.execute(rsvps_sql)
+    assert not rsvps.cached and rsvps.rows == [{"rsvps": 1}]
+
+    _execute(app_db, "UPDATE events SET title = 'Youth Soccer Night'")
+    assert catalog.execute(events_sql).rows == [{"title": "Youth Soccer Night"}]
+    assert catalog.execute(rsvps_sql).cached
+
+
+def test_queries_never_change_the_schema(app_db, add_event):
+    add_event("Youth Basketball Night", category="Youth")
+    catalog = QueryCatalog()
+    sql = "SELECT title FROM events WHERE id = 1"
+    catalog.execute(sql)
+
+    conn = sqlite3.connect(app_db)
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'ai_%'").fetchall() == []
+    conn.close()
+    assert catalog.stats()["versioning"] == "database"
+
+    # Without the triggers any commit drops cached results
+    assert catalog.execute(sql).cached
+    _execute(app_db, "INSERT INTO event_rsvps (user_id, event_id) VALUES (1, 1)")
+    assert not catalog.execute(sql).cached
+
+
+def test_rejected_templates_are_remembered(app_db):
+    catalog = QueryCatalog()
+    first = catalog.execute("SELECT * FROM users WHERE id = 1; DROP TABLE users")
+    second = catalog.execute("SELECT * FROM users WHERE id = 2; DROP TABLE users")
+
+    assert first.error == second.error == "Query rejected: only one statement is allowed"
+    assert second.cached
+    assert catalog.stats()["rejected_hits"] == 1
+
+
+def test_sql_errors_are_not_remembered(app_db, add_event):
+    add_event("Friday Halaqa")
+    catalog = QueryCatalog()
+    sql = "SELECT title FROM events WHERE id = ?"
+
+    assert catalog.execute(sql, []).error.startswith("SQL error:")
+    retried = catalog.execute(sql, [1])
+    assert (retried.error, retried.cached) == (None, False)
+    assert retried.rows == [{"title": "Friday Halaqa"}]
+    assert catalog.stats()["rejected_hits"] == 0
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Per-request tool context stays isolated under concurrent load"""
+
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tools import ToolDefinition, ToolRegistry, tool_context
+
+
+def _registry():
+    registry = ToolRegistry()
+
+    def whoami(arguments):
+        time.sleep(random.uniform(0, 0.003))
+        return {"user_email": registry.get_context().get("user_email"), "caller": arguments["caller"]}
+
+    registry.register(
+        ToolDefinition(
+            "whoami",
+            "Echo the caller",
+            {"type": "object", "properties": {"caller": {"type": "string"}}, "required": ["caller"]},
+            whoami,
+        )
+    )
+    return registry
+
+
+def test_context_is_scoped_and_cleared():
+    registry = _registry()
+    with tool_context({"user_email": "a@example.com"}):
+        assert registry.execute("whoami", {"caller": "a"})["user_email"] == "a@example.com"
+        explicit = registry.execute("whoami", {"caller": "b"}, context={"user_email": "b@example.com"})
+        assert explicit["user_email"] == "b@example.com"
+        assert registry.get_context()["user_email"] == "a@example.com"
+    assert registry.get_context() == {}
+    assert registry.execute("whoami", {"caller": "anon"})["user_email"] is None
+
+
+def test_parallel_requests_never_see_each_others_context():
+    registry = _registry()
+    executor = ThreadPoolExecutor(max_workers=16)
+
+    async def request(index):
+        email = f"user{index}@example.com"
+        with tool_context({"user_email": email}):
+            await asyncio.sleep(random.uniform(0, 0.002))
+            calls = [(f"{index}-{call}", "whoami", {"caller": email}) for call in range(3)]
+            executions = await registry.execute_many_async(calls, executor, timeout=5)
+            # Sync path from a worker thread, as the router's tools run
+            routed = await asyncio.to_thread(registry.execute, "whoami", {"caller": email})
+        return [execution.result for execution in executions] + [routed]
+
+    async def main():
+        return await asyncio.gather(*(request(index) for index in range(200)))
+
+    try:
+        results = asyncio.run(main())
+        with ThreadPoolExecutor(max_workers=16) as callers:
+            threaded = list(callers.map(lambda index: _threaded(registry, executor, index), range(100)))
+    finally:
+        executor.shutdown(wait=True)
+
+    for per_request in results:
+        assert len(per_request) == 4
+        assert all(result["user_email"] == result["caller"] for result in per_request)
+    assert all(threaded)
+
+
+def _threaded(registry, executor, index):
+    email = f"thread{index}@example.com"
+    with tool_context({"user_email": email}):
+        executions = registry.execute_many([("t", "whoami", {"caller": email})], executor, timeout=5)
+    return executions[0].result["user_email"] == email and registry.get_context() == {}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Compiled tool schemas: cached payloads and argument validation"""
+
+import json
+
+import pytest
+
+from tools import ToolDefinition, ToolRegistry
+from tools.schema import ToolArgumentError, compile_validator
+
+PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "limit": {"type": "integer", "minimum": 1, "maximum": 20},
+        "kind": {"type": "string", "enum": ["halaqa", "hike"]},
+        "parameters": {"type": ["array", "object"]},
+    },
+    "required": ["title"],
+}
+
+
+def test_validator_coerces_and_drops_nulls():
+    validate = compile_validator(PARAMETERS)
+    assert validate({"title": "Halaqa", "limit": "5", "kind": None, "extra": 1}) == {
+        "title": "Halaqa",
+        "limit": 5,
+        "extra": 1,
+    }
+    assert validate({"title": "x", "parameters": [1]})["parameters"] == [1]
+
+
+@pytest.mark.parametrize(
+    "arguments, error",
+    [
+        ({}, "missing required argument(s): title"),
+        ({"title": ""}, "missing required argument(s): title"),
+        ({"title": 3}, "title must be string"),
+        ({"title": "x", "limit": 50}, "limit must be at most 20"),
+        ({"title": "x", "limit": True}, "limit must be integer"),
+        ({"title": "x", "kind": "bbq"}, "kind must be one of"),
+        ({"title": "x", "parameters": "a"}, "parameters must be array or object"),
+    ],
+)
+def test_validator_rejects(arguments, error):
+    with pytest.raises(ToolArgumentError, match=error.replace("(", r"\(").replace(")", r"\)")):
+        compile_validator(PARAMETERS)(arguments)
+
+
+def test_registry_payloads_are_built_once():
+    registry = ToolRegistry()
+    payloads = registry.as_openai_tools()
+    assert registry.schema_size() == sum(len(json.dumps(payload, separators=(",", ":"))) for payload in payloads)
+    fingerprint = registry.schema_fingerprint()
+    count = len(payloads)
+
+    # What one request does to its tools never reaches the next, or the schema itself
+    payloads[0]["function"]["description"] = "changed"
+    payloads.pop()
+    assert registry.as_openai_tools() == json.loads("[" + ",".join(
+        schema.serialized for schema in registry._schemas.values()
+    ) + "]")
+    schema = registry._schemas["rsvp_current_user_to_event"]
+    with pytest.raises(TypeError):
+        schema.payload["function"]["description"] = "changed"
+    with pytest.raises(AttributeError):
+        schema.payload["function"]["parameters"]["required"].append("user_email")
+
+    registry.register(ToolDefinition("echo", "Echo", PARAMETERS, lambda arguments: arguments))
+    assert len(registry.as_openai_tools()) == count + 1
+    assert registry.schema_fingerprint() != fingerprint
+    assert registry.execute("echo", {"title": "Halaqa", "limit": "3"}) == {"title": "Halaqa", "limit": 3}
+    assert registry.execute("echo", {"limit": 3}) == {
+        "error": "Invalid arguments for echo: missing required argument(s): title"
+    }
+
+
+def test_relevant_tools_by_topic():
+    registry = ToolRegistry()
+    assert registry.relevant_tools("When is isha tonight?") == ("get_prayer_times", "get_next_prayer_time")
+    assert "find_volunteer_contact_for_recent_event" in registry.relevant_tools("Can I volunteer at the hike?")
+    assert "search_events" in registry.relevant_tools("Can I volunteer at the hike?")
+    assert registry.relevant_tools("Thanks, that's all") is None
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Write-behind queue: group commits, per-row outcomes, failure handling"""
+
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from shared import database
+from shared.database import WRITE_CREATED, WRITE_DUPLICATE, WriteQueue
+
+
+def _count(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_group_commits_resolve_each_future(app_db):
+    queue = WriteQueue(batch_size=32, flush_interval=0.005)
+    # 100 distinct RSVPs, each submitted twice, plus 50 volunteer signups
+    submissions = [("event_rsvps", (index % 100, 1)) for index in range(200)]
+    submissions += [("volunteer_signups", (index, 2)) for index in range(50)]
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        futures = list(pool.map(lambda item: queue.submit(*item), submissions))
+    outcomes = Counter(future.result(timeout=5) for future in futures)
+    queue.close()
+
+    assert outcomes == {WRITE_CREATED: 150, WRITE_DUPLICATE: 100}
+    assert (_count(app_db, "event_rsvps"), _count(app_db, "volunteer_signups")) == (100, 50)
+    stats = queue.stats()
+    assert stats["rows"] == 250 and stats["pending"] == 0
+    assert stats["flushes"] < 250 and stats["largest_batch"] <= 32
+
+
+def test_helpers_report_per_row_outcome(app_db):
+    assert database.create_event_rsvp(7, 3)
+    assert not database.create_event_rsvp(7, 3)
+    assert database.create_volunteer_signup(7, 3)
+    assert database.database_health()["write_queue"]["rows"] >= 3
+
+
+def test_direct_mode_and_failed_batches(app_db):
+    queue = WriteQueue(batch_size=0)
+    assert queue.submit("event_rsvps", (1, 1)).result() == WRITE_CREATED
+    assert queue.submit("event_rsvps", (1, 1)).result() == WRITE_DUPLICATE
+    assert queue.stats()["flushes"] == 2
+
+    conn = sqlite3.connect(app_db)
+    conn.execute("DROP TABLE volunteer_signups")
+    conn.commit()
+    conn.close()
+    queued = WriteQueue(batch_size=8, flush_interval=0.005)
+    futures = [queued.submit("volunteer_signups", (index, 1)) for index in range(3)]
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), sqlite3.OperationalError)
+    assert not database.create_volunteer_signup(1, 1)
+    queued.close()
+
+
+def test_timed_out_rows_are_withdrawn_or_awaited(app_db, monkeypatch):
+    monkeypatch.setattr(database, "DB_WRITE_TIMEOUT", 0.05)
+
+    # Still queued when the caller gives up: withdrawn, never written
+    waiting = WriteQueue(batch_size=64, flush_interval=5)
+    monkeypatch.setattr(database, "_write_queue", waiting)
+    assert not database.create_event_rsvp(1, 1)
+    waiting.close()
+    assert _count(app_db, "event_rsvps") == 0
+    assert waiting.stats()["cancelled"] == 1
+
+    # Already in a transaction (stuck on the write lock): the caller waits for the real outcome
+    in_flight = WriteQueue(batch_size=64, flush_interval=0)
+    monkeypatch.setattr(database, "_write_queue", in_flight)
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_write_lock():
+        with database.get_pool().writer():
+            locked.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_write_lock)
+    holder.start()
+    locked.wait(5)
+    threading.Timer(0.3, release.set).start()
+    assert database.create_volunteer_signup(1, 1)
+    holder.join()
+    in_flight.close()
+    assert _count(app_db, "volunteer_signups") == 1
+
+
+def test_a_failing_write_is_rolled_back_alone(app_db):
+    queue = WriteQueue(batch_size=8, flush_interval=0.05)
+
+    def half_done(conn):
+        conn.execute("INSERT INTO event_rsvps (user_id, event_id) VALUES (1, 1)")
+        raise ValueError("event is full")
+
+    failed = queue.submit_write("half-done RSVP", half_done)
+    inserted = queue.submit("event_rsvps", (2, 1))
+    assert isinstance(failed.exception(timeout=5), ValueError)
+    assert inserted.result(timeout=5) == WRITE_CREATED
+    queue.close()
+
+    conn = sqlite3.connect(app_db)
+    assert conn.execute("SELECT user_id FROM event_rsvps").fetchall() == [(2,)]
+    conn.close()
+    assert queue.stats()["flushes"] == 1
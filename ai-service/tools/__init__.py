@@ -1,19 +1,81 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import time
+from concurrent.futures import Executor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Pattern, Sequence, Tuple
 
 from shared.database import (
-    execute_select_query,
     get_event_by_title,
     get_events,
     get_volunteer_opportunities,
-    create_event_rsvp,
-    check_user_rsvp_status,
     get_event_by_id,
-    get_user_by_email,
+    rsvp_to_event,
 )
 from shared.prayer_times import get_prayer_times
+from shared.sql_templates import query_catalog
+from tools.renderers import PRAYER_ALIASES, Renderer, needs_phrasing, render_next_prayer, render_prayer_times
+from tools.schema import ToolArgumentError, ToolSchema, Validator, compile_validator
+
+logger = logging.getLogger(__name__)
+
+# (tool_call_id, tool name, decoded arguments)
+ToolCall = Tuple[str, str, Dict[str, Any]]
+
+# The caller's request context (user_email, ...) for tools that act on their
+# behalf; set per request with tool_context(), never shared between requests
+_request_context: contextvars.ContextVar[Mapping[str, Any]] = contextvars.ContextVar("tool_context", default={})
+
+# Event titles kept in a session's entity memory
+DISCUSSED_EVENTS_LIMIT = 5
+
+_EVENT_TOOLS = ("search_events", "get_event_details", "rsvp_to_event", "rsvp_current_user_to_event", "execute_sql_query")
+
+# Which tools a message can need, by topic. A message that mentions none of
+# these (a follow-up like "is it free?") gets every tool.
+TOOL_TOPICS: List[Tuple[Pattern[str], Tuple[str, ...]]] = [
+    (
+        re.compile(
+            r"\b(prayers?|salah|salat|namaz|adhan|athan|azan|iqamah?|jumu'?ah|" + "|".join(PRAYER_ALIASES) + r")\b",
+            re.IGNORECASE,
+        ),
+        ("get_prayer_times", "get_next_prayer_time"),
+    ),
+    (
+        re.compile(
+            r"\b(events?|programs?|halaqa|class(es)?|lectures?|hike|dinner|happening|going on|coming up|"
+            r"rsvp|register|sign me up|attend|tickets?|cost|price|free)\b",
+            re.IGNORECASE,
+        ),
+        _EVENT_TOOLS,
+    ),
+    (
+        re.compile(r"\bvolunteer", re.IGNORECASE),
+        ("search_volunteer_opportunities", "find_volunteer_contact_for_recent_event", "search_events", "get_event_details"),
+    ),
+]
+
+
+@contextmanager
+def tool_context(context: Optional[Mapping[str, Any]]) -> Iterator[None]:
+    """Make ``context`` visible to tools run by the current request, until the block exits"""
+    token = _request_context.set(dict(context or {}))
+    try:
+        yield
+    finally:
+        try:
+            _request_context.reset(token)
+        except ValueError:
+            # An abandoned streaming response is closed from another task;
+            # the context the value was set in is already gone
+            pass
 
 
 @dataclass
@@ -22,24 +84,161 @@ class ToolDefinition:
     description: str
     parameters: Dict[str, Any]
     handler: Callable[[Dict[str, Any]], Dict[str, Any]]
+    # Formats the result straight into the reply, skipping the follow-up completion
+    renderer: Optional[Renderer] = None
+    # What the result depends on ("database", "prayer_date"); None means an
+    # answer that used this tool must never be reused (writes, the clock)
+    depends_on: Optional[Tuple[str, ...]] = ("database",)
 
-    def as_openai_tool(self) -> Dict[str, Any]:
-        return {
-            "type": "function",
-            "function": {
-                "name": self.name,
-                "description": self.description,
-                "parameters": self.parameters,
-            },
-        }
+
+@dataclass
+class ToolExecution:
+    call_id: str
+    name: str
+    result: Dict[str, Any]
+    elapsed_ms: float
+    timed_out: bool = False
+
+    def timing(self) -> Dict[str, Any]:
+        return {"name": self.name, "elapsed_ms": round(self.elapsed_ms, 3), "timed_out": self.timed_out}
+
+
+def _timed_call(
+    execute: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+    name: str,
+    arguments: Dict[str, Any],
+) -> Tuple[Dict[str, Any], float]:
+    started = time.perf_counter()
+    try:
+        result = execute(name, arguments)
+    except Exception as exc:  # noqa: BLE001
+        logger.error(f"Tool {name} failed: {exc}")
+        result = {"error": f"Tool {name} failed: {exc}"}
+    return result, (time.perf_counter() - started) * 1000
+
+
+def _timed_out(call_id: str, name: str, timeout: float) -> ToolExecution:
+    logger.error(f"Tool {name} timed out after {timeout:g}s")
+    return ToolExecution(
+        call_id=call_id,
+        name=name,
+        result={"error": f"Tool {name} timed out after {timeout:g} seconds"},
+        elapsed_ms=timeout * 1000,
+        timed_out=True,
+    )
+
+
+def execute_parallel(
+    calls: Sequence[ToolCall],
+    execute: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+    executor: Executor,
+    timeout: float,
+) -> List[ToolExecution]:
+    """Run independent tool calls concurrently; results keep the calls' order.
+
+    A call that runs past ``timeout`` seconds is reported as an error result
+    (its thread is left to finish in the background).
+    """
+    deadline = time.monotonic() + timeout
+    # Each worker runs in a copy of the caller's context, so tool_context() reaches it
+    futures = [
+        executor.submit(contextvars.copy_context().run, _timed_call, execute, name, arguments)
+        for _, name, arguments in calls
+    ]
+
+    executions = []
+    for (call_id, name, _), future in zip(calls, futures):
+        try:
+            result, elapsed_ms = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            executions.append(_timed_out(call_id, name, timeout))
+            continue
+        executions.append(ToolExecution(call_id, name, result, elapsed_ms))
+    return executions
+
+
+async def execute_parallel_async(
+    calls: Sequence[ToolCall],
+    execute: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+    executor: Executor,
+    timeout: float,
+) -> List[ToolExecution]:
+    """Async counterpart of execute_parallel for use on the event loop"""
+    loop = asyncio.get_running_loop()
+
+    async def run(call_id: str, name: str, arguments: Dict[str, Any]) -> ToolExecution:
+        try:
+            result, elapsed_ms = await asyncio.wait_for(
+                loop.run_in_executor(
+                    executor, contextvars.copy_context().run, _timed_call, execute, name, arguments
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            return _timed_out(call_id, name, timeout)
+        return ToolExecution(call_id, name, result, elapsed_ms)
+
+    return list(await asyncio.gather(*(run(*call) for call in calls)))
+
+
+def _event_titles(execution: ToolExecution) -> List[str]:
+    result = execution.result
+    if execution.name == "search_events":
+        return [event["title"] for event in result.get("events") or [] if event.get("title")]
+    if execution.name == "get_event_details" and result.get("event"):
+        return [result["event"]["title"]] if result["event"]["title"] else []
+    if execution.name == "find_volunteer_contact_for_recent_event" and isinstance(result.get("event"), str):
+        return [result["event"]]
+    return []
+
+
+def entity_updates(executions: Iterable[ToolExecution], attributes: Dict[str, Any]) -> Dict[str, Any]:
+    """Session attributes to remember from a turn's tool results.
+
+    Tracks the events the user has seen ("discussed_events", newest last) and
+    the date of the last prayer times lookup, so follow-ups like "what time
+    does it start?" still resolve after the turns themselves are compacted
+    out of the prompt. Returns only the keys that changed.
+    """
+    discussed = list(attributes.get("discussed_events") or [])
+    updates: Dict[str, Any] = {}
+    for execution in executions:
+        if execution.timed_out or "error" in execution.result:
+            continue
+        for title in _event_titles(execution):
+            if title in discussed:
+                discussed.remove(title)
+            discussed.append(title)
+        if execution.name == "get_prayer_times":
+            day = (execution.result.get("prayer_times") or {}).get("date")
+            if day and day != attributes.get("last_prayer_date"):
+                updates["last_prayer_date"] = day
+    discussed = discussed[-DISCUSSED_EVENTS_LIMIT:]
+    if discussed != list(attributes.get("discussed_events") or []):
+        updates["discussed_events"] = discussed
+    return updates
 
 
 class ToolRegistry:
-    def __init__(self, *, allowed_sql_operations: List[str] | None = None):
+    def __init__(
+        self,
+        *,
+        allowed_sql_operations: List[str] | None = None,
+        fast_path_tools: Iterable[str] | None = None,
+    ):
         self._allowed_sql_operations = allowed_sql_operations or ["SELECT", "WITH"]
         self._tools: Dict[str, ToolDefinition] = {}
-        self._context: Dict[str, Any] = {}
+        # Compiled at registration; the JSON array for each tool subset is joined on first use
+        self._schemas: Dict[str, ToolSchema] = {}
+        self._validators: Dict[str, Validator] = {}
+        self._payloads: Dict[Tuple[str, ...], str] = {}
         self._register_default_tools()
+        if fast_path_tools is not None:
+            enabled = set(fast_path_tools)
+            for tool in self._tools.values():
+                if tool.name not in enabled:
+                    tool.renderer = None
 
     def _register_default_tools(self) -> None:
         self.register(
@@ -60,6 +259,8 @@ class ToolRegistry:
                     },
                 },
                 handler=self._handle_get_prayer_times,
+                renderer=render_prayer_times,
+                depends_on=("prayer_date",),
             )
         )
 
@@ -115,6 +316,8 @@ class ToolRegistry:
                 ),
                 parameters={"type": "object", "properties": {}},
                 handler=self._handle_next_prayer,
+                renderer=render_next_prayer,
+                depends_on=None,
             )
         )
 
@@ -191,6 +394,7 @@ class ToolRegistry:
                     "required": ["user_email", "event_title"],
                 },
                 handler=self._handle_rsvp_to_event,
+                depends_on=None,
             )
         )
 
@@ -213,28 +417,117 @@ class ToolRegistry:
                     "required": ["event_title"],
                 },
                 handler=self._handle_rsvp_current_user,
+                depends_on=None,
             )
         )
 
     def register(self, tool: ToolDefinition) -> None:
         self._tools[tool.name] = tool
+        self._schemas[tool.name] = ToolSchema.build(tool.name, tool.description, tool.parameters)
+        self._validators[tool.name] = compile_validator(tool.parameters)
+        self._payloads.clear()
+
+    def _subset(self, names: Optional[Iterable[str]]) -> Tuple[str, ...]:
+        if names is None:
+            return tuple(self._schemas)
+        wanted = set(names)
+        return tuple(name for name in self._schemas if name in wanted)
+
+    def as_openai_tools(self, names: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Tool payloads for a completion request, all tools or just ``names``.
+
+        Each call decodes a fresh list from the schemas serialized at
+        registration, so nothing a request does to it reaches the next one.
+        """
+        key = self._subset(names)
+        payloads = self._payloads.get(key)
+        if payloads is None:
+            payloads = self._payloads[key] = "[" + ",".join(self._schemas[name].serialized for name in key) + "]"
+        return json.loads(payloads)
+
+    def schema_size(self, names: Optional[Iterable[str]] = None) -> int:
+        """Serialized size in characters of the payloads as_openai_tools(names) returns"""
+        return sum(len(self._schemas[name].serialized) for name in self._subset(names))
+
+    def schema_fingerprint(self) -> str:
+        """Short hash of the serialized tool schemas; changes only when a tool is registered"""
+        combined = "\n".join(schema.serialized for schema in self._schemas.values())
+        return hashlib.sha256(combined.encode()).hexdigest()[:16]
+
+    def relevant_tools(self, message: str) -> Optional[Tuple[str, ...]]:
+        """Tools a message can need by topic, or None to offer them all"""
+        names: List[str] = []
+        for pattern, tools in TOOL_TOPICS:
+            if pattern.search(message):
+                names.extend(name for name in tools if name in self._tools and name not in names)
+        return tuple(names) or None
+
+    def set_renderer(self, name: str, renderer: Optional[Renderer]) -> None:
+        """Enable (or, with None, disable) the fast-path reply for a tool"""
+        tool = self._tools.get(name)
+        if not tool:
+            raise ValueError(f"Unknown tool: {name}")
+        tool.renderer = renderer
+
+    def render(self, executions: Sequence[ToolExecution], message: str) -> Optional[str]:
+        """Reply text for a round of tool results, or None if the model must answer"""
+        if needs_phrasing(message):
+            return None
+        replies = []
+        for execution in executions:
+            tool = self._tools.get(execution.name)
+            if not tool or not tool.renderer or execution.timed_out:
+                return None
+            try:
+                reply = tool.renderer(execution.result, message)
+            except Exception as exc:  # noqa: BLE001
+                logger.error(f"Renderer for {execution.name} failed: {exc}")
+                return None
+            if not reply:
+                return None
+            replies.append(reply)
+        return "\n\n".join(replies) or None
+
+    def dependencies(self, names: Sequence[str]) -> Optional[Tuple[str, ...]]:
+        """Combined dependencies of the named tools, or None if any isn't reusable"""
+        combined = set()
+        for name in names:
+            tool = self._tools.get(name)
+            if not tool or tool.depends_on is None:
+                return None
+            combined.update(tool.depends_on)
+        return tuple(sorted(combined))
 
-    def as_openai_tools(self) -> List[Dict[str, Any]]:
-        return [tool.as_openai_tool() for tool in self._tools.values()]
-
-    def set_context(self, context: Dict[str, Any]) -> None:
-        """Set the current context for tool execution"""
-        self._context = context or {}
-
-    def get_context(self) -> Dict[str, Any]:
-        """Get the current context"""
-        return self._context
-
-    def execute(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def get_context() -> Mapping[str, Any]:
+        """The current request's context (see tool_context); empty outside a request"""
+        return _request_context.get()
+
+    def execute(
+        self, name: str, arguments: Dict[str, Any], context: Optional[Mapping[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Run a tool; ``context``, when given, replaces the request context for this call"""
+        if context is not None:
+            with tool_context(context):
+                return self.execute(name, arguments)
         tool = self._tools.get(name)
         if not tool:
             raise ValueError(f"Unknown tool requested: {name}")
-        return tool.handler(arguments or {})
+        try:
+            arguments = self._validators[name](arguments or {})
+        except ToolArgumentError as exc:
+            logger.warning(f"Rejected arguments for {name}: {exc}")
+            # Goes back to the model as the tool result so it can correct the call
+            return {"error": f"Invalid arguments for {name}: {exc}"}
+        return tool.handler(arguments)
+
+    def execute_many(self, calls: Sequence[ToolCall], executor: Executor, timeout: float) -> List[ToolExecution]:
+        return execute_parallel(calls, self.execute, executor, timeout)
+
+    async def execute_many_async(
+        self, calls: Sequence[ToolCall], executor: Executor, timeout: float
+    ) -> List[ToolExecution]:
+        return await execute_parallel_async(calls, self.execute, executor, timeout)
 
     @staticmethod
     def _handle_get_prayer_times(arguments: Dict[str, Any]) -> Dict[str, Any]:
@@ -332,12 +625,12 @@ class ToolRegistry:
     def _handle_execute_sql(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
         sql = arguments.get("sql", "")
         parameters = arguments.get("parameters")
-        rows = execute_select_query(
+        result = query_catalog.execute(
             sql,
             parameters,
             allowed_operations=self._allowed_sql_operations,
         )
-        return {"rows": rows, "row_count": len(rows)}
+        return result.as_tool_result()
 
     @staticmethod
     def _handle_rsvp_to_event(arguments: Dict[str, Any]) -> Dict[str, Any]:
@@ -348,32 +641,35 @@ class ToolRegistry:
         if not user_email or not event_title:
             return {"error": "Both user email and event title are required"}
 
-        # Get user by email
-        user = get_user_by_email(user_email)
-        if not user:
+        # User lookup, event lookup, duplicate check and insert share one write transaction
+        outcome = rsvp_to_event(user_email, event_title)
+        user, event = outcome.user, outcome.event
+
+        if outcome.status == "error":
+            return {"error": "Failed to create RSVP due to database error"}
+
+        if outcome.status == "user_not_found":
             return {
                 "error": f"User with email {user_email} not found",
                 "suggestion": "Please make sure the email address is correct or register first"
             }
 
-        # Get event by title
-        event = get_event_by_title(event_title)
-        if not event:
+        if outcome.status == "event_not_found":
             return {
                 "error": f"Event '{event_title}' not found",
                 "suggestion": "Please check the event title or search for available events"
             }
 
         # Check if event is active/open for registration
-        if event.get("status") != "active":
+        if outcome.status == "not_open":
             return {
                 "error": f"Event '{event['title']}' is not open for registration",
                 "event_status": event.get("status", "unknown")
             }
 
         # Check if event requires payment
-        event_price = event.get("price", 0)
-        if event_price and event_price > 0:
+        if outcome.status == "payment_required":
+            event_price = event.get("price", 0)
             return {
                 "error": f"This event costs ${event_price} and requires payment",
                 "message": "For paid events, please visit our website to complete registration with payment",
@@ -387,15 +683,10 @@ class ToolRegistry:
                 "suggestion": "Contact the mosque directly for payment options or visit the website"
             }
 
-        # Check if user has already RSVP'd
-        rsvp_status = check_user_rsvp_status(user["id"], event["id"])
-        if "error" in rsvp_status:
-            return {"error": f"Error checking RSVP status: {rsvp_status['error']}"}
-
-        if rsvp_status["has_rsvpd"]:
+        if outcome.status == "already_rsvpd":
             return {
                 "error": f"You have already RSVP'd to '{event['title']}'",
-                "rsvp_date": rsvp_status["rsvp_date"],
+                "rsvp_date": outcome.rsvp_date,
                 "event_details": {
                     "title": event["title"],
                     "date": event["date"],
@@ -404,11 +695,6 @@ class ToolRegistry:
                 }
             }
 
-        # Create the RSVP
-        rsvp_success = create_event_rsvp(user["id"], event["id"])
-        if not rsvp_success:
-            return {"error": "Failed to create RSVP due to database error"}
-
         # Return success with event details
         return {
             "success": True,
@@ -0,0 +1,134 @@
+"""Template replies for tools whose results already answer the question.
+
+A renderer takes the tool result and the user's message and returns the
+reply text, or None when the result needs the model to phrase it (errors,
+unexpected shapes). Rendering skips the follow-up completion entirely, so
+it only applies to lookups: a question that compares or calculates with the
+results ("how long between Maghrib and Isha?") goes back to the model.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+Renderer = Callable[[Dict[str, Any], str], Optional[str]]
+
+PRAYERS = [
+    ("fajr", "Fajr"),
+    ("sunrise", "Sunrise"),
+    ("dhuhr", "Dhuhr"),
+    ("asr", "Asr"),
+    ("maghrib", "Maghrib"),
+    ("isha", "Isha"),
+]
+
+# Spellings people actually type
+PRAYER_ALIASES = {
+    "fajr": "fajr",
+    "fajar": "fajr",
+    "sunrise": "sunrise",
+    "shuruq": "sunrise",
+    "dhuhr": "dhuhr",
+    "duhr": "dhuhr",
+    "zuhr": "dhuhr",
+    "zohr": "dhuhr",
+    "asr": "asr",
+    "maghrib": "maghrib",
+    "magrib": "maghrib",
+    "isha": "isha",
+    "ishaa": "isha",
+}
+# Questions about the results rather than for them: durations, comparisons, permissions
+_NEEDS_PHRASING = re.compile(
+    r"\bhow (long|much|many|far|soon|early|late)\b"
+    r"|\b(between|difference|differ|compare[sd]?|than|earlier|later|longer|shorter|sooner"
+    r"|until|till|left|remaining|enough|minutes|hours|can i|should|why|is it (too )?(early|late))\b",
+    re.IGNORECASE,
+)
+
+
+def needs_phrasing(message: str) -> bool:
+    """Whether answering ``message`` takes more than listing the tool's results"""
+    return bool(_NEEDS_PHRASING.search(message or ""))
+
+
+_PRAYER_PATTERN = re.compile(r"\b(" + "|".join(PRAYER_ALIASES) + r")\b", re.IGNORECASE)
+
+
+def _prayer_line(times: Dict[str, Any], key: str, label: str) -> str:
+    iqama = times.get(f"{key}_iqama")
+    return f"{label}: {times[key]} (iqama {iqama})" if iqama else f"{label}: {times[key]}"
+
+
+def render_prayer_times(result: Dict[str, Any], message: str) -> Optional[str]:
+    times = result.get("prayer_times") or {}
+    if "error" in times or not all(key in times for key, _ in PRAYERS):
+        return None
+
+    try:
+        parsed = datetime.strptime(times["date"], "%Y-%m-%d")
+    except (KeyError, ValueError):
+        return None
+    day = f"{parsed:%A, %B} {parsed.day}, {parsed.year}"
+
+    asked = []
+    for match in _PRAYER_PATTERN.findall(message or ""):
+        key = PRAYER_ALIASES[match.lower()]
+        if key not in asked:
+            asked.append(key)
+
+    labels = dict(PRAYERS)
+    if asked:
+        lines = [_prayer_line(times, key, labels[key]) for key in asked]
+        return f"On {day}:\n" + "\n".join(f"- {line}" for line in lines)
+
+    hijri = f" ({times['hijri_date']})" if times.get("hijri_date") else ""
+    lines = [_prayer_line(times, key, label) for key, label in PRAYERS]
+    return f"Prayer times for {day}{hijri}:\n" + "\n".join(f"- {line}" for line in lines)
+
+
+def render_next_prayer(result: Dict[str, Any], message: str) -> Optional[str]:
+    if "error" in result:
+        return None
+    if result.get("adhan_time"):
+        reply = f"The next prayer is {result['next_prayer']} at {result['adhan_time']}"
+        if result.get("iqama_time"):
+            reply += f", with iqama at {result['iqama_time']}"
+        return reply + "."
+    return result.get("message")
+
+
+def _event_when(event: Dict[str, Any]) -> str:
+    try:
+        parsed = datetime.strptime(event["date"], "%Y-%m-%d")
+        when = f"{parsed:%a, %b} {parsed.day}"
+    except (KeyError, TypeError, ValueError):
+        when = str(event.get("date") or "")
+    return f"{when} at {event['time']}" if event.get("time") else when
+
+
+def render_events(result: Dict[str, Any], message: str) -> Optional[str]:
+    if "error" in result or "events" not in result:
+        return None
+    events = result["events"]
+    if not events:
+        return "There are no upcoming events on the calendar right now. Please check back soon!"
+
+    lines = []
+    for event in events:
+        line = f"- {event['title']} - {_event_when(event)}"
+        if event.get("location"):
+            line += f" ({event['location']})"
+        lines.append(line)
+    return "Here's what's coming up at MAS Queens:\n" + "\n".join(lines)
+
+
+def render_volunteer_contact(result: Dict[str, Any], message: str) -> Optional[str]:
+    if "error" in result or not result.get("contact_email"):
+        return None
+    return (
+        f"{result['event']} ({_event_when(result)}) needs {result['volunteers_needed']} more volunteers. "
+        f"Reach out to {result['contact_email']} to help out."
+    )
@@ -0,0 +1,125 @@
+"""Tool schemas compiled once at registration.
+
+Each tool's OpenAI-style payload is built and serialized a single time and
+kept as a read-only view, and its JSON Schema ``parameters`` are turned into a validator closure, so no
+request pays for either again. The validator covers the subset of JSON
+Schema the tool definitions use: types, ``required``, ``enum`` and numeric
+bounds.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Tuple
+
+Validator = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+_INTEGER = re.compile(r"-?\d+")
+
+# JSON Schema type -> Python types (bool is an int subclass, so checked separately)
+_TYPES: Dict[str, Tuple[type, ...]] = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list, tuple),
+    "object": (dict,),
+    "null": (type(None),),
+}
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ToolArgumentError(ValueError):
+    """Arguments from the model don't match the tool's schema"""
+
+
+@dataclass(frozen=True)
+class ToolSchema:
+    name: str
+    # Read-only; completion requests get plain dicts decoded from ``serialized``
+    payload: Mapping[str, Any]
+    serialized: str
+
+    @classmethod
+    def build(cls, name: str, description: str, parameters: Dict[str, Any]) -> "ToolSchema":
+        payload = {
+            "type": "function",
+            "function": {"name": name, "description": description, "parameters": parameters},
+        }
+        serialized = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return cls(name, _freeze(payload), serialized)
+
+
+def _coerce(value: Any, types: List[str]) -> Any:
+    """Accept the number-as-string arguments Llama models often produce"""
+    if isinstance(value, str):
+        if "integer" in types and _INTEGER.fullmatch(value.strip()):
+            return int(value)
+        if "number" in types:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return value
+
+
+def _property_check(name: str, spec: Dict[str, Any]) -> Callable[[Any], Any]:
+    types = spec.get("type", [])
+    types = [types] if isinstance(types, str) else list(types)
+    allowed = tuple(python for json_type in types for python in _TYPES.get(json_type, ()))
+    allows_bool = "boolean" in types
+    enum = spec.get("enum")
+    minimum = spec.get("minimum")
+    maximum = spec.get("maximum")
+
+    def check(value: Any) -> Any:
+        value = _coerce(value, types)
+        if allowed and (not isinstance(value, allowed) or (isinstance(value, bool) and not allows_bool)):
+            raise ToolArgumentError(f"{name} must be {' or '.join(types)}, got {type(value).__name__}")
+        if enum is not None and value not in enum:
+            raise ToolArgumentError(f"{name} must be one of {enum}")
+        if minimum is not None and value < minimum:
+            raise ToolArgumentError(f"{name} must be at least {minimum}")
+        if maximum is not None and value > maximum:
+            raise ToolArgumentError(f"{name} must be at most {maximum}")
+        return value
+
+    return check
+
+
+def compile_validator(parameters: Dict[str, Any]) -> Validator:
+    """Validator for a tool's ``parameters`` schema.
+
+    It returns the arguments with numeric strings coerced and null optional
+    values dropped. It raises ToolArgumentError on a missing required
+    argument or a value of the wrong type or range. Properties the schema
+    doesn't mention pass through unchecked.
+    """
+    checks = {name: _property_check(name, spec) for name, spec in parameters.get("properties", {}).items()}
+    required = tuple(parameters.get("required", ()))
+
+    def validate(arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError("arguments must be a JSON object")
+        cleaned = {}
+        for name, value in arguments.items():
+            if value is None and name not in required:
+                continue
+            check = checks.get(name)
+            cleaned[name] = check(value) if check else value
+        missing = [name for name in required if cleaned.get(name) in (None, "")]
+        if missing:
+            raise ToolArgumentError(f"missing required argument(s): {', '.join(missing)}")
+        return cleaned
+
+    return validate
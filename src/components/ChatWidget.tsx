@@ -48,6 +48,7 @@ How can I assist you today?`,
   ]);
   const [currentMessage, setCurrentMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLInputElement>(null);
 
@@ -80,7 +81,7 @@ How can I assist you today?`,
     setIsLoading(true);
 
     try {
-      const response = await fetch('http://localhost:8000/chat', {
+      const response = await fetch('http://localhost:8000/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -91,20 +92,51 @@ How can I assist you today?`,
         }),
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error('Failed to get response');
       }
 
-      const data = await response.json();
-
-      const botMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        content: data.response,
-        sender: 'bot',
-        timestamp: new Date()
+      // Server-Sent Events: tool progress, then token deltas, then "done"
+      const botMessageId = (Date.now() + 1).toString();
+      const setBotContent = (update: (content: string) => string) => {
+        setMessages(prev => {
+          if (!prev.some(message => message.id === botMessageId)) {
+            return [...prev, { id: botMessageId, content: update(''), sender: 'bot', timestamp: new Date() }];
+          }
+          return prev.map(message =>
+            message.id === botMessageId ? { ...message, content: update(message.content) } : message
+          );
+        });
       };
 
-      setMessages(prev => [...prev, botMessage]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const rawEvents = buffer.split('\n\n');
+        buffer = rawEvents.pop() ?? '';
+
+        for (const rawEvent of rawEvents) {
+          const event = rawEvent.match(/^event: (.*)$/m)?.[1];
+          const data = rawEvent.match(/^data: (.*)$/m)?.[1];
+          if (!event || !data) continue;
+
+          const payload = JSON.parse(data);
+          if (event === 'token') {
+            setIsStreaming(true);
+            setBotContent(content => content + payload.content);
+          } else if (event === 'done') {
+            setBotContent(() => payload.message);
+          } else if (event === 'error') {
+            throw new Error(payload.detail);
+          }
+        }
+      }
     } catch (error) {
       console.error('Chat error:', error);
       const errorMessage: Message = {
@@ -116,6 +148,7 @@ How can I assist you today?`,
       setMessages(prev => [...prev, errorMessage]);
     } finally {
       setIsLoading(false);
+      setIsStreaming(false);
     }
   };
 
@@ -232,7 +265,7 @@ How can I assist you today?`,
               </div>
             ))}
 
-            {isLoading && (
+            {isLoading && !isStreaming && (
               <div className="flex justify-start">
                 <div className="flex items-start gap-2">
                   <div className="w-6 h-6 bg-green-600 rounded-full flex items-center justify-center flex-shrink-0">